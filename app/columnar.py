@@ -0,0 +1,65 @@
+import json
+import numpy as np
+from fastapi import Request, Response
+
+try:
+    import msgpack
+except ImportError:  # msgpack이 없으면 해당 형식은 협상에서 제외
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow가 없으면 Arrow 형식은 협상에서 제외
+    pa = None
+
+# 컬럼 단위 응답 형식 (Accept 헤더로 선택)
+COLUMNS_JSON_MEDIA_TYPE = "application/vnd.columns+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+MEDIA_TYPES = {
+    'columns': COLUMNS_JSON_MEDIA_TYPE,
+    'msgpack': MSGPACK_MEDIA_TYPE,
+    'arrow': ARROW_MEDIA_TYPE,
+}
+
+def negotiate_format(request: Request):
+    """Accept 헤더로 컬럼 형식 선택 ('arrow', 'msgpack', 'columns', 기본 행 JSON이면 None)"""
+    accept = request.headers.get('accept', '')
+    if pa is not None and ARROW_MEDIA_TYPE in accept:
+        return 'arrow'
+    # application/x-msgpack도 허용
+    if msgpack is not None and 'msgpack' in accept:
+        return 'msgpack'
+    if COLUMNS_JSON_MEDIA_TYPE in accept:
+        return 'columns'
+    return None
+
+def result_columns(result):
+    """SQL 결과를 ORM 객체 없이 {컬럼명: 값 목록} 형태로 변환"""
+    keys = list(result.keys())
+    rows = result.fetchall()
+    if not rows:
+        return {key: [] for key in keys}
+    return {key: list(values) for key, values in zip(keys, zip(*rows))}
+
+def _as_list(values):
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+def serialize_columns(columns: dict, fmt: str):
+    """컬럼 dict를 지정한 형식의 바이트로 직렬화"""
+    if fmt == 'arrow':
+        # 숫자형 numpy 배열은 복사 없이 Arrow 배열로 변환됨
+        table = pa.table({name: pa.array(values) for name, values in columns.items()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    data = {name: _as_list(values) for name, values in columns.items()}
+    if fmt == 'msgpack':
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def columnar_response(columns: dict, fmt: str, headers: dict | None = None):
+    return Response(content=serialize_columns(columns, fmt), media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,73 @@
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import text
+from . import models
+from .database import engine, async_engine
+
+# 상가/공실 데이터 전체에 대한 버전 이름
+MAP_DATA = 'map_data'
+# 요청마다 DB를 읽지 않도록 버전을 캐시하는 시간 (초)
+VERSION_CACHE_TTL = 5.0
+
+_cache = {}
+_lock = threading.Lock()
+
+def ensure_version_table():
+    models.DataVersion.__table__.create(bind=engine, checkfirst=True)
+
+def read_data_version(connection, name: str = MAP_DATA):
+    """DB에 저장된 데이터 버전 (없으면 0)"""
+    version = connection.execute(
+        text("SELECT version FROM data_versions WHERE name = :name"), {'name': name}
+    ).scalar()
+    return version or 0
+
+def _cached_version(name: str, now: float):
+    with _lock:
+        cached = _cache.get(name)
+        if cached is not None and now - cached[1] < VERSION_CACHE_TTL:
+            return cached[0]
+    return None
+
+def _store_version(name: str, version: int, now: float):
+    with _lock:
+        _cache[name] = (version, now)
+
+def get_data_version(name: str = MAP_DATA):
+    """짧게 캐시된 데이터 버전"""
+    now = time.monotonic()
+    version = _cached_version(name, now)
+    if version is None:
+        with engine.connect() as connection:
+            version = read_data_version(connection, name)
+        _store_version(name, version, now)
+    return version
+
+async def get_data_version_async(name: str = MAP_DATA):
+    """get_data_version의 비동기 버전 (비동기 엔드포인트용)"""
+    now = time.monotonic()
+    version = _cached_version(name, now)
+    if version is None:
+        async with async_engine.connect() as connection:
+            version = await connection.run_sync(read_data_version, name)
+        _store_version(name, version, now)
+    return version
+
+def bump_data_version(name: str = MAP_DATA):
+    """데이터 변경 후 버전 증가 (임포트 유틸리티에서 호출)"""
+    try:
+        ensure_version_table()
+        with engine.begin() as connection:
+            connection.execute(text("""
+                INSERT INTO data_versions (name, version, updated_at)
+                VALUES (:name, 1, :now)
+                ON DUPLICATE KEY UPDATE version = version + 1, updated_at = :now
+            """), {'name': name, 'now': datetime.now()})
+            version = read_data_version(connection, name)
+        with _lock:
+            _cache.pop(name, None)
+        print(f"데이터 버전 갱신: {name} = {version}")
+        return version
+    except Exception as e:
+        print(f"데이터 버전 갱신 중 오류 발생: {e}")
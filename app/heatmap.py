@@ -0,0 +1,257 @@
+import glob
+import json
+import math
+import os
+import shutil
+import struct
+import time
+import uuid
+import zlib
+import numpy as np
+from scipy.ndimage import gaussian_filter
+from sqlalchemy import text
+from .database import engine
+from .point_clusters import numeric_sales_levels
+from .snapshot import COORDINATE_COLUMNS
+from .spatial_index import EARTH_RADIUS_M
+
+# 히트맵 저장 위치 및 격자 설정
+HEATMAP_DIR = os.getenv("HEATMAP_DIR", "data/heatmaps")
+HEATMAP_CELL_M = float(os.getenv("HEATMAP_CELL_M", "50"))            # 격자 한 칸 크기 (m)
+HEATMAP_BANDWIDTH_M = float(os.getenv("HEATMAP_BANDWIDTH_M", "300"))  # 가우시안 커널 표준편차 (m)
+# 주변 상가 가중치 합이 이보다 작은 칸은 값 없음으로 처리 (중심에 상가 하나 = 1)
+HEATMAP_MIN_WEIGHT = 0.2
+HEATMAP_MIN_ZOOM = 11
+HEATMAP_MAX_ZOOM = 16
+TILE_SIZE = 256
+# 보관할 빌드 디렉터리 수 (교체 직전 빌드를 읽던 요청이 끝날 때까지 유지)
+HEATMAP_KEEP = 2
+
+# 낮은 등급 → 높은 등급 색상 (파랑 → 노랑 → 빨강)
+COLOR_STOPS = np.array([[49, 54, 149], [69, 117, 180], [254, 224, 144], [244, 109, 67], [165, 0, 38]], dtype=np.float64)
+TILE_ALPHA = 170
+
+def encode_png(rgba):
+    """(H, W, 4) uint8 배열을 PNG 바이트로 인코딩"""
+    height, width, _ = rgba.shape
+    raw = b''.join(b'\x00' + rgba[row].tobytes() for row in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+def tile_range(zoom, south, west, north, east):
+    """영역을 덮는 타일 x, y 범위"""
+    n = 2 ** zoom
+
+    def tx(lng):
+        return min(n - 1, max(0, int((lng + 180.0) / 360.0 * n)))
+
+    def ty(lat):
+        lat_rad = math.radians(lat)
+        return min(n - 1, max(0, int((1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n)))
+
+    return range(tx(west), tx(east) + 1), range(ty(north), ty(south) + 1)
+
+class HeatmapGrid:
+    """경산 일대를 덮는 고정 격자 (위도/경도 ↔ 격자 칸 변환)"""
+
+    def __init__(self, south, west, north, east, cell_m=HEATMAP_CELL_M):
+        self.south, self.west, self.north, self.east = south, west, north, east
+        self.dlat = math.degrees(cell_m / EARTH_RADIUS_M)
+        self.dlng = self.dlat / math.cos(math.radians((south + north) / 2))
+        self.rows = int(math.ceil((north - south) / self.dlat)) + 1
+        self.cols = int(math.ceil((east - west) / self.dlng)) + 1
+
+    def cells(self, lats, lngs):
+        rows = np.floor((np.asarray(lats) - self.south) / self.dlat).astype(np.int64)
+        cols = np.floor((np.asarray(lngs) - self.west) / self.dlng).astype(np.int64)
+        return rows, cols
+
+    def to_dict(self):
+        return {'south': self.south, 'west': self.west, 'north': self.north, 'east': self.east,
+                'dlat': self.dlat, 'dlng': self.dlng, 'rows': self.rows, 'cols': self.cols}
+
+def kernel_average(grid, rows, cols, sales, sigma_cells):
+    """격자에 상가 매출등급을 모은 뒤 가우시안 커널로 이웃 합산해 가중 평균 계산"""
+    sums = np.zeros((grid.rows, grid.cols))
+    weights = np.zeros((grid.rows, grid.cols))
+    np.add.at(sums, (rows, cols), sales)
+    np.add.at(weights, (rows, cols), 1.0)
+
+    # 정규화된 커널에 2πσ²를 곱해 중심에 상가 하나가 있으면 가중치 1이 되도록 함
+    scale = 2 * math.pi * sigma_cells ** 2
+    smoothed_sums = gaussian_filter(sums, sigma_cells, mode='constant', truncate=3.0) * scale
+    smoothed_weights = gaussian_filter(weights, sigma_cells, mode='constant', truncate=3.0) * scale
+
+    average = np.full(sums.shape, np.nan, dtype=np.float32)
+    covered = smoothed_weights >= HEATMAP_MIN_WEIGHT
+    average[covered] = smoothed_sums[covered] / smoothed_weights[covered]
+    return average
+
+def sample_tile(grid, values, zoom, x, y):
+    """격자 값을 XYZ 타일 픽셀 중심에서 샘플링 (격자 밖은 NaN)"""
+    n = 2 ** zoom
+    pixel = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lngs = (x + pixel) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixel) / n))))
+    rows, cols = grid.cells(lats, lngs)
+    rows, cols = rows[:, None], cols[None, :]
+    inside = (rows >= 0) & (rows < grid.rows) & (cols >= 0) & (cols < grid.cols)
+    tile = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    rr, cc = np.broadcast_arrays(rows, cols)
+    tile[inside] = values[rr[inside], cc[inside]]
+    return tile
+
+def quantize(tile, vmin, vmax):
+    """값을 uint8로 양자화 (0 = 값 없음, 1~255 = vmin~vmax)"""
+    scaled = np.clip((tile - vmin) / max(vmax - vmin, 1e-9), 0.0, 1.0)
+    codes = np.where(np.isnan(tile), 0, 1 + np.round(np.nan_to_num(scaled) * 254)).astype(np.uint8)
+    return codes
+
+def colorize(codes):
+    """양자화된 타일을 RGBA 색상으로 변환"""
+    position = (codes.astype(np.float64) - 1) / 254 * (len(COLOR_STOPS) - 1)
+    lower = np.clip(np.floor(position).astype(np.int64), 0, len(COLOR_STOPS) - 2)
+    fraction = (position - lower)[..., None]
+    rgb = COLOR_STOPS[lower] * (1 - fraction) + COLOR_STOPS[lower + 1] * fraction
+    rgba = np.zeros(codes.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = np.round(rgb).astype(np.uint8)
+    rgba[..., 3] = np.where(codes > 0, TILE_ALPHA, 0)
+    return rgba
+
+def load_store_sales():
+    with engine.connect() as connection:
+        rows = connection.execute(text(f"""
+            SELECT industry_category, {COORDINATE_COLUMNS}, sales_level
+            FROM commercial_buildings
+            WHERE industry_category IS NOT NULL
+            AND coordinates IS NOT NULL
+            AND sales_level REGEXP '^[0-9]+$'
+        """)).fetchall()
+    categories = np.array([r.industry_category for r in rows], dtype=object)
+    lats = np.array([r.latitude for r in rows], dtype=np.float64)
+    lngs = np.array([r.longitude for r in rows], dtype=np.float64)
+    sales = numeric_sales_levels([r.sales_level for r in rows])
+    return categories, lats, lngs, sales
+
+def build_heatmaps(directory: str = HEATMAP_DIR):
+    """업종별 커널 가중 평균 매출등급 격자와 타일(PNG/uint8 배열)을 만들어 저장 (오프라인 작업)"""
+    categories, lats, lngs, sales = load_store_sales()
+    if not len(lats):
+        print("히트맵을 만들 상가 데이터가 없습니다")
+        return None
+
+    # 커널이 닿는 범위만큼 여유를 둔 격자
+    margin = math.degrees(HEATMAP_BANDWIDTH_M * 3 / EARTH_RADIUS_M)
+    lng_margin = margin / math.cos(math.radians(float(lats.mean())))
+    grid = HeatmapGrid(float(lats.min()) - margin, float(lngs.min()) - lng_margin,
+                       float(lats.max()) + margin, float(lngs.max()) + lng_margin)
+    rows, cols = grid.cells(lats, lngs)
+    sigma_cells = HEATMAP_BANDWIDTH_M / HEATMAP_CELL_M
+    vmin, vmax = float(sales.min()), float(sales.max())
+
+    build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    build_dir = f"{directory}-{build_id}"
+    os.makedirs(build_dir)
+
+    names = sorted(set(categories.tolist()))
+    grids = {}
+    manifest = {
+        'build_id': build_id,
+        'grid': grid.to_dict(),
+        'value_range': [vmin, vmax],
+        'zoom_range': [HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM],
+        'categories': {}
+    }
+    for index, name in enumerate(names):
+        mask = categories == name
+        values = kernel_average(grid, rows[mask], cols[mask], sales[mask], sigma_cells)
+        key = f"c{index}"
+        grids[key] = values.astype(np.float16)
+
+        tile_count = 0
+        for zoom in range(HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM + 1):
+            xs, ys = tile_range(zoom, grid.south, grid.west, grid.north, grid.east)
+            for x in xs:
+                for y in ys:
+                    codes = quantize(sample_tile(grid, values, zoom, x, y), vmin, vmax)
+                    if not codes.any():
+                        continue
+                    tile_dir = os.path.join(build_dir, key, str(zoom), str(x))
+                    os.makedirs(tile_dir, exist_ok=True)
+                    with open(os.path.join(tile_dir, f"{y}.png"), 'wb') as f:
+                        f.write(encode_png(colorize(codes)))
+                    with open(os.path.join(tile_dir, f"{y}.bin"), 'wb') as f:
+                        f.write(codes.tobytes())
+                    tile_count += 1
+
+        manifest['categories'][name] = {'key': key, 'store_count': int(mask.sum()), 'tiles': tile_count}
+        print(f"히트맵 생성: {name} (상가 {int(mask.sum())}개, 타일 {tile_count}개)")
+
+    np.savez_compressed(os.path.join(build_dir, 'grids.npz'), **grids)
+    with open(os.path.join(build_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # 이전 형식(일반 디렉터리) 히트맵은 삭제
+    if os.path.isdir(directory) and not os.path.islink(directory):
+        shutil.rmtree(directory)
+    # 링크 교체는 원자적이라 타일 요청은 이전 빌드 또는 새 빌드 중 하나만 봄
+    link = f"{directory}.link-{os.getpid()}"
+    os.symlink(os.path.basename(build_dir), link)
+    os.replace(link, directory)
+
+    builds = sorted(glob.glob(f"{glob.escape(directory)}-*"), key=os.path.getmtime)
+    for previous in builds[:-HEATMAP_KEEP]:
+        if previous != build_dir:
+            shutil.rmtree(previous, ignore_errors=True)
+    print(f"히트맵 생성 완료: 업종 {len(names)}개, 빌드 {build_id}")
+    return manifest
+
+class HeatmapStore:
+    """저장된 히트맵 타일을 파일에서 읽어 제공 (매니페스트만 메모리에 보관)"""
+
+    def __init__(self, directory: str = HEATMAP_DIR):
+        self.directory = directory
+        self._manifest = None
+        self._build_dir = None
+
+    def current(self):
+        """(링크가 가리키는 빌드 디렉터리, 매니페스트), 재생성되면 다음 요청부터 새 빌드 사용"""
+        build_dir = os.path.realpath(self.directory)
+        if build_dir != self._build_dir:
+            try:
+                with open(os.path.join(build_dir, 'manifest.json'), encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                return None, None
+            self._build_dir, self._manifest = build_dir, manifest
+        return self._build_dir, self._manifest
+
+    @property
+    def manifest(self):
+        return self.current()[1]
+
+    def tile(self, industry_category: str, zoom: int, x: int, y: int, fmt: str):
+        """(타일 바이트 또는 None, 빌드/업종 태그), 업종이 없으면 KeyError"""
+        # 매니페스트와 같은 빌드 디렉터리에서 읽어 교체 중에도 업종 키가 섞이지 않음
+        build_dir, manifest = self.current()
+        if manifest is None:
+            raise FileNotFoundError("히트맵이 아직 생성되지 않았습니다")
+        key = manifest['categories'][industry_category]['key']
+        path = os.path.join(build_dir, key, str(zoom), str(x), f"{y}.{fmt}")
+        tag = f"{manifest['build_id']}-{key}"
+        try:
+            with open(path, 'rb') as f:
+                return f.read(), tag
+        except FileNotFoundError:
+            return None, tag
+
+heatmap_store = HeatmapStore()
+
+if __name__ == "__main__":
+    build_heatmaps()
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from .columnar import negotiate_format, serialize_columns, MEDIA_TYPES
+
+try:
+    import brotli
+except ImportError:  # brotli가 없으면 gzip만 사용
+    brotli = None
+
+# 압축된 응답 본문 캐시 크기
+BODY_CACHE_SIZE = 256
+# 이보다 작은 본문은 압축하지 않음
+MIN_COMPRESS_SIZE = 1024
+
+_bodies = OrderedDict()
+_lock = threading.Lock()
+
+def negotiate_encoding(request: Request):
+    """Accept-Encoding에 따라 br, gzip, None 중 선택"""
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in request.headers.get('accept-encoding', '').split(',')
+        if part.strip() and not part.strip().endswith('q=0')
+    }
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def make_etag(version: int, request: Request, encoding: str | None, fmt: str | None = None):
+    """데이터 버전 + 경로/쿼리 + 응답 형식 + 인코딩으로 만든 강한 ETag"""
+    key = f"{request.url.path}?{request.url.query}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return f'"v{version}-{digest}-{fmt or "rows"}-{encoding or "identity"}"'
+
+def etag_matches(request: Request, etag: str):
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+def encode_body(payload, encoding: str | None, fmt: str | None = None):
+    if fmt is None:
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    else:
+        body = serialize_columns(payload, fmt)
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=5), 'br'
+    return gzip.compress(body, compresslevel=6), 'gzip'
+
+async def versioned_response(request: Request, version: int, build, media_type: str = 'application/json'):
+    """데이터 버전 기반 ETag 응답 (If-None-Match 일치 시 304, 본문은 압축 후 캐시)
+
+    build(columnar)는 캐시가 없을 때만 호출되는 코루틴 함수이며, Accept 헤더가 컬럼 형식을 요청하면
+    columnar=True로 호출되어 {컬럼명: 배열}을, 아니면 행 dict 목록을 반환해야 함
+    """
+    encoding = negotiate_encoding(request)
+    fmt = negotiate_format(request)
+    etag = make_etag(version, request, encoding, fmt)
+    headers = {'ETag': etag, 'Vary': 'Accept, Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    with _lock:
+        cached = _bodies.get(etag)
+        if cached is not None:
+            _bodies.move_to_end(etag)
+    if cached is None:
+        payload = await build(fmt is not None)
+        # 직렬화/압축은 CPU 작업이므로 이벤트 루프 밖에서 수행
+        cached = await run_in_threadpool(encode_body, payload, encoding, fmt)
+        with _lock:
+            _bodies[etag] = cached
+            while len(_bodies) > BODY_CACHE_SIZE:
+                _bodies.popitem(last=False)
+
+    body, content_encoding = cached
+    if content_encoding:
+        headers['Content-Encoding'] = content_encoding
+    return Response(content=body, media_type=MEDIA_TYPES[fmt] if fmt else media_type, headers=headers)
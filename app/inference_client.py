@@ -0,0 +1,191 @@
+import asyncio
+import os
+import random
+import time
+import httpx
+from .metrics import INFERENCE_DURATION
+
+# RunPod 추론 서버 설정 (환경 변수로 변경 가능)
+INFERENCE_BASE_URL = os.getenv("INFERENCE_BASE_URL", "http://213.173.110.34:17618")  # RunPod의 HTTP 포트
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "5"))
+INFERENCE_READ_TIMEOUT = float(os.getenv("INFERENCE_READ_TIMEOUT", "180"))
+INFERENCE_MAX_CONCURRENCY = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "2"))
+INFERENCE_MAX_CONNECTIONS = int(os.getenv("INFERENCE_MAX_CONNECTIONS", "10"))
+INFERENCE_RETRIES = int(os.getenv("INFERENCE_RETRIES", "2"))
+INFERENCE_BACKOFF = float(os.getenv("INFERENCE_BACKOFF", "0.5"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("INFERENCE_CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("INFERENCE_CIRCUIT_RESET", "30"))
+# 대기 + 실행 중인 서로 다른 생성 요청 수 상한 (초과 시 429)
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "16"))
+
+# 재시도해도 안전한 오류 (요청이 생성 단계까지 가지 못한 경우)
+# (RemoteProtocolError는 요청이 이미 전달됐을 수 있어 제외 - 생성 요청은 멱등이 아님)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRYABLE_STATUS = {502, 503, 504}
+
+class InferenceError(Exception):
+    """추론 서버 호출 실패"""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+class InferenceQueueFull(InferenceError):
+    """추론 대기열이 가득 참"""
+
+    def __init__(self, message: str = "분석 요청이 많습니다. 잠시 후 다시 시도해 주세요."):
+        super().__init__(message, status_code=429)
+
+class CircuitBreaker:
+    """연속 실패가 쌓이면 일정 시간 호출을 차단하고, 이후 한 번 시험 호출을 허용"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.half_open_trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.half_open_trial:
+            self.half_open_trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.half_open_trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.half_open_trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.half_open_trial = False
+
+    def release_trial(self):
+        """결과를 기록하지 못하고 끝난 시험 호출(취소 등)의 슬롯을 반환"""
+        self.half_open_trial = False
+
+class InferenceClient:
+    """keep-alive 커넥션을 재사용하는 RunPod 분석 API 비동기 클라이언트"""
+
+    def __init__(self):
+        self._client = None
+        self._semaphore = None
+        self.breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=INFERENCE_BASE_URL,
+                timeout=httpx.Timeout(INFERENCE_READ_TIMEOUT, connect=INFERENCE_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=INFERENCE_MAX_CONNECTIONS,
+                    max_keepalive_connections=INFERENCE_MAX_CONNECTIONS
+                ),
+                headers={'Content-Type': 'application/json'}
+            )
+            self._semaphore = asyncio.Semaphore(INFERENCE_MAX_CONCURRENCY)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def analyze(self, endpoint: str, payload: dict):
+        """/ma/analyze1, /ma/analyze2 호출 후 result 반환"""
+        await self.start()
+        if not self.breaker.allow():
+            INFERENCE_DURATION.labels(endpoint, 'circuit_open').observe(0)
+            raise InferenceError("추론 서버 일시 차단 중 (연속 실패)", status_code=503)
+        trial = self.breaker.half_open_trial
+
+        try:
+            # 동시 생성 요청 수를 제한해 추론 서버와 워커를 보호
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await self._post_with_retry(endpoint, payload)
+                except httpx.HTTPError as e:
+                    INFERENCE_DURATION.labels(endpoint, 'error').observe(time.perf_counter() - start)
+                    self.breaker.record_failure()
+                    raise InferenceError(f"외부 API 호출 실패: {e!r}", status_code=504 if isinstance(e, httpx.TimeoutException) else 502)
+                INFERENCE_DURATION.labels(endpoint, 'success' if response.is_success else 'error').observe(
+                    time.perf_counter() - start
+                )
+
+            # 4xx는 요청 자체의 문제라 서버는 정상으로 봄
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        finally:
+            # 취소 등으로 결과를 기록하지 못해도 half-open 시험 슬롯이 묶이지 않게 함
+            if trial:
+                self.breaker.release_trial()
+
+        if not response.is_success:
+            raise InferenceError("외부 API 호출 실패", status_code=response.status_code)
+        return response.json()['result']
+
+    async def _post_with_retry(self, endpoint: str, payload: dict):
+        for attempt in range(INFERENCE_RETRIES + 1):
+            try:
+                response = await self._client.post(endpoint, json=payload)
+                if response.status_code not in RETRYABLE_STATUS or attempt == INFERENCE_RETRIES:
+                    return response
+            except RETRYABLE_ERRORS:
+                if attempt == INFERENCE_RETRIES:
+                    raise
+            # 지수 백오프 + 지터
+            await asyncio.sleep(INFERENCE_BACKOFF * (2 ** attempt) * (1 + random.random()))
+
+class SingleFlight:
+    """같은 키의 동시 요청은 하나의 업스트림 호출 결과를 공유"""
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._inflight = {}
+        self.stats = {'leaders': 0, 'followers': 0, 'rejected': 0}
+
+    @property
+    def pending(self):
+        return len(self._inflight)
+
+    async def run(self, key: str, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            if len(self._inflight) >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise InferenceQueueFull()
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.stats['leaders'] += 1
+        else:
+            self.stats['followers'] += 1
+
+        # 한 클라이언트가 연결을 끊어도 공유 호출은 취소되지 않음
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 기다리는 쪽이 모두 사라져도 예외 미확인 경고가 나지 않게 함
+        if not task.cancelled():
+            task.exception()
+
+inference_client = InferenceClient()
+inference_flight = SingleFlight(INFERENCE_MAX_PENDING)
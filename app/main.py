@@ -1,15 +1,34 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models
-from .database import SessionLocal, engine
+from .database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from .spatial_index import spatial_index, envelope_wkt, bbox_wkt, radius_sweep_stats, STORE_FIELDS, SPATIAL_INDEX_POLL_INTERVAL
+from .snapshot import COORDINATE_COLUMNS
+from .data_version import get_data_version_async, ensure_version_table
+from .http_cache import versioned_response, etag_matches
+from .columnar import negotiate_format, result_columns, columnar_response
+from .point_clusters import cluster_grid, numeric_sales_levels
+from .sales_aggregates import radius_bucket, lookup_sales_aggregates
+from .unique_locations import has_unique_locations
+from .heatmap import heatmap_store
+from .radius_sessions import RadiusSession, NeighborList
+from .inference_client import inference_client, inference_flight, InferenceError, InferenceQueueFull
+from .result_cache import result_cache, cache_key
+from .report_jobs import report_jobs, JobQueueFull, JobQueueUnavailable, TERMINAL_STATUSES
+from .report_log import report_log
+from .metrics import HTTP_REQUEST_DURATION, render_metrics
+from .profiling import ProfilingMiddleware, profile_store, is_authorized
 from typing import List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import json
-from datetime import datetime
-import os
-import requests
+import time
+import numpy as np
 
 app = FastAPI()
 
@@ -20,8 +39,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Profile-Id", "Server-Timing"],
 )
 
+# PROFILE_TOKEN과 같은 X-Profile 헤더(또는 ?profile=)가 있는 요청만 프로파일링
+app.add_middleware(ProfilingMiddleware)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """라우트 경로 템플릿별 응답 시간 기록 (스트리밍 응답은 헤더 전송까지)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        HTTP_REQUEST_DURATION.labels(
+            request.method, route.path if route is not None else 'unmatched', str(status)
+        ).observe(time.perf_counter() - start)
+
 # Pydantic 모델 정의
 class CommercialBuildingBase(BaseModel):
     industry_category: str | None = None
@@ -52,6 +90,7 @@ class VacantReportData(BaseModel):
     vacant_data: List[dict]
     selected_business_type: str | None = None
     search_radius: float  # 검색 반경 추가
+    bypass_cache: bool = False  # True면 캐시를 무시하고 새로 분석
 
 # Pydantic 모델 수정/추가
 class StoreReportData(BaseModel):
@@ -59,6 +98,117 @@ class StoreReportData(BaseModel):
     lng: float
     selected_business_type: str | None = None
     search_radius: float
+    bypass_cache: bool = False
+
+# 일괄 최근접 공실 조회 요청
+class BatchPoint(BaseModel):
+    lat: float
+    lng: float
+
+class NearestVacantBatchRequest(BaseModel):
+    points: List[BatchPoint] = Field(..., min_length=1)
+    k: int = 3
+
+# SRID 4326 좌표 (MySQL은 EPSG:4326 WKT를 위도-경도 순으로 읽으므로 축 순서를 명시)
+SEARCH_POINT = "ST_GeomFromText(:point, 4326, 'axis-order=long-lat')"
+SEARCH_ENVELOPE = "ST_GeomFromText(:envelope, 4326, 'axis-order=long-lat')"
+
+# 지도 영역 판정 (공간 인덱스와 같이 배정밀도 coordinates 기준)
+BBOX_FILTER = """ST_Latitude(coordinates) BETWEEN :south AND :north
+                AND ST_Longitude(coordinates) BETWEEN :west AND :east"""
+
+# SPATIAL INDEX로 사각형 후보를 먼저 거른 뒤 정확한 거리로 판정
+RADIUS_FILTER = f"""MBRContains({SEARCH_ENVELOPE}, coordinates)
+            AND ST_Distance_Sphere(coordinates, {SEARCH_POINT}) <= :radius"""
+
+# 최근접 검색 시 후보 반경 (m), 결과가 부족하면 다음 반경으로 확장
+NEAREST_SEARCH_RADII = [500, 2000, 8000, 32000]
+
+def radius_params(lat: float, lng: float, radius: float):
+    """RADIUS_FILTER에 필요한 바인딩 파라미터"""
+    return {
+        'point': f'POINT({lng} {lat})',
+        'envelope': envelope_wkt(lat, lng, radius),
+        'radius': radius
+    }
+
+async def fetch_nearest(db: AsyncSession, name: str, query: str, params: dict, lat: float, lng: float, limit: int):
+    """반경을 넓혀가며 최근접 limit개 조회 (query의 {spatial_filter} 자리에 반경 조건 삽입, name은 지표용 SQL 이름)"""
+    for radius in NEAREST_SEARCH_RADII:
+        rows = (await db.execute(
+            text(query.format(spatial_filter=RADIUS_FILTER)).execution_options(metric_name=name),
+            {**params, **radius_params(lat, lng, radius)}
+        )).fetchall()
+        # 반경 안에서 limit개를 채웠다면 반경 밖의 점은 더 가까울 수 없음
+        if len(rows) >= limit:
+            return rows
+
+    return (await db.execute(
+        text(query.format(spatial_filter='TRUE')).execution_options(metric_name=name),
+        {**params, 'point': f'POINT({lng} {lat})'}
+    )).fetchall()
+
+# 일괄 최근접 공실 조회 제한
+MAX_BATCH_POINTS = 500
+MAX_BATCH_K = 20
+
+# 목록 조회 페이지 크기 제한 및 스트리밍 설정
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+COMMERCIAL_LIST_COLUMNS = ['id', 'industry_category', 'latitude', 'longitude', 'sales_level']
+VACANT_LIST_COLUMNS = ['id', 'latitude', 'longitude']
+
+def wants_ndjson(request: Request):
+    """Accept 헤더로 NDJSON 스트리밍 요청 여부 판단"""
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+def check_page_size(limit: int | None):
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit은 1 이상 {MAX_PAGE_SIZE} 이하여야 합니다")
+
+def keyset_page(query, model, after_id: int | None, limit: int | None, response: Response):
+    """id 기준 키셋 페이지 조회, 다음 페이지가 있으면 X-Next-Cursor 헤더 설정"""
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    query = query.order_by(model.id)
+    if limit is None:
+        return query.all()
+
+    rows = query.limit(limit).all()
+    if len(rows) == limit:
+        response.headers['X-Next-Cursor'] = str(rows[-1].id)
+    return rows
+
+def list_query(table: str, columns: List[str], after_id: int | None, limit: int | None):
+    """id 기준 키셋 목록 조회 SQL과 바인딩 파라미터"""
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE id > :after_id ORDER BY id"
+    params = {'after_id': after_id or 0}
+    if limit is not None:
+        query += " LIMIT :limit"
+        params['limit'] = limit
+    return query, params
+
+def columnar_page(db: Session, table: str, columns: List[str], after_id: int | None, limit: int | None, fmt: str):
+    """키셋 페이지를 ORM 객체 없이 컬럼 형식으로 응답"""
+    query, params = list_query(table, columns, after_id, limit)
+    data = result_columns(db.execute(text(query).execution_options(metric_name=f'list-{table}'), params))
+    headers = {}
+    if limit is not None and len(data['id']) == limit:
+        headers['X-Next-Cursor'] = str(data['id'][-1])
+    return columnar_response(data, fmt, headers)
+
+def stream_ndjson(table: str, columns: List[str], after_id: int | None, limit: int | None):
+    """서버 사이드 커서로 행을 읽어 한 줄에 하나씩 JSON으로 내보냄"""
+    query, params = list_query(table, columns, after_id, limit)
+
+    # 요청 세션은 응답 전송 전에 닫히므로 별도 커넥션 사용
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=STREAM_BATCH_SIZE
+        ).execute(text(query).execution_options(metric_name=f'stream-{table}'), params)
+        for rows in result.mappings().partitions(STREAM_BATCH_SIZE):
+            yield ''.join(json.dumps(dict(row), ensure_ascii=False) + '\n' for row in rows)
 
 # 데이터베이스 세션 의존성
 def get_db():
@@ -68,45 +218,320 @@ def get_db():
     finally:
         db.close()
 
+# 비동기 데이터베이스 세션 의존성 (공간 검색, 리포트 엔드포인트)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+@app.on_event("startup")
+def load_spatial_index():
+    """앱 시작 시 상가/공실 공간 인덱스 구축"""
+    db = SessionLocal()
+    try:
+        ensure_version_table()
+        spatial_index.load(db)
+        cluster_grid.build(spatial_index)
+    except Exception as e:
+        # 인덱스가 없으면 반경 검색은 DB 쿼리로 처리됨
+        print(f"공간 인덱스 로드 중 오류 발생: {e}")
+    finally:
+        db.close()
+
+async def watch_spatial_index():
+    """다른 워커나 임포트 작업이 만든 새 스냅샷이 있으면 인덱스 교체"""
+    while True:
+        await asyncio.sleep(SPATIAL_INDEX_POLL_INTERVAL)
+        try:
+            if await run_in_threadpool(spatial_index.refresh):
+                await run_in_threadpool(cluster_grid.build, spatial_index)
+        except Exception as e:
+            print(f"공간 인덱스 갱신 중 오류 발생: {e}")
+
+spatial_index_watcher = None
+
+@app.on_event("startup")
+async def start_spatial_index_watcher():
+    global spatial_index_watcher
+    if SPATIAL_INDEX_POLL_INTERVAL > 0:
+        spatial_index_watcher = asyncio.create_task(watch_spatial_index())
+
+@app.on_event("shutdown")
+async def stop_spatial_index_watcher():
+    if spatial_index_watcher is not None:
+        spatial_index_watcher.cancel()
+
+@app.on_event("startup")
+async def start_inference_client():
+    await inference_client.start()
+
+@app.on_event("shutdown")
+async def close_inference_client():
+    await inference_client.close()
+
+@app.on_event("startup")
+async def start_report_jobs():
+    """리포트 작업 워커 시작 (DB에 남은 대기 작업 복구)"""
+    try:
+        await report_jobs.start()
+    except Exception as e:
+        print(f"리포트 작업 워커 시작 중 오류 발생: {e}")
+
+@app.on_event("shutdown")
+async def stop_report_jobs():
+    await report_jobs.stop()
+
+@app.on_event("shutdown")
+def flush_report_log():
+    """종료 전 대기 중인 리포트 로그 기록"""
+    report_log.close()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
+
+async def analyze_with_cache(endpoint: str, payload: dict, bypass_cache: bool = False):
+    """동일 payload의 분석 결과는 캐시에서 반환, (결과, 캐시 적중 여부)"""
+    key = cache_key(endpoint, payload)
+    if bypass_cache:
+        result_cache.record_bypass()
+    else:
+        # SQLite 디스크 캐시 조회/기록은 블로킹이므로 이벤트 루프 밖에서 수행
+        hit, cached = await run_in_threadpool(result_cache.get, key)
+        if hit:
+            return cached, True
+
+    async def generate():
+        analysis_result = await inference_client.analyze(endpoint, payload)
+        await run_in_threadpool(result_cache.set, key, analysis_result)
+        return analysis_result
+
+    # 동일한 요청이 이미 진행 중이면 그 결과를 함께 기다림
+    analysis_result = await inference_flight.run(key, generate)
+    return analysis_result, False
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus 지표"""
+    body, media_type = render_metrics()
+    return Response(content=body, media_type=media_type)
+
+def check_profile_token(request: Request):
+    if not is_authorized(request.headers.get('x-profile')):
+        raise HTTPException(status_code=403, detail="프로파일 조회 권한이 없습니다")
+
+@app.get("/api/profiles", include_in_schema=False)
+def list_profiles(request: Request):
+    """보관 중인 가장 느린 요청 프로파일 목록"""
+    check_profile_token(request)
+    return profile_store.list()
+
+@app.get("/api/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, request: Request):
+    """speedscope 형식 프로파일 (https://www.speedscope.app 에서 열람)"""
+    check_profile_token(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="프로파일을 찾을 수 없습니다")
+    return Response(content=profile, media_type="application/json")
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """분석 결과 캐시 적중/미스 통계"""
+    return result_cache.info()
+
+@app.get("/api/inference/stats")
+def get_inference_stats():
+    """추론 대기열 및 요청 병합 통계"""
+    return {
+        **inference_flight.stats,
+        'pending': inference_flight.pending,
+        'max_pending': inference_flight.max_pending,
+        'circuit': inference_client.breaker.state
+    }
+
+@app.get("/api/reports/{report_id}")
+def get_report(report_id: str):
+    """report_id로 저장된 리포트 입력 데이터 조회"""
+    record = report_log.get(report_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="리포트를 찾을 수 없습니다")
+    return record
+
+@app.post("/api/spatial-index/reload")
+def reload_spatial_index(db: Session = Depends(get_db)):
+    """데이터 임포트 후 공간 인덱스 재구축 (다른 워커는 새 스냅샷을 확인해 교체)"""
+    try:
+        spatial_index.load(db)
+        cluster_grid.build(spatial_index)
+        return {
+            "status": "success",
+            "commercial_buildings": len(spatial_index.stores),
+            "vacant_listings": len(spatial_index.vacants)
+        }
+    except Exception as e:
+        print(f"공간 인덱스 재구축 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/commercial-buildings/", response_model=List[CommercialBuilding])
-def get_commercial_buildings(db: Session = Depends(get_db)):
-    """상가 데이터 조회"""
-    buildings = db.query(models.CommercialBuilding).all()
+def get_commercial_buildings(
+    request: Request,
+    response: Response,
+    after_id: int | None = None,
+    limit: int | None = None,
+    db: Session = Depends(get_db)
+):
+    """상가 데이터 조회 (after_id/limit 페이지 조회, Accept: application/x-ndjson이면 스트리밍, 컬럼 형식 지원)"""
+    check_page_size(limit)
+    fmt = negotiate_format(request)
+    if fmt:
+        return columnar_page(db, 'commercial_buildings', COMMERCIAL_LIST_COLUMNS, after_id, limit, fmt)
+    if wants_ndjson(request):
+        return StreamingResponse(
+            stream_ndjson('commercial_buildings', COMMERCIAL_LIST_COLUMNS, after_id, limit),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    buildings = keyset_page(db.query(models.CommercialBuilding), models.CommercialBuilding, after_id, limit, response)
     return buildings
 
 @app.get("/vacant-listings/", response_model=List[VacantListing])
-def get_vacant_listings(db: Session = Depends(get_db)):
-    """공실 데이터 조회"""
-    vacants = db.query(models.VacantListing).all()
+def get_vacant_listings(
+    request: Request,
+    response: Response,
+    after_id: int | None = None,
+    limit: int | None = None,
+    db: Session = Depends(get_db)
+):
+    """공실 데이터 조회 (after_id/limit 페이지 조회, Accept: application/x-ndjson이면 스트리밍, 컬럼 형식 지원)"""
+    check_page_size(limit)
+    fmt = negotiate_format(request)
+    if fmt:
+        return columnar_page(db, 'vacant_listings', VACANT_LIST_COLUMNS, after_id, limit, fmt)
+    if wants_ndjson(request):
+        return StreamingResponse(
+            stream_ndjson('vacant_listings', VACANT_LIST_COLUMNS, after_id, limit),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    vacants = keyset_page(db.query(models.VacantListing), models.VacantListing, after_id, limit, response)
     return vacants
 
+def check_bbox(south: float, west: float, north: float, east: float):
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail="잘못된 지도 영역입니다")
+
+@app.get("/commercial-buildings/bbox")
+async def get_commercial_buildings_in_bbox(
+    request: Request,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    industry_category: str | None = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """지도 화면 영역 내 상가 데이터 조회 (ETag, gzip/brotli, 컬럼 형식 지원)"""
+    check_bbox(south, west, north, east)
+    try:
+        version = await get_data_version_async()
+
+        async def build(columnar):
+            if spatial_index.ready and spatial_index.version == version:
+                return await run_in_threadpool(spatial_index.stores_in_bbox, south, west, north, east, industry_category, columnar)
+
+            query = text(f"""
+                SELECT id, industry_category, {COORDINATE_COLUMNS}, sales_level
+                FROM commercial_buildings
+                WHERE MBRContains({SEARCH_ENVELOPE}, coordinates)
+                AND {BBOX_FILTER}
+                AND (:industry_category IS NULL OR industry_category = :industry_category)
+                ORDER BY id;
+            """).execution_options(metric_name='bbox-stores')
+            result = await db.execute(query, {
+                'envelope': bbox_wkt(south, west, north, east),
+                'south': south, 'west': west, 'north': north, 'east': east,
+                'industry_category': industry_category
+            })
+            return result_columns(result) if columnar else [dict(row) for row in result.mappings()]
+
+        return await versioned_response(request, version, build)
+
+    except Exception as e:
+        print(f"영역 내 상가 조회 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/vacant-listings/bbox")
+async def get_vacant_listings_in_bbox(
+    request: Request,
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """지도 화면 영역 내 공실 데이터 조회 (ETag, gzip/brotli, 컬럼 형식 지원)"""
+    check_bbox(south, west, north, east)
+    try:
+        version = await get_data_version_async()
+
+        async def build(columnar):
+            if spatial_index.ready and spatial_index.version == version:
+                return await run_in_threadpool(spatial_index.vacants_in_bbox, south, west, north, east, columnar)
+
+            query = text(f"""
+                SELECT id, {COORDINATE_COLUMNS}
+                FROM vacant_listings
+                WHERE MBRContains({SEARCH_ENVELOPE}, coordinates)
+                AND {BBOX_FILTER}
+                ORDER BY id;
+            """).execution_options(metric_name='bbox-vacants')
+            result = await db.execute(query, {
+                'envelope': bbox_wkt(south, west, north, east),
+                'south': south, 'west': west, 'north': north, 'east': east
+            })
+            return result_columns(result) if columnar else [dict(row) for row in result.mappings()]
+
+        return await versioned_response(request, version, build)
+
+    except Exception as e:
+        print(f"영역 내 공실 조회 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/commercial-buildings/nearby/")
-def get_nearby_commercial_buildings(
+async def get_nearby_commercial_buildings(
+    request: Request,
     lat: float, 
     lng: float, 
     radius: float = 1000, 
     industry_category: str | None = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """주변 상가 데이터 조회"""
+    """주변 상가 데이터 조회 (Accept 헤더로 컬럼 형식 선택 가능)"""
+    fmt = negotiate_format(request)
+    if spatial_index.ready:
+        # 인덱스 조회와 행 생성, 직렬화는 CPU 작업이므로 이벤트 루프 밖에서 수행
+        stores = await run_in_threadpool(spatial_index.nearby_stores, lat, lng, radius, industry_category, fmt is not None)
+        if fmt:
+            return await run_in_threadpool(columnar_response, stores, fmt)
+        return stores
     
     # 업종 필터링 조건 추가
-    query = text("""
-        SELECT id, industry_category, latitude, longitude, sales_level,
-            ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) as distance
+    query = text(f"""
+        SELECT id, industry_category, {COORDINATE_COLUMNS}, sales_level,
+            ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
         FROM commercial_buildings
-        WHERE ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) <= :radius
+        WHERE {RADIUS_FILTER}
         AND (:industry_category IS NULL OR industry_category = :industry_category)
         ORDER BY distance;
-    """)
+    """).execution_options(metric_name='nearby-stores')
     
-    point = f'POINT({lng} {lat})'
     try:
-        result = db.execute(query, {
-            'point': point, 
-            'radius': radius,
+        result = await db.execute(query, {
+            **radius_params(lat, lng, radius),
             'industry_category': industry_category
         })
+        if fmt:
+            return await run_in_threadpool(columnar_response, result_columns(result), fmt)
         
         buildings = []
         for row in result:
@@ -125,21 +550,85 @@ def get_nearby_commercial_buildings(
         print(f"검색 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def gather_nearby_stores(lat: float, lng: float, radius: float, industry_category: str | None):
+    """반경 내 상가를 (거리, id) 순 NeighborList로 조회 (반경 세션용)"""
+    if spatial_index.ready:
+        stores = spatial_index.stores
+        positions, distances = await run_in_threadpool(
+            stores.query_radius, lat, lng, radius, industry_category=industry_category
+        )
+        return NeighborList(
+            stores.ids[positions], distances,
+            lambda selected: stores.rows(positions[selected], distances[selected], STORE_FIELDS)
+        )
+
+    query = text(f"""
+        SELECT id, industry_category, {COORDINATE_COLUMNS}, sales_level,
+            ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
+        FROM commercial_buildings
+        WHERE {RADIUS_FILTER}
+        AND (:industry_category IS NULL OR industry_category = :industry_category)
+        ORDER BY distance, id;
+    """).execution_options(metric_name='nearby-stores-session')
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query, {
+            **radius_params(lat, lng, radius),
+            'industry_category': industry_category
+        })
+        rows = [dict(row) for row in result.mappings()]
+    return NeighborList(
+        [row['id'] for row in rows], [row['distance'] for row in rows],
+        lambda selected: [rows[i] for i in selected]
+    )
+
+@app.websocket("/ws/commercial-buildings/nearby")
+async def nearby_commercial_buildings_session(websocket: WebSocket):
+    """반경을 바꿀 때마다 새로 포함된 상가 또는 빠진 상가 id만 보내는 주변 상가 세션
+
+    첫 메시지: {"lat", "lng", "radius", "industry_category"(선택)}, 이후 메시지: {"radius"}
+    응답: {"radius", "added": [상가...], "removed": [id...], "total"}
+    """
+    await websocket.accept()
+    try:
+        start = await websocket.receive_json()
+        session = RadiusSession(
+            float(start['lat']), float(start['lng']), start.get('industry_category'), gather_nearby_stores
+        )
+        radius = start['radius']
+        while True:
+            await websocket.send_json(await session.update(float(radius)))
+            radius = (await websocket.receive_json())['radius']
+    except WebSocketDisconnect:
+        pass
+    except (KeyError, TypeError, ValueError) as e:
+        await websocket.send_json({'error': f"잘못된 메시지입니다: {e}"})
+        await websocket.close(code=1008)
+    except Exception as e:
+        print(f"주변 상가 세션 처리 중 오류 발생: {e}")
+        await websocket.close(code=1011)
+
 @app.get("/api/locations/search")
-def search_locations(lat: float, lng: float, radius: float = 1000, db: Session = Depends(get_db)):
-    """위치 기반 공실 검색"""
-    query = text("""
-        SELECT id, latitude, longitude,
-            ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) as distance
+async def search_locations(request: Request, lat: float, lng: float, radius: float = 1000, db: AsyncSession = Depends(get_async_db)):
+    """위치 기반 공실 검색 (Accept 헤더로 컬럼 형식 선택 가능)"""
+    fmt = negotiate_format(request)
+    if spatial_index.ready:
+        vacants = await run_in_threadpool(spatial_index.nearby_vacants, lat, lng, radius, fmt is not None)
+        if fmt:
+            return await run_in_threadpool(columnar_response, vacants, fmt)
+        return vacants
+
+    query = text(f"""
+        SELECT id, {COORDINATE_COLUMNS},
+            ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
         FROM vacant_listings
-        WHERE ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) <= :radius
+        WHERE {RADIUS_FILTER}
         ORDER BY distance;
-    """)
-    
-    point = f'POINT({lng} {lat})'
+    """).execution_options(metric_name='nearby-vacants')
     
     try:
-        result = db.execute(query, {'point': point, 'radius': radius})
+        result = await db.execute(query, radius_params(lat, lng, radius))
+        if fmt:
+            return await run_in_threadpool(columnar_response, result_columns(result), fmt)
         
         vacants = []
         for row in result:
@@ -156,8 +645,54 @@ def search_locations(lat: float, lng: float, radius: float = 1000, db: Session =
         print(f"검색 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/map/clusters")
+def get_map_clusters(south: float, west: float, north: float, east: float, zoom: int):
+    """지도 화면 영역과 줌 레벨에 맞춘 상가/공실 클러스터 조회 (고배율에서는 개별 좌표)"""
+    check_bbox(south, west, north, east)
+    if not cluster_grid.ready:
+        raise HTTPException(status_code=503, detail="클러스터 인덱스가 준비되지 않았습니다")
+
+    try:
+        return cluster_grid.query(south, west, north, east, zoom)
+    except Exception as e:
+        print(f"클러스터 조회 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 히트맵 타일 형식 (bin: 256x256 uint8, 0 = 값 없음, 1~255 = value_range 선형 구간)
+HEATMAP_MEDIA_TYPES = {'png': 'image/png', 'bin': 'application/octet-stream'}
+HEATMAP_CACHE_CONTROL = "public, max-age=3600"
+
+@app.get("/api/heatmaps")
+def get_heatmap_manifest():
+    """업종별 매출등급 히트맵 정보 (업종 목록, 값 범위, 줌 범위, 빌드 id)"""
+    manifest = heatmap_store.manifest
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="히트맵이 아직 생성되지 않았습니다")
+    return {key: value for key, value in manifest.items() if key != 'grid'}
+
+@app.get("/api/heatmaps/tiles/{zoom}/{x}/{y}.{fmt}")
+def get_heatmap_tile(zoom: int, x: int, y: int, fmt: str, industry_category: str, request: Request):
+    """미리 생성된 업종별 매출등급 히트맵 타일 (파일 읽기만 수행)"""
+    if fmt not in HEATMAP_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="타일 형식은 png 또는 bin이어야 합니다")
+    try:
+        body, tag = heatmap_store.tile(industry_category, zoom, x, y, fmt)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="해당 업종의 히트맵이 없습니다")
+
+    etag = f'"{tag}-{zoom}-{x}-{y}-{fmt}"'
+    headers = {'ETag': etag, 'Cache-Control': HEATMAP_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    # 데이터가 없는 영역은 빈 응답
+    if body is None:
+        return Response(status_code=204, headers=headers)
+    return Response(content=body, media_type=HEATMAP_MEDIA_TYPES[fmt], headers=headers)
+
 @app.get("/api/business-categories")
-def get_business_categories(db: Session = Depends(get_db)):
+async def get_business_categories(db: AsyncSession = Depends(get_async_db)):
     """상가 업종 카테고리 목록 조회"""
     try:
         query = text("""
@@ -165,9 +700,9 @@ def get_business_categories(db: Session = Depends(get_db)):
             FROM commercial_buildings 
             WHERE industry_category IS NOT NULL 
             ORDER BY industry_category;
-        """)
+        """).execution_options(metric_name='business-categories')
         
-        result = db.execute(query)
+        result = await db.execute(query)
         categories = [row[0] for row in result if row[0]]
         
         return categories
@@ -176,334 +711,614 @@ def get_business_categories(db: Session = Depends(get_db)):
         print(f"업종 카테고리 조회 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# 업종 순위 정렬 기준
+CATEGORY_RANKING_KEYS = ['avg_sales_level', 'store_count', 'nearest_distance', 'mean_distance']
+
+def rank_categories(stats: List[dict], order_by: str, descending: bool):
+    """업종별 통계를 정렬해 순위를 붙임 (값이 없는 업종은 항상 뒤로)"""
+    present = [s for s in stats if s[order_by] is not None]
+    missing = [s for s in stats if s[order_by] is None]
+    present.sort(key=lambda s: (-s[order_by] if descending else s[order_by], s['store_count'], s['industry_category']))
+    missing.sort(key=lambda s: (s['store_count'], s['industry_category']))
+    return [{'rank': rank, **s} for rank, s in enumerate(present + missing, start=1)]
+
+@app.get("/api/category-ranking")
+async def get_category_ranking(
+    lat: float,
+    lng: float,
+    radius: float = 500,
+    order_by: str = 'avg_sales_level',
+    descending: bool = True,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """클릭한 좌표 반경 내 모든 업종의 평균 매출등급, 경쟁 상가 수, 거리 통계를 한 번에 계산해 순위 반환"""
+    if order_by not in CATEGORY_RANKING_KEYS:
+        raise HTTPException(status_code=400, detail=f"order_by는 {', '.join(CATEGORY_RANKING_KEYS)} 중 하나여야 합니다")
+
+    try:
+        if spatial_index.ready:
+            stats = await run_in_threadpool(spatial_index.category_stats, lat, lng, radius)
+        else:
+            query = text(f"""
+                SELECT industry_category,
+                    COUNT(*) as store_count,
+                    SUM(sales_level REGEXP '^[0-9]+$') as rated_count,
+                    AVG(CASE WHEN sales_level REGEXP '^[0-9]+$' THEN CAST(sales_level AS UNSIGNED) END) as avg_sales_level,
+                    MIN(ST_Distance_Sphere(coordinates, {SEARCH_POINT})) as nearest_distance,
+                    AVG(ST_Distance_Sphere(coordinates, {SEARCH_POINT})) as mean_distance
+                FROM commercial_buildings
+                WHERE {RADIUS_FILTER}
+                AND industry_category IS NOT NULL
+                GROUP BY industry_category;
+            """).execution_options(metric_name='category-ranking')
+            result = await db.execute(query, radius_params(lat, lng, radius))
+            stats = [
+                {
+                    'industry_category': row.industry_category,
+                    'store_count': int(row.store_count),
+                    'rated_count': int(row.rated_count or 0),
+                    'avg_sales_level': float(row.avg_sales_level) if row.avg_sales_level is not None else None,
+                    'nearest_distance': float(row.nearest_distance),
+                    'mean_distance': float(row.mean_distance)
+                }
+                for row in result
+            ]
+
+        return {
+            'lat': lat,
+            'lng': lng,
+            'radius': radius,
+            'total_stores': sum(s['store_count'] for s in stats),
+            'categories': rank_categories(stats, order_by, descending)
+        }
+
+    except Exception as e:
+        print(f"업종 순위 계산 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 반경 스윕 제한
+MAX_SWEEP_RADII = 50
+
+@app.get("/api/radius-sweep")
+async def get_radius_sweep(
+    lat: float,
+    lng: float,
+    industry_category: str,
+    radii: List[float] = Query(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """여러 검색 반경별 선택 업종의 상가 수, 평균 매출등급, 경쟁 밀도를 한 번의 거리순 조회로 계산 (반경 슬라이더용)"""
+    radii = sorted(set(radii))
+    if len(radii) > MAX_SWEEP_RADII:
+        raise HTTPException(status_code=400, detail=f"반경은 최대 {MAX_SWEEP_RADII}개까지 지정할 수 있습니다")
+    if radii[0] <= 0:
+        raise HTTPException(status_code=400, detail="반경은 0보다 커야 합니다")
+
+    try:
+        if spatial_index.ready:
+            sweep = await run_in_threadpool(spatial_index.radius_sweep, lat, lng, industry_category, radii)
+        else:
+            query = text(f"""
+                SELECT industry_category, sales_level,
+                    ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
+                FROM commercial_buildings
+                WHERE {RADIUS_FILTER}
+                ORDER BY distance
+            """).execution_options(metric_name='radius-sweep')
+            rows = (await db.execute(query, radius_params(lat, lng, radii[-1]))).fetchall()
+            sweep = radius_sweep_stats(
+                np.array([row.distance for row in rows], dtype=np.float64),
+                np.array([row.industry_category == industry_category for row in rows], dtype=bool),
+                numeric_sales_levels([row.sales_level for row in rows]),
+                radii
+            )
+
+        return {
+            'lat': lat,
+            'lng': lng,
+            'industry_category': industry_category,
+            'radii': sweep
+        }
+
+    except Exception as e:
+        print(f"반경 스윕 계산 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+NEAREST_VACANTS_QUERY = f"""
+    WITH nearest_vacants AS (
+        SELECT id, 
+            ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
+        FROM vacant_listings
+        WHERE {{spatial_filter}}
+        ORDER BY distance
+        LIMIT :limit
+    )
+    SELECT 
+        v.*,
+        n.distance
+    FROM vacant_listings v
+    JOIN nearest_vacants n ON v.id = n.id
+    ORDER BY n.distance;
+"""
+
+def vacant_detail(row):
+    """공실 행을 상세 정보 dict로 변환"""
+    return {
+        'id': row.id,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'distance': row.distance,
+        
+        # 주변 시설 정보
+        'num_of_company': row.num_of_company,
+        'num_of_large': row.num_of_large,
+        'num_of_bus_stop': row.num_of_bus_stop,
+        'num_of_hospital': row.num_of_hospital,
+        'num_of_theather': row.num_of_theather,
+        'num_of_camp': row.num_of_camp,
+        'num_of_school': row.num_of_school,
+        
+        # 지하철 정보
+        'nearest_subway_name': row.nearest_subway_name,
+        'nearest_subway_distance': row.nearest_subway_distance,
+        'num_of_subway': row.num_of_subway,
+        
+        # 기타 시설
+        'num_of_gvn_office': row.num_of_gvn_office,
+        'parks_within_500m': row.parks_within_500m,
+        'parking_lots_within_500m': row.parking_lots_within_500m,
+        
+        # 대학교 거리별 수
+        'university_within_0m_500m': row.university_within_0m_500m,
+        'university_within_500m_1000m': row.university_within_500m_1000m,
+        'university_within_1000m_1500m': row.university_within_1000m_1500m,
+        'university_within_1500m_2000m': row.university_within_1500m_2000m
+    }
+
 @app.get("/api/nearest-vacant-listings/")
-def get_nearest_vacant_listings(
+async def get_nearest_vacant_listings(
     lat: float, 
     lng: float, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """클릭한 좌표에서 가장 가까운 공실 3개의 상세 정보 조회"""
-    query = text("""
-        WITH nearest_three AS (
-            SELECT id, 
-                ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) as distance
-            FROM vacant_listings
-            ORDER BY ST_Distance_Sphere(coordinates, ST_GeomFromText(:point))
-            LIMIT 3
-        )
-        SELECT 
-            v.*,
-            n.distance
-        FROM vacant_listings v
-        JOIN nearest_three n ON v.id = n.id
-        ORDER BY n.distance;
-    """)
-    
-    point = f'POINT({lng} {lat})'
-    
     try:
-        result = db.execute(query, {'point': point})
-        
-        vacants = []
-        for row in result:
-            vacant_data = {
-                'id': row.id,
-                'latitude': row.latitude,
-                'longitude': row.longitude,
-                'distance': row.distance,
-                
-                # 주변 시설 정보
-                'num_of_company': row.num_of_company,
-                'num_of_large': row.num_of_large,
-                'num_of_bus_stop': row.num_of_bus_stop,
-                'num_of_hospital': row.num_of_hospital,
-                'num_of_theather': row.num_of_theather,
-                'num_of_camp': row.num_of_camp,
-                'num_of_school': row.num_of_school,
-                
-                # 지하철 정보
-                'nearest_subway_name': row.nearest_subway_name,
-                'nearest_subway_distance': row.nearest_subway_distance,
-                'num_of_subway': row.num_of_subway,
-                
-                # 기타 시설
-                'num_of_gvn_office': row.num_of_gvn_office,
-                'parks_within_500m': row.parks_within_500m,
-                'parking_lots_within_500m': row.parking_lots_within_500m,
-                
-                # 대학교 거리별 수
-                'university_within_0m_500m': row.university_within_0m_500m,
-                'university_within_500m_1000m': row.university_within_500m_1000m,
-                'university_within_1000m_1500m': row.university_within_1000m_1500m,
-                'university_within_1500m_2000m': row.university_within_1500m_2000m
-            }
-            vacants.append(vacant_data)
-        
-        return vacants
+        if spatial_index.ready:
+            return (await run_in_threadpool(spatial_index.nearest_vacants, [lat], [lng], 3))[0]
+
+        result = await fetch_nearest(db, 'nearest-three', NEAREST_VACANTS_QUERY, {'limit': 3}, lat, lng, 3)
+        return [vacant_detail(row) for row in result]
         
     except Exception as e:
         print(f"가장 가까운 공실 검색 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/save-vacant-report/")
-def save_vacant_report(data: VacantReportData, db: Session = Depends(get_db)):
-    """공실 분석 리포트 데이터 저장"""
+@app.post("/api/nearest-vacant-listings/batch")
+async def get_nearest_vacant_listings_batch(data: NearestVacantBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """여러 좌표 각각에 대해 가장 가까운 공실 k개의 상세 정보 일괄 조회"""
+    if not 1 <= data.k <= MAX_BATCH_K:
+        raise HTTPException(status_code=400, detail=f"k는 1 이상 {MAX_BATCH_K} 이하여야 합니다")
+    if len(data.points) > MAX_BATCH_POINTS:
+        raise HTTPException(status_code=400, detail=f"좌표는 최대 {MAX_BATCH_POINTS}개까지 요청할 수 있습니다")
+
     try:
-        # 가장 가까운 공실 3개 검색 (위도/경도 중복 제외)
-        nearest_query = text("""
-            WITH ranked_locations AS (
-                SELECT 
-                    id,
-                    latitude,
-                    longitude,
-                    ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) as distance,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY latitude, longitude 
-                        ORDER BY id
-                    ) as rn
-                FROM vacant_listings
-            )
+        lats = [p.lat for p in data.points]
+        lngs = [p.lng for p in data.points]
+
+        if spatial_index.ready:
+            # 모든 좌표를 BallTree 한 번의 조회로 처리
+            nearest = await run_in_threadpool(spatial_index.nearest_vacants, lats, lngs, data.k)
+        else:
+            nearest = [
+                [vacant_detail(row) for row in await fetch_nearest(db, 'nearest-three', NEAREST_VACANTS_QUERY, {'limit': data.k}, lat, lng, data.k)]
+                for lat, lng in zip(lats, lngs)
+            ]
+
+        return [
+            {'lat': lat, 'lng': lng, 'vacants': vacants}
+            for lat, lng, vacants in zip(lats, lngs, nearest)
+        ]
+
+    except Exception as e:
+        print(f"공실 일괄 검색 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 중복 좌표 제거 테이블(unique_locations.py)에서 가장 가까운 위치 3개 검색
+NEAREST_VACANT_LOCATIONS_QUERY = f"""
+    WITH nearest_locations AS (
+        SELECT vacant_id AS id,
+            ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
+        FROM vacant_locations
+        WHERE {{spatial_filter}}
+        ORDER BY distance
+        LIMIT 3
+    )
+    SELECT 
+        v.*,
+        n.distance
+    FROM vacant_listings v
+    JOIN nearest_locations n ON v.id = n.id
+    ORDER BY n.distance;
+"""
+
+NEAREST_STORE_LOCATIONS_QUERY = f"""
+    WITH nearest_locations AS (
+        SELECT store_id AS id,
+            ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance
+        FROM store_locations
+        WHERE industry_category = :business_type
+        AND {{spatial_filter}}
+        ORDER BY distance
+        LIMIT 3
+    )
+    SELECT 
+        c.*,
+        n.distance
+    FROM commercial_buildings c
+    JOIN nearest_locations n ON c.id = n.id
+    ORDER BY n.distance;
+"""
+
+async def prepare_vacant_report(data: VacantReportData, db: AsyncSession):
+    """공실 리포트 입력 데이터 집계 및 로그 저장"""
+    # 가장 가까운 공실 3개 검색 (위도/경도 중복 제외)
+    nearest_query = f"""
+        WITH ranked_locations AS (
             SELECT 
-                v.*,
-                r.distance
-            FROM vacant_listings v
-            JOIN (
-                SELECT id, distance
-                FROM ranked_locations
-                WHERE rn = 1
-                ORDER BY distance
-                LIMIT 3
-            ) r ON v.id = r.id
-            ORDER BY r.distance;
-        """)
+                id,
+                latitude,
+                longitude,
+                ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance,
+                ROW_NUMBER() OVER (
+                    PARTITION BY latitude, longitude 
+                    ORDER BY id
+                ) as rn
+            FROM vacant_listings
+            WHERE {{spatial_filter}}
+        )
+        SELECT 
+            v.*,
+            r.distance
+        FROM vacant_listings v
+        JOIN (
+            SELECT id, distance
+            FROM ranked_locations
+            WHERE rn = 1
+            ORDER BY distance
+            LIMIT 3
+        ) r ON v.id = r.id
+        ORDER BY r.distance;
+    """
+    
+    # 중복 좌표 제거 테이블이 준비되어 있으면 전체 테이블 윈도 함수 대신 사용
+    if await db.run_sync(has_unique_locations, 'vacant_locations'):
+        result = await fetch_nearest(
+            db, 'nearest-locations-vacant', NEAREST_VACANT_LOCATIONS_QUERY, {}, data.lat, data.lng, 3
+        )
+    else:
+        result = await fetch_nearest(db, 'ranked-locations-vacant', nearest_query, {}, data.lat, data.lng, 3)
+
+    # 집계 반경이면 미리 계산된 매출등급 집계를 한 번에 조회
+    aggregates = None
+    bucket = radius_bucket(data.search_radius)
+    if bucket is not None and result:
+        aggregates = await db.run_sync(
+            lookup_sales_aggregates, [row.id for row in result], data.selected_business_type, bucket
+        )
+    
+    # 데이터를 컬럼별로 묶기
+    aggregated_data = {
+        'avg_sales_level': [],
+        'selected_business_type': [],
         
-        point = f'POINT({data.lng} {data.lat})'
-        result = db.execute(nearest_query, {'point': point})
+        # 주변 시설 정보
+        'num_of_company': [],
+        'num_of_large': [],
+        'num_of_bus_stop': [],
+        'num_of_hospital': [],
+        'num_of_theather': [],
+        'num_of_camp': [],
+        'num_of_school': [],
         
-        # 데이터를 컬럼별로 묶기
-        aggregated_data = {
-            'avg_sales_level': [],
-            'selected_business_type': [],
-            
-            # 주변 시설 정보
-            'num_of_company': [],
-            'num_of_large': [],
-            'num_of_bus_stop': [],
-            'num_of_hospital': [],
-            'num_of_theather': [],
-            'num_of_camp': [],
-            'num_of_school': [],
-            
-            # 지하철 정보
-            'nearest_subway_name': [],
-            'nearest_subway_distance': [],
-            'num_of_subway': [],
-            
-            # 기타 시설
-            'num_of_gvn_office': [],
-            'parks_within_500m': [],
-            'parking_lots_within_500m': []
-            
-            # # 대학교 거리별 수
-            # 'university_within_0m_500m': [],
-            # 'university_within_500m_1000m': [],
-            # 'university_within_1000m_1500m': [],
-            # 'university_within_1500m_2000m': []
-        }
+        # 지하철 정보
+        'nearest_subway_name': [],
+        'nearest_subway_distance': [],
+        'num_of_subway': [],
         
-        for row in result:
+        # 기타 시설
+        'num_of_gvn_office': [],
+        'parks_within_500m': [],
+        'parking_lots_within_500m': []
+        
+        # # 대학교 거리별 수
+        # 'university_within_0m_500m': [],
+        # 'university_within_500m_1000m': [],
+        # 'university_within_1000m_1500m': [],
+        # 'university_within_1500m_2000m': []
+    }
+    
+    for row in result:
+        if aggregates is not None:
+            store_count, sales_level_sum = aggregates.get(row.id, (0, 0))
+            avg_sales_level = sales_level_sum / store_count if store_count else 0
+        else:
             # 각 공실 주변의 상가 데이터 조회 (사용자가 지정한 반경 사용)
-            nearby_query = text("""
+            nearby_query = text(f"""
                 SELECT sales_level
                 FROM commercial_buildings
-                WHERE ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) <= :radius
+                WHERE {RADIUS_FILTER}
                 AND industry_category = :business_type
                 AND sales_level IS NOT NULL
-            """)
-            
-            vacant_point = f'POINT({row.longitude} {row.latitude})'
-            nearby_result = db.execute(nearby_query, {
-                'point': vacant_point,
-                'business_type': data.selected_business_type,
-                'radius': data.search_radius
+            """).execution_options(metric_name='nearby-sales')
+        
+            nearby_result = await db.execute(nearby_query, {
+                **radius_params(row.latitude, row.longitude, data.search_radius),
+                'business_type': data.selected_business_type
             })
-            
+        
             # 매출 등급 평균 계산
             sales_levels = [int(r.sales_level) for r in nearby_result if r.sales_level.isdigit()]
             avg_sales_level = sum(sales_levels) / len(sales_levels) if sales_levels else 0
-            
-            # 기본 정보 추가 (distance 제거)
-            aggregated_data['avg_sales_level'].append(f"{avg_sales_level:.2f}")
-            aggregated_data['selected_business_type'].append(data.selected_business_type)
-            
-            # 나머지 필드들 추가
-            for key in aggregated_data.keys():
-                if key not in ['avg_sales_level', 'selected_business_type']:
-                    aggregated_data[key].append(getattr(row, key))
-        
-        # 필요한 메타데이터를 aggregated_data에 포함
-        data_to_save = aggregated_data
         
-        # data 디렉토리가 없으면 생성
-        os.makedirs('data/collected_samples', exist_ok=True)
         
-        # 파일명에 타임스탬프 포함
-        filename = f'data/collected_samples/vacant_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        
-        # JSON 파일 저장
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, separators=(',', ':'))
-
-        # API 호출 - HTTP 프로토콜 사용
-        response = requests.post(
-            "http://213.173.110.34:17618/ma/analyze1",  # RunPod의 HTTP 포트(8000) 사용
-            json=data_to_save,
-            headers={'Content-Type': 'application/json'}  # HTTP 헤더 명시
-        )
+        # 기본 정보 추가 (distance 제거)
+        aggregated_data['avg_sales_level'].append(f"{avg_sales_level:.2f}")
+        aggregated_data['selected_business_type'].append(data.selected_business_type)
         
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail="외부 API 호출 실패")
-            
-        analysis_result = response.json()['result']
+        # 나머지 필드들 추가
+        for key in aggregated_data.keys():
+            if key not in ['avg_sales_level', 'selected_business_type']:
+                aggregated_data[key].append(getattr(row, key))
+    
+    # 필요한 메타데이터를 aggregated_data에 포함
+    data_to_save = aggregated_data
+    
+    # 리포트 로그에 추가 (파일 기록은 백그라운드 스레드에서 수행)
+    report_id = report_log.append('vacant', data_to_save)
+
+    return data_to_save, report_id
+
+@app.post("/api/save-vacant-report/")
+async def save_vacant_report(data: VacantReportData, db: AsyncSession = Depends(get_async_db)):
+    """공실 분석 리포트 데이터 저장"""
+    try:
+        data_to_save, report_id = await prepare_vacant_report(data, db)
+
+        analysis_result, cached = await analyze_with_cache("/ma/analyze1", data_to_save, data.bypass_cache)
         
         return {
             "status": "success",
-            "filename": filename,
-            "analysis": analysis_result
+            "report_id": report_id,
+            "analysis": analysis_result,
+            "cached": cached
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": "5"})
+    except InferenceError as e:
+        print(f"리포트 데이터 저장 중 오류 발생: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         print(f"리포트 데이터 저장 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/save-store-report/")
-def save_store_report(data: StoreReportData, db: Session = Depends(get_db)):
-    """상가 분석 리포트 데이터 저장"""
-    try:
-        # 가장 가까운 상가 3개 검색 (위도/경도 중복 제외)
-        nearest_query = text("""
-            WITH ranked_locations AS (
-                SELECT 
-                    id,
-                    latitude,
-                    longitude,
-                    industry_category,
-                    sales_level,
-                    ST_Distance_Sphere(coordinates, ST_GeomFromText(:point)) as distance,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY latitude, longitude 
-                        ORDER BY id
-                    ) as rn
-                FROM commercial_buildings
-                WHERE industry_category = :business_type
-            )
+async def prepare_store_report(data: StoreReportData, db: AsyncSession):
+    """상가 리포트 입력 데이터 집계 및 로그 저장"""
+    # 가장 가까운 상가 3개 검색 (위도/경도 중복 제외)
+    nearest_query = f"""
+        WITH ranked_locations AS (
             SELECT 
-                c.*,
-                r.distance
-            FROM commercial_buildings c
-            JOIN (
-                SELECT id, distance
-                FROM ranked_locations
-                WHERE rn = 1
-                ORDER BY distance
-                LIMIT 3
-            ) r ON c.id = r.id
-            ORDER BY r.distance;
-        """)
-        
-        point = f'POINT({data.lng} {data.lat})'
-        result = db.execute(nearest_query, {
-            'point': point,
+                id,
+                latitude,
+                longitude,
+                industry_category,
+                sales_level,
+                ST_Distance_Sphere(coordinates, {SEARCH_POINT}) as distance,
+                ROW_NUMBER() OVER (
+                    PARTITION BY latitude, longitude 
+                    ORDER BY id
+                ) as rn
+            FROM commercial_buildings
+            WHERE industry_category = :business_type
+            AND {{spatial_filter}}
+        )
+        SELECT 
+            c.*,
+            r.distance
+        FROM commercial_buildings c
+        JOIN (
+            SELECT id, distance
+            FROM ranked_locations
+            WHERE rn = 1
+            ORDER BY distance
+            LIMIT 3
+        ) r ON c.id = r.id
+        ORDER BY r.distance;
+    """
+    
+    # 중복 좌표 제거 테이블이 준비되어 있으면 전체 테이블 윈도 함수 대신 사용
+    if await db.run_sync(has_unique_locations, 'store_locations'):
+        result = await fetch_nearest(db, 'nearest-locations-store', NEAREST_STORE_LOCATIONS_QUERY, {
             'business_type': data.selected_business_type
-        })
-        
-        # 데이터를 컬럼별로 묶기
-        aggregated_data = {
-            '매출등급': [],
-            '대분류업종': [],
-            '대분류업종코드': [],
-            'distance': [],
-            'gongsil_latitude': [],
-            'gongsil_longitude': [],
-            
-            # 주변 시설 정보
-            'num_of_company': [],
-            'num_of_large': [],
-            'num_of_bus_stop': [],
-            'num_of_hospital': [],
-            'num_of_theather': [],
-            'num_of_camp': [],
-            'num_of_school(near 500m)': [],
-            
-            # 지하철 정보
-            'nearest_subway_name': [],
-            'nearest_subway_distance': [],
-            'num_of_subway': [],
-            
-            # 기타 시설
-            'num_of_gvn_office(near 500m)': [],
-            'parks_within_500m': [],
-            'parking_lots_within_500m': [],
-            
-            # 대학교 거리별 수
-            'university_within_0m_500m': [],
-            'university_within_500m_1000m': [],
-            'university_within_1000m_1500m': [],
-            'university_within_1500m_2000m': []
-        }
-        
-        for row in result:
-            for key in aggregated_data.keys():
-                if key not in ['gongsil_latitude', 'gongsil_longitude']:  # 공실 좌표는 별도 처리
-                    if key == '매출등급':
-                        aggregated_data[key].append(getattr(row, 'sales_level'))
-                    elif key == '대분류업종':
-                        aggregated_data[key].append(getattr(row, 'industry_category'))
-                    elif key == '대분류업종코드':
-                        aggregated_data[key].append(getattr(row, 'industry_code'))
-                    elif key == 'num_of_school(near 500m)':
-                        aggregated_data[key].append(getattr(row, 'num_of_school'))
-                    elif key == 'num_of_gvn_office(near 500m)':  # num_of_gvn_office 데이터 매핑
-                        aggregated_data[key].append(getattr(row, 'num_of_gvn_office'))
-                    else:
-                        aggregated_data[key].append(getattr(row, key))
-            # distance는 result의 distance 값을 사용
-            aggregated_data['distance'][-1] = row.distance
-            # 공실 좌표 추가
-            aggregated_data['gongsil_latitude'].append(data.lat)
-            aggregated_data['gongsil_longitude'].append(data.lng)
+        }, data.lat, data.lng, 3)
+    else:
+        result = await fetch_nearest(db, 'ranked-locations-store', nearest_query, {
+            'business_type': data.selected_business_type
+        }, data.lat, data.lng, 3)
+    
+    # 데이터를 컬럼별로 묶기
+    aggregated_data = {
+        '매출등급': [],
+        '대분류업종': [],
+        '대분류업종코드': [],
+        'distance': [],
+        'gongsil_latitude': [],
+        'gongsil_longitude': [],
         
-        # 필요한 메타데이터를 aggregated_data에 포함
-        data_to_save = aggregated_data
+        # 주변 시설 정보
+        'num_of_company': [],
+        'num_of_large': [],
+        'num_of_bus_stop': [],
+        'num_of_hospital': [],
+        'num_of_theather': [],
+        'num_of_camp': [],
+        'num_of_school(near 500m)': [],
         
-        # data 디렉토리가 없으면 생성
-        os.makedirs('data/collected_samples', exist_ok=True)
+        # 지하철 정보
+        'nearest_subway_name': [],
+        'nearest_subway_distance': [],
+        'num_of_subway': [],
         
-        # 파일명에 타임스탬프 포함
-        filename = f'data/collected_samples/store_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+        # 기타 시설
+        'num_of_gvn_office(near 500m)': [],
+        'parks_within_500m': [],
+        'parking_lots_within_500m': [],
         
-        # JSON 파일 저장
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, separators=(',', ':'))
-
-        # API 호출 - HTTP 프로토콜 사용
-        response = requests.post(
-            "http://213.173.110.34:17618/ma/analyze2",  # RunPod의 HTTP 포트(8000) 사용
-            json=data_to_save,
-            headers={'Content-Type': 'application/json'}  # HTTP 헤더 명시
-        )
+        # 대학교 거리별 수
+        'university_within_0m_500m': [],
+        'university_within_500m_1000m': [],
+        'university_within_1000m_1500m': [],
+        'university_within_1500m_2000m': []
+    }
+    
+    for row in result:
+        for key in aggregated_data.keys():
+            if key not in ['gongsil_latitude', 'gongsil_longitude']:  # 공실 좌표는 별도 처리
+                if key == '매출등급':
+                    aggregated_data[key].append(getattr(row, 'sales_level'))
+                elif key == '대분류업종':
+                    aggregated_data[key].append(getattr(row, 'industry_category'))
+                elif key == '대분류업종코드':
+                    aggregated_data[key].append(getattr(row, 'industry_code'))
+                elif key == 'num_of_school(near 500m)':
+                    aggregated_data[key].append(getattr(row, 'num_of_school'))
+                elif key == 'num_of_gvn_office(near 500m)':  # num_of_gvn_office 데이터 매핑
+                    aggregated_data[key].append(getattr(row, 'num_of_gvn_office'))
+                else:
+                    aggregated_data[key].append(getattr(row, key))
+        # distance는 result의 distance 값을 사용
+        aggregated_data['distance'][-1] = row.distance
+        # 공실 좌표 추가
+        aggregated_data['gongsil_latitude'].append(data.lat)
+        aggregated_data['gongsil_longitude'].append(data.lng)
+    
+    # 필요한 메타데이터를 aggregated_data에 포함
+    data_to_save = aggregated_data
+    
+    # 리포트 로그에 추가 (파일 기록은 백그라운드 스레드에서 수행)
+    report_id = report_log.append('store', data_to_save)
 
-        if not response.ok:
-            raise HTTPException(status_code=response.status_code, detail="외부 API 호출 실패")
-            
-        analysis_result = response.json()['result']
+    return data_to_save, report_id
+
+@app.post("/api/save-store-report/")
+async def save_store_report(data: StoreReportData, db: AsyncSession = Depends(get_async_db)):
+    """상가 분석 리포트 데이터 저장"""
+    try:
+        data_to_save, report_id = await prepare_store_report(data, db)
+
+        analysis_result, cached = await analyze_with_cache("/ma/analyze2", data_to_save, data.bypass_cache)
         
         return {
             "status": "success",
-            "filename": filename,
-            "analysis": analysis_result
+            "report_id": report_id,
+            "analysis": analysis_result,
+            "cached": cached
         }
         
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": "5"})
+    except InferenceError as e:
+        print(f"상가 리포트 데이터 저장 중 오류 발생: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         print(f"상가 리포트 데이터 저장 중 오류 발생: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+async def run_with_session(prepare, data):
+    """작업 워커용: 별도 세션으로 리포트 입력 데이터 준비"""
+    async with AsyncSessionLocal() as db:
+        return await prepare(data, db)
+
+async def run_vacant_report_job(data: VacantReportData, progress):
+    await progress('aggregating')
+    data_to_save, report_id = await run_with_session(prepare_vacant_report, data)
+    await progress('generating')
+    analysis_result, cached = await analyze_with_cache("/ma/analyze1", data_to_save, data.bypass_cache)
+    return {"status": "success", "report_id": report_id, "analysis": analysis_result, "cached": cached}
+
+async def run_store_report_job(data: StoreReportData, progress):
+    await progress('aggregating')
+    data_to_save, report_id = await run_with_session(prepare_store_report, data)
+    await progress('generating')
+    analysis_result, cached = await analyze_with_cache("/ma/analyze2", data_to_save, data.bypass_cache)
+    return {"status": "success", "report_id": report_id, "analysis": analysis_result, "cached": cached}
+
+report_jobs.register('vacant', VacantReportData, run_vacant_report_job)
+report_jobs.register('store', StoreReportData, run_store_report_job)
+
+# SSE 스트림에서 상태를 다시 확인하는 최대 간격 (초)
+JOB_EVENT_INTERVAL = 15
+
+async def submit_report_job(kind: str, data: BaseModel, response: Response):
+    try:
+        job = await report_jobs.submit(kind, data)
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="리포트 작업 대기열이 가득 찼습니다", headers={"Retry-After": "10"})
+    except JobQueueUnavailable:
+        raise HTTPException(status_code=503, detail="리포트 작업 워커를 사용할 수 없습니다")
+    except Exception as e:
+        print(f"리포트 작업 등록 중 오류 발생: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    response.status_code = 202
+    return {
+        **job,
+        "status_url": f"/api/report-jobs/{job['job_id']}",
+        "events_url": f"/api/report-jobs/{job['job_id']}/events"
+    }
+
+@app.post("/api/report-jobs/vacant")
+async def create_vacant_report_job(data: VacantReportData, response: Response):
+    """공실 분석 리포트 작업 등록 (작업 id 즉시 반환)"""
+    return await submit_report_job('vacant', data, response)
+
+@app.post("/api/report-jobs/store")
+async def create_store_report_job(data: StoreReportData, response: Response):
+    """상가 분석 리포트 작업 등록 (작업 id 즉시 반환)"""
+    return await submit_report_job('store', data, response)
+
+@app.get("/api/report-jobs/{job_id}")
+async def get_report_job(job_id: str):
+    """리포트 작업 상태 및 결과 조회"""
+    job = await report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    return job
+
+@app.get("/api/report-jobs/{job_id}/events")
+async def stream_report_job(job_id: str, request: Request):
+    """리포트 작업 진행 상황 SSE 스트림 (종료 상태가 되면 스트림 종료)"""
+    job = await report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+
+    async def events():
+        last = None
+        current = job
+        while True:
+            snapshot = (current['status'], current['stage'])
+            if snapshot != last:
+                last = snapshot
+                yield f"event: {current['status']}\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if current['status'] in TERMINAL_STATUSES or await request.is_disconnected():
+                break
+            await report_jobs.wait_for_update(job_id, JOB_EVENT_INTERVAL)
+            current = await report_jobs.get(job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
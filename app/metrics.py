@@ -0,0 +1,88 @@
+import os
+import time
+from prometheus_client import (
+    CollectorRegistry, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# 여러 워커 프로세스로 실행할 때는 PROMETHEUS_MULTIPROC_DIR을 지정하면 합산된 값을 노출
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# 지도 API는 수 ms ~ 수 초, 추론은 수십 초까지 걸림
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+INFERENCE_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180)
+ROW_BUCKETS = (0, 1, 3, 10, 30, 100, 300, 1000, 3000, 10000, 30000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', '엔드포인트별 응답 시간',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+SQL_QUERY_DURATION = Histogram(
+    'sql_query_duration_seconds', '이름 붙인 SQL 문 실행 시간',
+    ['statement'], buckets=LATENCY_BUCKETS
+)
+SQL_ROWS_RETURNED = Histogram(
+    'sql_rows_returned', '이름 붙인 SQL 문이 반환한 행 수',
+    ['statement'], buckets=ROW_BUCKETS
+)
+INFERENCE_DURATION = Histogram(
+    'inference_request_duration_seconds', '추론 서버 호출 시간 (재시도 포함)',
+    ['endpoint', 'outcome'], buckets=INFERENCE_BUCKETS
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', '커넥션 풀에서 커넥션을 얻기까지 걸린 시간',
+    ['engine'], buckets=LATENCY_BUCKETS
+)
+POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', '사용 중인 커넥션 수', ['engine'], multiprocess_mode='livesum'
+)
+
+def timed_pool(base, name: str):
+    """커넥션 획득 대기 시간을 기록하는 풀 클래스 생성"""
+
+    class TimedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                POOL_CHECKOUT_WAIT.labels(name).observe(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+TimedQueuePool = timed_pool(QueuePool, 'sync')
+TimedAsyncQueuePool = timed_pool(AsyncAdaptedQueuePool, 'async')
+
+def instrument_engine(engine, name: str):
+    """metric_name 실행 옵션이 붙은 SQL 문의 실행 시간/행 수와 풀 사용량 기록"""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metric_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        statement_name = context.execution_options.get('metric_name', 'unnamed')
+        SQL_QUERY_DURATION.labels(statement_name).observe(time.perf_counter() - context._metric_start)
+        # 서버 사이드 커서는 실행 시점에 행 수를 알 수 없음
+        if cursor.description is not None and cursor.rowcount >= 0 \
+                and not context.execution_options.get('stream_results'):
+            SQL_ROWS_RETURNED.labels(statement_name).observe(cursor.rowcount)
+
+    @event.listens_for(engine, 'checkout')
+    def count_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKED_OUT.labels(name).inc()
+
+    @event.listens_for(engine, 'checkin')
+    def count_checkin(dbapi_connection, connection_record):
+        POOL_CHECKED_OUT.labels(name).dec()
+
+def render_metrics():
+    """Prometheus 텍스트 형식의 (본문, 미디어 타입)"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime
 from .database import Base
 from geoalchemy2 import Geometry
 
@@ -12,7 +12,7 @@ class CommercialBuilding(Base):
     address = Column(String(200), nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
-    coordinates = Column(Geometry('POINT'), nullable=True)
+    coordinates = Column(Geometry('POINT', srid=4326, spatial_index=True), nullable=False)
     
     # 주변 시설 정보
     num_of_company = Column(Integer, nullable=True)  # 3km 내 기업 수
@@ -47,7 +47,7 @@ class VacantListing(Base):
     id = Column(Integer, primary_key=True, index=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
-    coordinates = Column(Geometry('POINT'), nullable=True)
+    coordinates = Column(Geometry('POINT', srid=4326, spatial_index=True), nullable=False)
     
     # 주변 시설 정보
     num_of_company = Column(Integer, nullable=True)  # 3km 내 기업 수
@@ -75,3 +75,66 @@ class VacantListing(Base):
     university_within_1500m_2000m = Column(Integer, nullable=True)
 
     __table_args__ = {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'}
+
+class VacantSalesAggregate(Base):
+    """공실 × 업종 × 반경별 주변 상가 매출등급 집계"""
+    __tablename__ = 'vacant_sales_aggregates'
+
+    vacant_id = Column(Integer, primary_key=True)
+    industry_category = Column(String(100), primary_key=True)
+    radius = Column(Integer, primary_key=True)          # 검색 반경 (m)
+    store_count = Column(Integer, nullable=False)       # 숫자 매출등급을 가진 상가 수
+    sales_level_sum = Column(Integer, nullable=False)   # 매출등급 합계
+
+    __table_args__ = {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'}
+
+class VacantLocation(Base):
+    """좌표가 같은 공실을 하나로 합친 위치 목록 (대표 id = 가장 작은 id)"""
+    __tablename__ = 'vacant_locations'
+
+    vacant_id = Column(Integer, primary_key=True)       # 대표 공실 id
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    listing_count = Column(Integer, nullable=False)     # 같은 좌표의 공실 수
+    coordinates = Column(Geometry('POINT', srid=4326, spatial_index=True), nullable=False)
+
+    __table_args__ = {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'}
+
+class StoreLocation(Base):
+    """업종별로 좌표가 같은 상가를 하나로 합친 위치 목록 (대표 id = 가장 작은 id)"""
+    __tablename__ = 'store_locations'
+
+    store_id = Column(Integer, primary_key=True)        # 대표 상가 id
+    industry_category = Column(String(100), nullable=False, index=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    store_count = Column(Integer, nullable=False)       # 같은 업종/좌표의 상가 수
+    coordinates = Column(Geometry('POINT', srid=4326, spatial_index=True), nullable=False)
+
+    __table_args__ = {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'}
+
+class ReportJob(Base):
+    """비동기 리포트 작업 (재시작 시 대기 중 작업 복구용)"""
+    __tablename__ = 'report_jobs'
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(20), nullable=False)            # vacant | store
+    status = Column(String(20), nullable=False, index=True)  # queued | running | succeeded | failed
+    stage = Column(String(50), nullable=True)            # 진행 단계
+    request = Column(Text, nullable=False)               # 요청 JSON
+    result = Column(Text, nullable=True)                 # 결과 JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'}
+
+class DataVersion(Base):
+    """상가/공실 데이터 버전 (임포트 시 증가, ETag 및 인덱스 갱신 판단용)"""
+    __tablename__ = 'data_versions'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+    __table_args__ = {'mysql_engine': 'InnoDB', 'mysql_charset': 'utf8mb4'}
@@ -0,0 +1,145 @@
+import threading
+import numpy as np
+
+# 클러스터를 미리 계산하는 줌 범위, 이보다 크게 확대하면 개별 좌표 반환
+MIN_CLUSTER_ZOOM = 5
+MAX_CLUSTER_ZOOM = 16
+# 개별 좌표로 반환할 최대 상가+공실 수 (넘으면 MAX_CLUSTER_ZOOM 클러스터로 반환)
+MAX_RAW_POINTS = 2000
+# 256px 타일 한 변을 나누는 셀 수 (셀 하나 = 64px)
+CELLS_PER_TILE = 4
+
+def mercator_cells(lats, lngs, zoom):
+    """위도/경도를 해당 줌의 웹 메르카토르 격자 셀 좌표로 변환"""
+    scale = (2 ** zoom) * CELLS_PER_TILE
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -85.0511, 85.0511)
+    lat_rad = np.radians(lats)
+    x = (np.asarray(lngs, dtype=np.float64) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * scale
+    return np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+
+def numeric_sales_levels(values):
+    """문자열 매출등급을 숫자로 변환 (숫자가 아니면 NaN)"""
+    return np.array(
+        [float(v) if isinstance(v, str) and v.isdigit() else np.nan for v in values],
+        dtype=np.float64
+    )
+
+class ClusterLayer:
+    """한 테이블의 줌별 격자 집계"""
+
+    def __init__(self, points, with_categories=False):
+        self.points = points
+        self.levels = {}
+        self.categories = []
+        category_codes = sales = None
+        if with_categories and len(points):
+            values = np.array(['' if c is None else c for c in points.columns['industry_category']], dtype=object)
+            self.categories, category_codes = np.unique(values, return_inverse=True)
+            self.categories = self.categories.tolist()
+            sales = numeric_sales_levels(points.columns['sales_level'])
+
+        for zoom in range(MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1):
+            self.levels[zoom] = self._build_level(zoom, category_codes, sales)
+
+    def _build_level(self, zoom, category_codes, sales):
+        if not len(self.points):
+            return None
+        cx, cy = mercator_cells(self.points.lats, self.points.lngs, zoom)
+        cells, inverse = np.unique(np.stack([cx, cy], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n = len(cells)
+
+        level = {
+            'cell_x': cells[:, 0],
+            'cell_y': cells[:, 1],
+            'count': np.bincount(inverse, minlength=n),
+            'latitude': np.bincount(inverse, weights=self.points.lats, minlength=n),
+            'longitude': np.bincount(inverse, weights=self.points.lngs, minlength=n),
+        }
+        level['latitude'] /= level['count']
+        level['longitude'] /= level['count']
+
+        if category_codes is not None:
+            histogram = np.zeros((n, len(self.categories)), dtype=np.int64)
+            np.add.at(histogram, (inverse, category_codes), 1)
+            level['categories'] = histogram
+            valid = ~np.isnan(sales)
+            level['sales_sum'] = np.bincount(inverse[valid], weights=sales[valid], minlength=n)
+            level['sales_count'] = np.bincount(inverse[valid], minlength=n)
+        return level
+
+    def clusters(self, zoom, south, west, north, east):
+        level = self.levels.get(zoom)
+        if level is None:
+            return []
+        x0, y1 = mercator_cells([south], [west], zoom)
+        x1, y0 = mercator_cells([north], [east], zoom)
+        mask = ((level['cell_x'] >= x0[0]) & (level['cell_x'] <= x1[0])
+                & (level['cell_y'] >= y0[0]) & (level['cell_y'] <= y1[0]))
+        selected = np.flatnonzero(mask)
+
+        result = []
+        for i, count, lat, lng in zip(selected.tolist(), level['count'][selected].tolist(),
+                                      level['latitude'][selected].tolist(), level['longitude'][selected].tolist()):
+            cluster = {'count': count, 'latitude': lat, 'longitude': lng}
+            if 'categories' in level:
+                row = level['categories'][i]
+                cluster['categories'] = {
+                    self.categories[c]: int(row[c]) for c in np.flatnonzero(row) if self.categories[c]
+                }
+                sales_count = level['sales_count'][i]
+                cluster['avg_sales_level'] = round(float(level['sales_sum'][i] / sales_count), 2) if sales_count else None
+            result.append(cluster)
+        return result
+
+    def bbox_positions(self, south, west, north, east):
+        return self.points.query_bbox(south, west, north, east)
+
+    def raw_points(self, positions, fields):
+        return self.points.rows(positions, None, fields)
+
+class ClusterGrid:
+    """상가/공실 좌표의 계층적 격자 클러스터 (공간 인덱스 로드 후 구축)"""
+
+    def __init__(self):
+        self.stores = None
+        self.vacants = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.stores is not None and self.vacants is not None
+
+    def build(self, index):
+        with self._lock:
+            stores = ClusterLayer(index.stores, with_categories=True)
+            vacants = ClusterLayer(index.vacants)
+            self.stores, self.vacants = stores, vacants
+
+    def query(self, south, west, north, east, zoom):
+        stores, vacants = self.stores, self.vacants
+        if zoom > MAX_CLUSTER_ZOOM:
+            store_positions = stores.bbox_positions(south, west, north, east)
+            vacant_positions = vacants.bbox_positions(south, west, north, east)
+            if len(store_positions) + len(vacant_positions) <= MAX_RAW_POINTS:
+                return {
+                    'zoom': zoom,
+                    'clustered': False,
+                    'commercial_buildings': stores.raw_points(
+                        store_positions, ['industry_category', 'latitude', 'longitude', 'sales_level']
+                    ),
+                    'vacant_listings': vacants.raw_points(vacant_positions, ['latitude', 'longitude'])
+                }
+            # 확대했어도 화면 영역이 넓어 좌표가 너무 많으면 가장 세밀한 클러스터로 응답
+            zoom = MAX_CLUSTER_ZOOM
+
+        zoom = max(zoom, MIN_CLUSTER_ZOOM)
+        return {
+            'zoom': zoom,
+            'clustered': True,
+            'commercial_buildings': stores.clusters(zoom, south, west, north, east),
+            'vacant_listings': vacants.clusters(zoom, south, west, north, east)
+        }
+
+cluster_grid = ClusterGrid()
@@ -0,0 +1,123 @@
+import heapq
+import hmac
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import parse_qs, parse_qsl, urlencode
+from starlette.datastructures import Headers
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # pyinstrument가 없으면 프로파일링 비활성화
+    Profiler = None
+
+# 이 값과 같은 X-Profile 헤더 또는 profile 쿼리 파라미터가 있는 요청만 프로파일링 (미설정 시 비활성화)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# 샘플링 간격 (초)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+# 보관할 가장 느린 요청 프로파일 수
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+
+PROFILE_HEADER = 'x-profile'
+PROFILE_PARAM = 'profile'
+
+def is_authorized(token: str | None):
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def profile_requested(scope):
+    """X-Profile 헤더 또는 profile 쿼리 파라미터로 권한 있는 프로파일링 요청인지 확인"""
+    headers = Headers(scope=scope)
+    token = headers.get(PROFILE_HEADER) or parse_qs(scope['query_string'].decode('latin-1')).get(PROFILE_PARAM, [None])[0]
+    return is_authorized(token)
+
+class ProfileStore:
+    """가장 느린 N개 요청의 speedscope 프로파일을 보관하는 링 버퍼"""
+
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = keep
+        self._heap = []
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: dict, profile: str):
+        """느린 순 상위 keep개 안에 들면 저장, 저장 여부 반환"""
+        entry = (record['duration'], record['profile_id'])
+        with self._lock:
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                _, evicted = heapq.heapreplace(self._heap, entry)
+                self._profiles.pop(evicted, None)
+            else:
+                return False
+            self._profiles[record['profile_id']] = (record, profile)
+            return True
+
+    def list(self):
+        with self._lock:
+            records = [record for record, _ in self._profiles.values()]
+        return sorted(records, key=lambda r: r['duration'], reverse=True)
+
+    def get(self, profile_id: str):
+        with self._lock:
+            entry = self._profiles.get(profile_id)
+        return entry[1] if entry else None
+
+profile_store = ProfileStore()
+
+class ProfilingMiddleware:
+    """권한 있는 요청만 샘플링 프로파일러로 감싸는 ASGI 미들웨어 (그 외 요청은 그대로 통과)
+
+    스레드풀에서 실행되는 동기 엔드포인트의 내부 함수는 샘플링되지 않음
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILE_TOKEN or scope['type'] != 'http' or Profiler is None or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # 응답 전송까지 프로파일에 포함되도록 메시지를 모았다가 헤더를 붙여 내보냄
+        messages = []
+
+        async def buffer(message):
+            messages.append(message)
+
+        profiler = Profiler(interval=PROFILE_INTERVAL, async_mode='enabled')
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, buffer)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - start
+
+        status = next((m['status'] for m in messages if m['type'] == 'http.response.start'), 500)
+        record = {
+            'profile_id': uuid.uuid4().hex,
+            'method': scope['method'],
+            'path': scope['path'],
+            # 토큰은 기록하지 않음
+            'query': urlencode([
+                (k, v) for k, v in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+                if k != PROFILE_PARAM
+            ]),
+            'status': status,
+            'duration': round(duration, 6),
+            'created_at': datetime.now().isoformat(timespec='seconds')
+        }
+        stored = profile_store.add(record, profiler.output(renderer=SpeedscopeRenderer()))
+
+        for message in messages:
+            if message['type'] == 'http.response.start':
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', f'app;dur={duration * 1000:.1f}'.encode()))
+                if stored:
+                    headers.append((b'x-profile-id', record['profile_id'].encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
@@ -0,0 +1,62 @@
+import os
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+# 세션 하나가 다룰 수 있는 최대 반경 (m)
+RADIUS_SESSION_MAX_RADIUS = float(os.getenv("RADIUS_SESSION_MAX_RADIUS", "5000"))
+# 처음 이웃을 모을 때의 최소 반경 (m), 반경을 넓히면 두 배씩 다시 모음
+RADIUS_SESSION_MIN_GATHER = 1000.0
+
+class NeighborList:
+    """(거리, id) 순으로 정렬된 이웃 목록 (rows(positions)는 해당 순번 행 dict 목록)"""
+
+    def __init__(self, ids, distances, rows):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.rows = rows
+
+    def count_within(self, radius):
+        return int(np.searchsorted(self.distances, radius, side='right'))
+
+class RadiusSession:
+    """클릭 좌표 하나의 거리순 이웃 목록과 현재 반경을 보관하고 반경 변경분만 계산
+
+    gather(lat, lng, radius, industry_category)는 반경 내 NeighborList를 반환하는 코루틴
+    """
+
+    def __init__(self, lat, lng, industry_category, gather):
+        self.lat = lat
+        self.lng = lng
+        self.industry_category = industry_category
+        self.gather = gather
+        self.neighbors = None
+        self.gathered_radius = 0.0
+        self.radius = 0.0
+        self.count = 0
+
+    async def update(self, radius):
+        """반경을 바꾸고 {radius, added: 새로 포함된 행, removed: 빠진 id, total} 반환"""
+        radius = min(max(radius, 0.0), RADIUS_SESSION_MAX_RADIUS)
+        shown = None
+        if self.neighbors is None or radius > self.gathered_radius:
+            if self.neighbors is not None:
+                shown = self.neighbors.ids[:self.count]
+            gather_radius = min(max(radius, self.gathered_radius * 2, RADIUS_SESSION_MIN_GATHER),
+                                RADIUS_SESSION_MAX_RADIUS)
+            self.neighbors = await self.gather(self.lat, self.lng, gather_radius, self.industry_category)
+            self.gathered_radius = gather_radius
+
+        neighbors = self.neighbors
+        count = neighbors.count_within(radius)
+        # 행 dict 생성은 처음 모을 때 수천 건이 될 수 있어 이벤트 루프 밖에서 수행
+        if shown is not None and not np.array_equal(neighbors.ids[:len(shown)], shown):
+            # 정렬 기준이 (거리, id)라 보통은 다시 모아도 앞부분이 같지만, 그사이 데이터가 바뀌었으면 id로 비교
+            current = neighbors.ids[:count]
+            added = await run_in_threadpool(neighbors.rows, np.flatnonzero(~np.isin(current, shown)))
+            removed = shown[~np.isin(shown, current)].tolist()
+        elif count >= self.count:
+            added, removed = await run_in_threadpool(neighbors.rows, np.arange(self.count, count)), []
+        else:
+            added, removed = [], neighbors.ids[count:self.count].tolist()
+        self.radius, self.count = radius, count
+        return {'radius': radius, 'added': added, 'removed': removed, 'total': count}
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import text, update
+from . import models
+from .database import AsyncSessionLocal, async_engine
+from .inference_client import InferenceQueueFull
+
+# 리포트 작업 워커 설정
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_MAX_QUEUED = int(os.getenv("REPORT_JOB_MAX_QUEUED", "200"))
+# 이 시간 이상 갱신이 없는 running/queued 작업은 맡은 프로세스가 죽은 것으로 보고 이 프로세스 대기열에 넣음
+REPORT_JOB_STALE_AFTER = timedelta(seconds=int(os.getenv("REPORT_JOB_STALE_AFTER", "600")))
+# 실행 중인 작업의 updated_at을 갱신하는 간격 (초), STALE_AFTER보다 충분히 짧아야 함
+REPORT_JOB_HEARTBEAT = float(os.getenv("REPORT_JOB_HEARTBEAT", "60"))
+# 추론 대기열이 가득 찼을 때 재시도 간격 (초)
+REPORT_JOB_RETRY_DELAY = float(os.getenv("REPORT_JOB_RETRY_DELAY", "5"))
+
+TERMINAL_STATUSES = {'succeeded', 'failed'}
+
+class JobQueueFull(Exception):
+    """리포트 작업 대기열이 가득 참"""
+
+class JobQueueUnavailable(Exception):
+    """리포트 작업 워커가 시작되지 않음"""
+
+def job_to_dict(job):
+    return {
+        'job_id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'stage': job.stage,
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'updated_at': job.updated_at.isoformat()
+    }
+
+class ReportJobManager:
+    """DB에 저장되는 리포트 작업 대기열과 고정 크기 워커 풀"""
+
+    def __init__(self, workers: int = REPORT_JOB_WORKERS, max_queued: int = REPORT_JOB_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._runners = {}
+        self._queue = None
+        self._tasks = []
+        self._updates = {}
+        self._waiters = Counter()
+        self._running = set()
+
+    def register(self, kind: str, model, runner):
+        """작업 종류별 요청 모델과 실행 함수 runner(data, progress) 등록"""
+        self._runners[kind] = (model, runner)
+
+    async def start(self):
+        job_ids = await self._recover()
+        self._queue = asyncio.Queue()
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        # 실행 중이던 작업은 queued로 되돌려 다음 시작 시(또는 다른 프로세스가) 이어서 처리
+        interrupted = set(self._running)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job_id in interrupted:
+            try:
+                await self._set(job_id, 'running', status='queued', stage='queued')
+            except Exception as e:
+                print(f"리포트 작업 되돌리기 중 오류 발생 ({job_id}): {e}")
+
+    async def submit(self, kind: str, data):
+        if self._queue is None:
+            raise JobQueueUnavailable()
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull()
+        job = await self._create(kind, data.json())
+        self._queue.put_nowait(job['job_id'])
+        return job
+
+    async def get(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.ReportJob, job_id)
+            return job_to_dict(job) if job else None
+
+    async def wait_for_update(self, job_id: str, timeout: float):
+        """작업 상태 변경 알림을 최대 timeout초 대기 (다른 프로세스 변경은 타임아웃 후 재조회로 반영)"""
+        event = self._updates.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            event.clear()
+            # 기다리는 쪽이 없으면 알림 객체를 바로 정리 (종료됐거나 없는 작업 id가 쌓이지 않게 함)
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                if self._updates.get(job_id) is event:
+                    del self._updates[job_id]
+
+    def _notify(self, job_id: str, finished: bool = False):
+        # 종료된 작업은 대기 중인 쪽을 깨운 뒤 알림 객체를 정리
+        event = self._updates.pop(job_id, None) if finished else self._updates.get(job_id)
+        if event is not None:
+            event.set()
+
+    async def _create(self, kind: str, request: str):
+        now = datetime.utcnow()
+        job = models.ReportJob(
+            id=uuid.uuid4().hex, kind=kind, status='queued', stage='queued',
+            request=request, created_at=now, updated_at=now
+        )
+        async with AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+            return job_to_dict(job)
+
+    async def _recover(self):
+        """테이블 생성 후 대기 중이거나 중단된 작업 id를 생성 순서대로 반환"""
+        async with async_engine.begin() as connection:
+            await connection.run_sync(models.ReportJob.__table__.create, checkfirst=True)
+            await connection.execute(text("""
+                UPDATE report_jobs
+                SET status = 'queued', stage = 'queued', updated_at = :now
+                WHERE status = 'running' AND updated_at < :stale_before
+            """), {'now': datetime.utcnow(), 'stale_before': datetime.utcnow() - REPORT_JOB_STALE_AFTER})
+            result = await connection.execute(text("""
+                SELECT id FROM report_jobs WHERE status = 'queued' ORDER BY created_at
+            """))
+            job_ids = [row.id for row in result]
+        if job_ids:
+            print(f"대기 중인 리포트 작업 {len(job_ids)}개 복구")
+        return job_ids
+
+    async def _requeue_stale(self):
+        """갱신이 끊긴 running 작업과 오래 대기한 queued 작업을 queued로 다시 표시하고 이 프로세스가 회수한 id 반환
+
+        queued 작업은 접수한 프로세스의 메모리 대기열에만 들어 있어, 그 프로세스가 죽으면 재시작 전까지 아무도 실행하지 않음
+        """
+        stale_before = datetime.utcnow() - REPORT_JOB_STALE_AFTER
+        async with async_engine.begin() as connection:
+            result = await connection.execute(text("""
+                SELECT id, status FROM report_jobs
+                WHERE status IN ('running', 'queued') AND updated_at < :stale_before
+                ORDER BY created_at
+            """), {'stale_before': stale_before})
+            job_ids = []
+            # 여러 프로세스가 동시에 정리해도 작업마다 한 곳에서만 회수 (updated_at을 갱신해 다음 주기까지 다시 회수되지 않음)
+            for row in result.fetchall():
+                requeued = await connection.execute(text("""
+                    UPDATE report_jobs SET status = 'queued', stage = 'queued', updated_at = :now
+                    WHERE id = :id AND status = :status AND updated_at < :stale_before
+                """), {'id': row.id, 'status': row.status, 'now': datetime.utcnow(), 'stale_before': stale_before})
+                if requeued.rowcount == 1:
+                    job_ids.append(row.id)
+        if job_ids:
+            print(f"중단되거나 방치된 리포트 작업 {len(job_ids)}개 회수")
+        return job_ids
+
+    async def _sweeper(self):
+        """다른 프로세스가 비정상 종료하며 남긴 running/queued 작업을 주기적으로 회수
+
+        아직 살아 있는 프로세스의 대기열에 있던 작업을 함께 가져와도 _run의 queued → running 선점으로 한 번만 실행됨
+        """
+        while True:
+            await asyncio.sleep(REPORT_JOB_STALE_AFTER.total_seconds() / 2)
+            try:
+                for job_id in await self._requeue_stale():
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                print(f"중단된 리포트 작업 회수 중 오류 발생: {e}")
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(REPORT_JOB_HEARTBEAT)
+            try:
+                await self._update(job_id, 'running')
+            except Exception as e:
+                print(f"리포트 작업 heartbeat 갱신 중 오류 발생 ({job_id}): {e}")
+
+    async def _update(self, job_id: str, expected_status: str | None = None, **values):
+        """작업 상태 갱신, expected_status가 주어지면 해당 상태일 때만 변경 (선점용)"""
+        values['updated_at'] = datetime.utcnow()
+        query = update(models.ReportJob).where(models.ReportJob.id == job_id)
+        if expected_status is not None:
+            query = query.where(models.ReportJob.status == expected_status)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(query.values(**values))
+            await db.commit()
+            return result.rowcount == 1
+
+    async def _set(self, job_id: str, expected_status: str | None = None, **values):
+        updated = await self._update(job_id, expected_status, **values)
+        self._notify(job_id, values.get('status') in TERMINAL_STATUSES)
+        return updated
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"리포트 작업 처리 중 오류 발생 ({job_id}): {e}")
+                try:
+                    await self._set(job_id, 'running', status='failed', stage='failed', error=str(e))
+                except Exception:
+                    pass
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        # 다른 워커/프로세스가 이미 가져간 작업이면 건너뜀
+        if not await self._set(job_id, 'queued', status='running', stage='started'):
+            return
+
+        self._running.add(job_id)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            await self._execute(job_id)
+        finally:
+            heartbeat.cancel()
+            self._running.discard(job_id)
+
+    async def _execute(self, job_id: str):
+        kind, request = await self._load_request(job_id)
+        model, runner = self._runners[kind]
+        data = model.parse_raw(request)
+
+        async def progress(stage: str):
+            await self._set(job_id, stage=stage)
+
+        while True:
+            try:
+                result = await runner(data, progress)
+                break
+            except InferenceQueueFull:
+                # 추론 대기열이 비워질 때까지 기다렸다가 다시 시도
+                await progress('waiting')
+                await asyncio.sleep(REPORT_JOB_RETRY_DELAY)
+            except Exception as e:
+                detail = getattr(e, 'detail', None) or str(e)
+                print(f"리포트 작업 실패 ({job_id}): {detail}")
+                await self._set(job_id, status='failed', stage='failed', error=str(detail))
+                return
+
+        await self._set(
+            job_id, status='succeeded', stage='done',
+            result=json.dumps(result, ensure_ascii=False)
+        )
+
+    async def _load_request(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.ReportJob, job_id)
+            return job.kind, job.request
+
+report_jobs = ReportJobManager()
@@ -0,0 +1,176 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# 리포트 로그 설정
+REPORT_LOG_DIR = os.getenv("REPORT_LOG_DIR", "data/collected_samples")
+REPORT_LOG_MAX_BYTES = int(os.getenv("REPORT_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+REPORT_LOG_MAX_AGE = float(os.getenv("REPORT_LOG_MAX_AGE", "3600"))
+REPORT_LOG_COMPRESS = os.getenv("REPORT_LOG_COMPRESS", "0") == "1"
+# 한 번에 모아서 쓰는 최대 레코드 수
+REPORT_LOG_BATCH = 256
+
+class ReportLog:
+    """리포트 입력 데이터를 백그라운드 스레드에서 회전 JSONL 세그먼트에 이어 쓰는 로그"""
+
+    def __init__(self, directory: str = REPORT_LOG_DIR, max_bytes: int = REPORT_LOG_MAX_BYTES,
+                 max_age: float = REPORT_LOG_MAX_AGE, compress: bool = REPORT_LOG_COMPRESS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._index = None
+
+        # 현재 세그먼트 (writer 스레드 전용)
+        self._file = None
+        self._segment = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+
+    def append(self, kind: str, data: dict):
+        """레코드를 대기열에 넣고 report_id를 바로 반환 (파일 I/O는 요청 경로 밖에서 수행)"""
+        self._ensure_started()
+        report_id = uuid.uuid4().hex
+        self._queue.put({
+            'report_id': report_id,
+            'kind': kind,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'data': data
+        })
+        return report_id
+
+    def get(self, report_id: str):
+        """인덱스로 세그먼트와 오프셋을 찾아 레코드 하나를 읽음 (아직 기록 전이면 None)"""
+        self._ensure_started()
+        with self._index_lock:
+            row = self._index.execute(
+                "SELECT segment, offset FROM report_index WHERE report_id = ?", (report_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        segment, offset = row
+        with self._open_segment(os.path.join(self.directory, segment)) as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def iter_records(self, kind: str | None = None):
+        """모든 세그먼트의 레코드를 기록 순서대로 순회 (학습 데이터 추출용)"""
+        self._ensure_started()
+        with self._index_lock:
+            segments = [row[0] for row in self._index.execute(
+                "SELECT segment FROM report_index GROUP BY segment ORDER BY MIN(rowid)"
+            )]
+        for segment in segments:
+            with self._open_segment(os.path.join(self.directory, segment)) as f:
+                try:
+                    for line in f:
+                        record = json.loads(line)
+                        if kind is None or record['kind'] == kind:
+                            yield record
+                except EOFError:
+                    # 아직 기록 중인 압축 세그먼트는 마지막으로 flush된 곳까지만 읽힘
+                    pass
+
+    def close(self):
+        """대기 중인 레코드를 모두 기록하고 세그먼트를 닫음"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._index = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), check_same_thread=False)
+            self._index.execute("""
+                CREATE TABLE IF NOT EXISTS report_index (
+                    report_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    segment TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            self._index.commit()
+            self._thread = threading.Thread(target=self._run, name='report-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _open_segment(self, path):
+        return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                records = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                records = []
+            # 밀린 레코드를 한 번에 모아서 기록
+            while records and len(records) < REPORT_LOG_BATCH:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in records:
+                stop = True
+                records = [r for r in records if r is not None]
+
+            try:
+                if records:
+                    self._write(records)
+                elif self._file is not None and time.time() - self._segment_opened >= self.max_age:
+                    self._close_segment()
+            except Exception as e:
+                print(f"리포트 로그 기록 중 오류 발생: {e}")
+        self._close_segment()
+
+    def _write(self, records):
+        entries = []
+        for record in records:
+            if self._file is None or self._segment_bytes >= self.max_bytes \
+                    or time.time() - self._segment_opened >= self.max_age:
+                self._rotate()
+            line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            entries.append((record['report_id'], record['kind'], self._segment, self._segment_bytes, record['created_at']))
+            self._file.write(line)
+            self._segment_bytes += len(line)
+        self._file.flush()
+
+        with self._index_lock:
+            self._index.executemany(
+                "INSERT OR REPLACE INTO report_index (report_id, kind, segment, offset, created_at) VALUES (?, ?, ?, ?, ?)",
+                entries
+            )
+            self._index.commit()
+
+    def _rotate(self):
+        self._close_segment()
+        suffix = '.jsonl.gz' if self.compress else '.jsonl'
+        self._segment = f"reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}{suffix}"
+        path = os.path.join(self.directory, self._segment)
+        self._file = gzip.open(path, 'wb') if self.compress else open(path, 'wb')
+        self._segment_bytes = 0
+        self._segment_opened = time.time()
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+report_log = ReportLog()
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 분석 결과 캐시 설정 (RESULT_CACHE_DB를 지정하면 디스크 캐시 사용)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB")
+
+def cache_key(endpoint: str, payload: dict):
+    """엔드포인트 이름과 정규화한 payload JSON의 SHA-256"""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """메모리 LRU(TTL) + 선택적 SQLite 2단 분석 결과 캐시"""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL, db_path: str | None = RESULT_CACHE_DB):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0}
+
+        self._disk = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            self._disk = sqlite3.connect(db_path, check_same_thread=False)
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._disk.commit()
+
+    def get(self, key: str):
+        """(적중 여부, 값) 반환"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return True, value
+                del self._memory[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT value, created_at FROM analysis_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.stats['disk_hits'] += 1
+                    return True, value
+
+            self.stats['misses'] += 1
+            return False, None
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now)
+                )
+                self._disk.execute("DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl,))
+                self._disk.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def info(self):
+        with self._lock:
+            return {
+                **self.stats,
+                'memory_entries': len(self._memory),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'disk': self._disk is not None
+            }
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+result_cache = ResultCache()
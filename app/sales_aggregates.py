@@ -0,0 +1,166 @@
+import math
+from sqlalchemy import event, inspect, text, bindparam
+from . import models
+from .database import SessionLocal, engine
+from .spatial_index import EARTH_RADIUS_M, envelope_wkt
+
+# 미리 집계해 두는 검색 반경 (m)
+RADIUS_BUCKETS = [100, 200, 300, 500, 700, 1000, 1500, 2000, 3000]
+
+def radius_bucket(radius: float):
+    """검색 반경이 집계 반경 중 하나면 해당 값, 아니면 None"""
+    if radius in RADIUS_BUCKETS:
+        return int(radius)
+    return None
+
+# 공실 좌표 주변 사각형 (spatial_index.envelope_wkt와 같은 경도-위도 순 POLYGON)
+VACANT_ENVELOPE = """ST_GeomFromText(CONCAT('POLYGON((',
+                    v.west, ' ', v.south, ', ', v.east, ' ', v.south, ', ', v.east, ' ', v.north, ', ',
+                    v.west, ' ', v.north, ', ', v.west, ' ', v.south, '))'), 4326, 'axis-order=long-lat')"""
+
+def refresh_sales_aggregates(connection, vacant_ids=None, suffix: str = ''):
+    """공실별 업종/반경 매출등급 집계 재계산 (vacant_ids가 없으면 전체, suffix는 섀도 테이블 접미사)"""
+    params = {
+        'max_radius': max(RADIUS_BUCKETS),
+        # 공실마다 최대 반경을 감싸는 사각형으로 SPATIAL INDEX에서 상가 후보를 먼저 줄임
+        'lat_margin': math.degrees(max(RADIUS_BUCKETS) / EARTH_RADIUS_M) * 1.01
+    }
+    delete_query = f"DELETE FROM vacant_sales_aggregates{suffix}"
+    vacant_filter = ""
+    if vacant_ids is not None:
+        vacant_ids = list(vacant_ids)
+        if not vacant_ids:
+            return
+        params['vacant_ids'] = vacant_ids
+        delete_query += " WHERE vacant_id IN :vacant_ids"
+        vacant_filter = "AND id IN :vacant_ids"
+
+    buckets = " UNION ALL ".join(f"SELECT {r} AS radius" for r in RADIUS_BUCKETS)
+
+    delete_query = text(delete_query)
+    insert_query = text(f"""
+        INSERT INTO vacant_sales_aggregates{suffix}
+            (vacant_id, industry_category, radius, store_count, sales_level_sum)
+        SELECT p.vacant_id, p.industry_category, b.radius, COUNT(*), SUM(p.sales_level)
+        FROM (
+            SELECT
+                v.id AS vacant_id,
+                c.industry_category,
+                CAST(c.sales_level AS UNSIGNED) AS sales_level,
+                ST_Distance_Sphere(c.coordinates, v.coordinates) AS distance
+            FROM (
+                SELECT id, coordinates,
+                    ST_Latitude(coordinates) - :lat_margin AS south,
+                    ST_Latitude(coordinates) + :lat_margin AS north,
+                    ST_Longitude(coordinates) - :lat_margin / COS(RADIANS(ST_Latitude(coordinates))) AS west,
+                    ST_Longitude(coordinates) + :lat_margin / COS(RADIANS(ST_Latitude(coordinates))) AS east
+                FROM vacant_listings{suffix}
+                WHERE coordinates IS NOT NULL
+                {vacant_filter}
+            ) v
+            JOIN commercial_buildings{suffix} c
+                ON MBRContains({VACANT_ENVELOPE}, c.coordinates)
+            WHERE c.industry_category IS NOT NULL
+            AND c.sales_level REGEXP '^[0-9]+$'
+        ) p
+        JOIN ({buckets}) b ON p.distance <= b.radius
+        WHERE p.distance <= :max_radius
+        GROUP BY p.vacant_id, p.industry_category, b.radius
+    """)
+    if vacant_ids is not None:
+        delete_query = delete_query.bindparams(bindparam('vacant_ids', expanding=True))
+        insert_query = insert_query.bindparams(bindparam('vacant_ids', expanding=True))
+
+    connection.execute(delete_query, params)
+    connection.execute(insert_query, params)
+
+def refresh_sales_aggregates_near(connection, points):
+    """변경된 상가 좌표 주변(최대 집계 반경) 공실들의 집계만 재계산"""
+    vacant_ids = set()
+    query = text("""
+        SELECT id
+        FROM vacant_listings
+        WHERE MBRContains(ST_GeomFromText(:envelope, 4326, 'axis-order=long-lat'), coordinates)
+        AND ST_Distance_Sphere(coordinates, ST_GeomFromText(:point, 4326, 'axis-order=long-lat')) <= :radius
+    """)
+    for lat, lng in points:
+        result = connection.execute(query, {
+            'point': f'POINT({lng} {lat})',
+            'envelope': envelope_wkt(lat, lng, max(RADIUS_BUCKETS)),
+            'radius': max(RADIUS_BUCKETS)
+        })
+        vacant_ids.update(row.id for row in result)
+    refresh_sales_aggregates(connection, vacant_ids)
+
+def rebuild_sales_aggregates():
+    """데이터 임포트 후 전체 집계 테이블 재구축"""
+    try:
+        models.VacantSalesAggregate.__table__.create(bind=engine, checkfirst=True)
+        with engine.begin() as connection:
+            refresh_sales_aggregates(connection)
+            count = connection.execute(text("SELECT COUNT(*) FROM vacant_sales_aggregates")).scalar()
+        print(f"매출등급 집계 재구축 완료: {count}행")
+    except Exception as e:
+        print(f"매출등급 집계 재구축 중 오류 발생: {e}")
+
+def has_sales_aggregates(db):
+    """집계 테이블이 있고 채워져 있는지 확인 (임포트 전 DB면 테이블이 없을 수 있음)"""
+    try:
+        return bool(db.execute(
+            text("SELECT EXISTS(SELECT 1 FROM vacant_sales_aggregates)").execution_options(metric_name='sales-aggregates-check')
+        ).scalar())
+    except Exception:
+        return False
+
+def lookup_sales_aggregates(db, vacant_ids, industry_category, radius):
+    """공실 id별 (상가 수, 매출등급 합계) 조회, 집계 테이블이 없거나 비어 있으면 None"""
+    if not has_sales_aggregates(db):
+        return None
+
+    query = text("""
+        SELECT vacant_id, store_count, sales_level_sum
+        FROM vacant_sales_aggregates
+        WHERE vacant_id IN :vacant_ids
+        AND industry_category = :industry_category
+        AND radius = :radius
+    """).bindparams(bindparam('vacant_ids', expanding=True)).execution_options(metric_name='sales-aggregates')
+    result = db.execute(query, {
+        'vacant_ids': list(vacant_ids),
+        'industry_category': industry_category,
+        'radius': radius
+    })
+    return {row.vacant_id: (row.store_count, row.sales_level_sum) for row in result}
+
+# ORM으로 상가가 변경되면 같은 트랜잭션 안에서 주변 공실 집계를 갱신
+STORE_AGGREGATE_FIELDS = ['latitude', 'longitude', 'coordinates', 'industry_category', 'sales_level']
+
+@event.listens_for(SessionLocal, 'before_flush')
+def collect_store_changes(session, flush_context, instances):
+    points = session.info.setdefault('changed_store_points', set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, models.CommercialBuilding):
+            points.add((obj.latitude, obj.longitude))
+    for obj in session.dirty:
+        if not isinstance(obj, models.CommercialBuilding):
+            continue
+        state = inspect(obj)
+        histories = [state.attrs[name].history for name in STORE_AGGREGATE_FIELDS]
+        if not any(h.has_changes() for h in histories):
+            continue
+        points.add((obj.latitude, obj.longitude))
+        # 좌표가 바뀐 경우 이전 위치 주변 공실도 갱신
+        old_lat = state.attrs.latitude.history.deleted
+        old_lng = state.attrs.longitude.history.deleted
+        if old_lat or old_lng:
+            points.add((old_lat[0] if old_lat else obj.latitude, old_lng[0] if old_lng else obj.longitude))
+
+@event.listens_for(SessionLocal, 'after_flush')
+def refresh_store_changes(session, flush_context):
+    points = session.info.pop('changed_store_points', set())
+    points = [(lat, lng) for lat, lng in points if lat is not None and lng is not None]
+    # 집계 테이블이 없거나 비어 있으면 조회 쪽이 직접 집계하므로 일부만 채우지 않음
+    if points and has_sales_aggregates(session.connection()):
+        refresh_sales_aggregates_near(session.connection(), points)
+
+if __name__ == "__main__":
+    rebuild_sales_aggregates()
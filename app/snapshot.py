@@ -0,0 +1,294 @@
+import bisect
+import glob
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+import numpy as np
+import sklearn
+from sklearn.metrics import DistanceMetric
+from sklearn.neighbors import BallTree
+from sqlalchemy import text
+from .point_clusters import numeric_sales_levels
+
+try:
+    import fcntl
+except ImportError:  # fcntl이 없는 환경에서는 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+# 상가/공실 컬럼 스냅샷 위치 (컬럼별 .npy 파일 + meta.json)
+# SNAPSHOT_DIR은 빌드별 디렉터리(SNAPSHOT_DIR-<빌드 ID>)를 가리키는 심볼릭 링크이며 새 빌드는 링크 교체로 반영
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshot")
+SNAPSHOT_FORMAT = 2
+# 남겨 둘 빌드 수 (교체 직전 빌드를 읽고 있는 워커가 있을 수 있음)
+SNAPSHOT_KEEP = 2
+
+# 컬럼 저장 형식
+#   int64/float64/float32: 그대로 저장
+#   category: int32 코드(-1 = NULL) + meta.json의 범주 목록
+#   nullable_int/nullable_float: float64(NaN = NULL)로 저장하고 읽을 때 int/float/None으로 복원
+STORE_COLUMNS = {
+    'id': 'int64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'industry_category': 'category',
+    'sales_level': 'float32',          # 숫자 매출등급 (숫자가 아니면 NaN)
+    'sales_level_label': 'category',   # DB에 저장된 원래 문자열
+}
+
+VACANT_COLUMNS = {
+    'id': 'int64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'num_of_company': 'nullable_int',
+    'num_of_large': 'nullable_int',
+    'num_of_bus_stop': 'nullable_int',
+    'num_of_hospital': 'nullable_int',
+    'num_of_theather': 'nullable_int',
+    'num_of_camp': 'nullable_int',
+    'num_of_school': 'nullable_int',
+    'nearest_subway_name': 'category',
+    'nearest_subway_distance': 'nullable_float',
+    'num_of_subway': 'nullable_int',
+    'num_of_gvn_office': 'nullable_int',
+    'parks_within_500m': 'nullable_int',
+    'parking_lots_within_500m': 'nullable_int',
+    'university_within_0m_500m': 'nullable_int',
+    'university_within_500m_1000m': 'nullable_int',
+    'university_within_1000m_1500m': 'nullable_int',
+    'university_within_1500m_2000m': 'nullable_int',
+}
+
+TABLE_COLUMNS = {'stores': STORE_COLUMNS, 'vacants': VACANT_COLUMNS}
+
+# SRID 4326 coordinates의 배정밀도 위도/경도
+COORDINATE_COLUMNS = "ST_Latitude(coordinates) AS latitude, ST_Longitude(coordinates) AS longitude"
+
+def fetch_columns(connection):
+    """DB에서 스냅샷 대상 행을 읽어 {테이블: {컬럼명: 값 목록}} 반환
+
+    좌표는 FLOAT(약 6자리) latitude/longitude 컬럼이 아니라 ST_Distance_Sphere가 쓰는 배정밀도 coordinates에서 읽음
+    """
+    store_rows = connection.execute(text(f"""
+        SELECT id, {COORDINATE_COLUMNS}, industry_category, sales_level
+        FROM commercial_buildings
+        WHERE coordinates IS NOT NULL
+    """)).fetchall()
+    facility_columns = [name for name in VACANT_COLUMNS if name not in ('id', 'latitude', 'longitude')]
+    vacant_rows = connection.execute(text(f"""
+        SELECT id, {COORDINATE_COLUMNS}, {', '.join(facility_columns)}
+        FROM vacant_listings
+        WHERE coordinates IS NOT NULL
+    """)).fetchall()
+
+    stores = {name: [getattr(r, name) for r in store_rows] for name in ('id', 'latitude', 'longitude', 'industry_category')}
+    stores['sales_level_label'] = [r.sales_level for r in store_rows]
+    stores['sales_level'] = [r.sales_level for r in store_rows]
+    vacants = {name: [getattr(r, name) for r in vacant_rows] for name in VACANT_COLUMNS}
+    return {'stores': stores, 'vacants': vacants}
+
+def build_tree(lats, lngs):
+    """위도/경도 BallTree (haversine)"""
+    return BallTree(np.radians(np.column_stack([lats, lngs])), metric='haversine')
+
+def encode_column(kind: str, values):
+    """값 목록을 저장 형식 배열로 변환, (배열, 범주 목록 또는 None)"""
+    if kind == 'category':
+        categories = sorted({v for v in values if v is not None})
+        lookup = {c: i for i, c in enumerate(categories)}
+        return np.array([-1 if v is None else lookup[v] for v in values], dtype=np.int32), categories
+    if kind == 'float32':
+        return numeric_sales_levels(values).astype(np.float32), None
+    if kind in ('nullable_int', 'nullable_float'):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64), None
+    return np.asarray(values, dtype=kind), None
+
+def decode_column(kind: str, array, categories=None):
+    """저장 형식 배열을 인덱스/응답용 값 배열로 복원 (숫자 컬럼은 복사하지 않음)"""
+    if kind == 'category':
+        lookup = np.array([*categories, None], dtype=object)
+        return lookup[array]
+    if kind in ('nullable_int', 'nullable_float'):
+        missing = np.isnan(array)
+        values = np.where(missing, 0, array).astype(np.int64 if kind == 'nullable_int' else np.float64)
+        decoded = values.astype(object)
+        decoded[missing] = None
+        return decoded
+    return array
+
+class SnapshotColumn:
+    """저장 형식 배열을 그대로 들고 있다가 선택된 행만 복원하는 컬럼 (전체 객체 배열을 만들지 않음)"""
+
+    def __init__(self, kind: str, array, categories=None):
+        self.kind = kind
+        self.array = array
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, key):
+        return decode_column(self.kind, self.array[key], self.categories)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def equals(self, value):
+        """값이 value인 행 마스크"""
+        if self.kind == 'category':
+            position = bisect.bisect_left(self.categories, value)
+            if position == len(self.categories) or self.categories[position] != value:
+                return np.zeros(len(self.array), dtype=bool)
+            return self.array == position
+        return self.array == value
+
+def write_tree(directory: str, table: str, tree):
+    """BallTree 내부 배열을 .npy로 저장하고 복원에 필요한 나머지 상태 반환"""
+    state = tree.__getstate__()
+    for i, array in enumerate(state[:4]):
+        np.save(os.path.join(directory, f"{table}.tree.{i}.npy"), array)
+    # 나머지는 정수 파라미터, 거리 함수, 샘플 가중치 (scikit-learn 버전마다 다를 수 있어 버전을 함께 기록)
+    return {'sklearn': sklearn.__version__, 'params': [int(v) for v in state[4:-2]]}
+
+def read_tree(directory: str, table: str, info):
+    """저장된 BallTree를 mmap 배열 그대로 복원 (버전이 다르거나 실패하면 None)"""
+    if not info or info.get('sklearn') != sklearn.__version__:
+        return None
+    try:
+        arrays = [np.load(os.path.join(directory, f"{table}.tree.{i}.npy"), mmap_mode='r') for i in range(4)]
+        tree = BallTree.__new__(BallTree)
+        tree.__setstate__((*arrays, *info['params'], DistanceMetric.get_metric('haversine'), None))
+        return tree
+    except Exception as e:
+        print(f"스냅샷 트리 복원 실패, 새로 구축: {e}")
+        return None
+
+@contextmanager
+def snapshot_lock(directory: str = SNAPSHOT_DIR):
+    """스냅샷 생성 잠금 (여러 워커가 동시에 시작해도 한 프로세스만 DB에서 읽어 생성)"""
+    os.makedirs(os.path.dirname(directory) or '.', exist_ok=True)
+    with open(f"{directory}.lock", 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_snapshot(columns: dict, data_version: int, directory: str = SNAPSHOT_DIR):
+    """{테이블: {컬럼명: 값 목록}}을 새 빌드 디렉터리에 저장하고 링크를 교체 (컬럼 + BallTree)"""
+    build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    build_dir = f"{directory}-{build_id}"
+    os.makedirs(build_dir)
+    meta = {'format': SNAPSHOT_FORMAT, 'data_version': data_version, 'build_id': build_id,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'tables': {}}
+    for table, kinds in TABLE_COLUMNS.items():
+        table_meta = {'rows': len(columns[table]['id']), 'columns': {}, 'tree': None}
+        arrays = {}
+        for name, kind in kinds.items():
+            arrays[name], categories = encode_column(kind, columns[table][name])
+            np.save(os.path.join(build_dir, f"{table}.{name}.npy"), arrays[name])
+            table_meta['columns'][name] = {'kind': kind, 'categories': categories}
+        if table_meta['rows']:
+            table_meta['tree'] = write_tree(build_dir, table, build_tree(arrays['latitude'], arrays['longitude']))
+        meta['tables'][table] = table_meta
+    with open(os.path.join(build_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # 이전 형식(일반 디렉터리) 스냅샷은 삭제
+    if os.path.isdir(directory) and not os.path.islink(directory):
+        shutil.rmtree(directory)
+    # 링크 교체는 원자적이라 읽는 쪽은 이전 빌드 또는 새 빌드 중 하나만 봄
+    link = f"{directory}.link-{os.getpid()}"
+    os.symlink(os.path.basename(build_dir), link)
+    os.replace(link, directory)
+
+    # 이미 mmap으로 열린 파일은 삭제 후에도 계속 읽을 수 있음
+    builds = sorted(glob.glob(f"{glob.escape(directory)}-*"), key=os.path.getmtime)
+    for previous in builds[:-SNAPSHOT_KEEP]:
+        if previous != build_dir:
+            shutil.rmtree(previous, ignore_errors=True)
+    return meta
+
+class Snapshot:
+    """메모리 매핑된 스냅샷 (여러 워커 프로세스가 같은 페이지를 공유)"""
+
+    def __init__(self, directory: str, meta: dict):
+        self.directory = directory
+        self.meta = meta
+        self.data_version = meta['data_version']
+        self.build_id = meta['build_id']
+
+    def raw(self, table: str, name: str):
+        return np.load(os.path.join(self.directory, f"{table}.{name}.npy"), mmap_mode='r')
+
+    def column(self, table: str, name: str):
+        """컬럼 값 (숫자 컬럼은 mmap 배열, 범주/NULL 허용 컬럼은 객체 배열로 복원)"""
+        info = self.meta['tables'][table]['columns'][name]
+        return decode_column(info['kind'], self.raw(table, name), info['categories'])
+
+    def columns(self, table: str):
+        return {name: self.column(table, name) for name in self.meta['tables'][table]['columns']}
+
+    def shared_columns(self, table: str):
+        """숫자 컬럼은 mmap 배열, 범주/NULL 허용 컬럼은 SnapshotColumn (워커 수와 무관하게 메모리 일정)"""
+        result = {}
+        for name, info in self.meta['tables'][table]['columns'].items():
+            array = self.raw(table, name)
+            result[name] = array if info['kind'] in ('int64', 'float64', 'float32') \
+                else SnapshotColumn(info['kind'], array, info['categories'])
+        return result
+
+    def tree(self, table: str):
+        return read_tree(self.directory, table, self.meta['tables'][table]['tree'])
+
+    def frame(self, table: str, columns=None):
+        """pandas DataFrame으로 읽기 (범주 컬럼은 Categorical, 분석 스크립트용)"""
+        import pandas as pd
+        data = {}
+        for name, info in self.meta['tables'][table]['columns'].items():
+            if columns is not None and name not in columns:
+                continue
+            array = self.raw(table, name)
+            if info['kind'] == 'category':
+                data[name] = pd.Categorical.from_codes(array, categories=info['categories'])
+            else:
+                data[name] = array
+        return pd.DataFrame(data, copy=False)
+
+def read_snapshot(directory: str = SNAPSHOT_DIR):
+    """스냅샷이 있으면 Snapshot, 없거나 형식이 다르면 None"""
+    # 링크를 한 번만 따라가 이후 파일은 모두 같은 빌드에서 읽음
+    build_dir = os.path.realpath(directory)
+    try:
+        with open(os.path.join(build_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get('format') != SNAPSHOT_FORMAT:
+        return None
+    return Snapshot(build_dir, meta)
+
+def export_snapshot(directory: str = SNAPSHOT_DIR):
+    """데이터 임포트 후 현재 DB 내용으로 스냅샷 갱신"""
+    from .database import engine
+    from .data_version import read_data_version
+    try:
+        with snapshot_lock(directory), engine.connect() as connection:
+            try:
+                data_version = read_data_version(connection)
+            except Exception:
+                connection.rollback()
+                data_version = 0
+            columns = fetch_columns(connection)
+            meta = write_snapshot(columns, data_version, directory)
+        print(f"스냅샷 저장 완료 (버전 {data_version}): 상가 {meta['tables']['stores']['rows']}개, "
+              f"공실 {meta['tables']['vacants']['rows']}개")
+    except Exception as e:
+        print(f"스냅샷 저장 중 오류 발생: {e}")
+
+if __name__ == "__main__":
+    export_snapshot()
@@ -0,0 +1,329 @@
+import os
+import threading
+import numpy as np
+from .data_version import read_data_version
+from .snapshot import (
+    read_snapshot, write_snapshot, fetch_columns, encode_column, build_tree, snapshot_lock,
+    SnapshotColumn, TABLE_COLUMNS
+)
+from .point_clusters import numeric_sales_levels
+
+# 워커가 새 스냅샷 빌드를 확인하는 간격 (초, 0이면 확인하지 않음)
+SPATIAL_INDEX_POLL_INTERVAL = float(os.getenv("SPATIAL_INDEX_POLL_INTERVAL", "5"))
+
+# MySQL ST_Distance_Sphere 기본 지구 반지름 (m)
+EARTH_RADIUS_M = 6370986.0
+
+# 공실 주변 시설 컬럼 (models.VacantListing과 동일)
+FACILITY_COLUMNS = [
+    'num_of_company', 'num_of_large', 'num_of_bus_stop', 'num_of_hospital',
+    'num_of_theather', 'num_of_camp', 'num_of_school',
+    'nearest_subway_name', 'nearest_subway_distance', 'num_of_subway',
+    'num_of_gvn_office', 'parks_within_500m', 'parking_lots_within_500m',
+    'university_within_0m_500m', 'university_within_500m_1000m',
+    'university_within_1000m_1500m', 'university_within_1500m_2000m',
+]
+
+# 지도용 응답 컬럼
+STORE_FIELDS = ['industry_category', 'latitude', 'longitude', 'sales_level']
+VACANT_FIELDS = ['latitude', 'longitude']
+
+def haversine_distance(lat, lng, lats, lngs):
+    """ST_Distance_Sphere와 동일한 방식으로 한 점과 여러 점 사이의 거리(m) 계산"""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def bbox_wkt(south, west, north, east):
+    """위도/경도 범위를 사각형 POLYGON WKT로 변환 (경도-위도 순)"""
+    return (f'POLYGON(({west} {south}, {east} {south}, {east} {north}, '
+            f'{west} {north}, {west} {south}))')
+
+def envelope_wkt(lat, lng, radius):
+    """반경 radius(m) 원을 감싸는 사각형 POLYGON WKT (경도-위도 순)"""
+    # 측지선 가장자리 오차를 감안해 약간 여유를 둠
+    margin = radius * 1.01 + 1.0
+    dlat = float(np.degrees(margin / EARTH_RADIUS_M))
+    dlng = dlat / max(float(np.cos(np.radians(lat))), 1e-6)
+    return bbox_wkt(max(lat - dlat, -90.0), max(lng - dlng, -180.0),
+                    min(lat + dlat, 90.0), min(lng + dlng, 180.0))
+
+def column_equals(column, value):
+    """컬럼 값이 value인 행 마스크"""
+    return column.equals(value) if isinstance(column, SnapshotColumn) else column == value
+
+def radius_sweep_stats(distances, matches, sales, radii):
+    """거리순 정렬된 상가 목록에서 누적합으로 반경별 업종 상가 수/평균 매출등급/밀도 계산
+
+    distances: 오름차순 거리(m), matches: 선택 업종 여부, sales: 숫자 매출등급 (없으면 NaN)
+    """
+    rated = matches & ~np.isnan(sales)
+
+    def cumulative(values):
+        return np.concatenate([[0], np.cumsum(values)])
+
+    total_counts = np.arange(len(distances) + 1)
+    store_counts = cumulative(matches)
+    rated_counts = cumulative(rated)
+    sales_sums = cumulative(np.where(rated, sales, 0.0))
+
+    result = []
+    for radius in radii:
+        n = int(np.searchsorted(distances, radius, side='right'))
+        store_count, rated_count = int(store_counts[n]), int(rated_counts[n])
+        area_km2 = np.pi * (radius / 1000) ** 2
+        result.append({
+            'radius': radius,
+            'store_count': store_count,
+            'rated_count': rated_count,
+            'avg_sales_level': float(sales_sums[n] / rated_count) if rated_count else None,
+            'total_store_count': int(total_counts[n]),
+            'competitor_density': store_count / area_km2 if area_km2 else None,  # km²당 같은 업종 상가 수
+            'competitor_share': store_count / int(total_counts[n]) if total_counts[n] else None
+        })
+    return result
+
+class PointIndex:
+    """위도/경도 BallTree와 행 컬럼을 함께 보관하는 인덱스 (스냅샷 배열과 트리는 복사 없이 사용)"""
+
+    def __init__(self, ids, lats, lngs, columns=None, tree=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.columns = {
+            name: values if isinstance(values, SnapshotColumn) else np.asarray(values, dtype=object)
+            for name, values in (columns or {}).items()
+        }
+        self.tree = tree
+        if self.tree is None and len(self.ids):
+            self.tree = build_tree(self.lats, self.lngs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query_radius(self, lat, lng, radius, **filters):
+        """반경 내 행 위치와 거리를 (거리, id) 순으로 반환"""
+        if self.tree is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # 트리 검색은 후보만 추리고 최종 판정은 ST_Distance_Sphere와 같은 식으로 수행
+        candidates = self.tree.query_radius(
+            np.radians([[lat, lng]]), r=radius / EARTH_RADIUS_M * (1 + 1e-9)
+        )[0]
+        for name, value in filters.items():
+            if value is not None and len(candidates):
+                column = self.columns[name]
+                candidates = candidates[column[candidates] == value]
+
+        distances = haversine_distance(lat, lng, self.lats[candidates], self.lngs[candidates])
+        within = distances <= radius
+        candidates, distances = candidates[within], distances[within]
+
+        order = np.lexsort((self.ids[candidates], distances))
+        return candidates[order], distances[order]
+
+    def query_bbox(self, south, west, north, east, **filters):
+        """사각형 영역 내 행 위치를 id 순으로 반환"""
+        mask = (self.lats >= south) & (self.lats <= north) & (self.lngs >= west) & (self.lngs <= east)
+        for name, value in filters.items():
+            if value is not None:
+                mask &= column_equals(self.columns[name], value)
+        positions = np.flatnonzero(mask)
+        return positions[np.argsort(self.ids[positions], kind='stable')]
+
+    def query_nearest(self, lats, lngs, k):
+        """여러 점 각각의 최근접 k개 행 위치와 거리를 한 번에 계산 (각 행은 거리, id 순)"""
+        lats = np.asarray(lats, dtype=np.float64).reshape(-1, 1)
+        lngs = np.asarray(lngs, dtype=np.float64).reshape(-1, 1)
+        k = min(k, len(self))
+        # 빈 인덱스나 빈 좌표 목록은 트리 조회 없이 빈 결과
+        if k == 0 or not len(lats) or self.tree is None:
+            return np.empty((len(lats), 0), dtype=np.int64), np.empty((len(lats), 0))
+
+        positions = self.tree.query(np.radians(np.hstack([lats, lngs])), k=k, return_distance=False)
+        distances = haversine_distance(lats, lngs, self.lats[positions], self.lngs[positions])
+        order = np.lexsort((self.ids[positions], distances))
+        return np.take_along_axis(positions, order, -1), np.take_along_axis(distances, order, -1)
+
+    def select(self, positions, distances, fields):
+        """행 위치를 응답 컬럼 순서의 {컬럼명: 배열} 형태로 변환 (distances가 None이면 거리 제외)"""
+        arrays = {'id': self.ids, 'latitude': self.lats, 'longitude': self.lngs}
+        values = {'id': self.ids[positions]}
+        for name in fields:
+            if name not in values:
+                values[name] = arrays[name][positions] if name in arrays else self.columns[name][positions]
+        if distances is not None:
+            values['distance'] = distances
+        return values
+
+    def rows(self, positions, distances, fields):
+        """행 위치를 API 응답용 dict 목록으로 변환 (distances가 None이면 거리 제외)"""
+        values = self.select(positions, distances, fields)
+        keys = list(values)
+        return [dict(zip(keys, row)) for row in zip(*(values[k].tolist() for k in keys))]
+
+    def output(self, positions, distances, fields, columnar=False):
+        return self.select(positions, distances, fields) if columnar else self.rows(positions, distances, fields)
+
+class InMemorySnapshot:
+    """스냅샷을 저장할 수 없을 때 DB에서 읽은 값을 같은 형식으로 제공"""
+
+    def __init__(self, columns, data_version):
+        self._columns = columns
+        self.data_version = data_version
+        self.build_id = None
+
+    def shared_columns(self, table):
+        result = {}
+        for name, kind in TABLE_COLUMNS[table].items():
+            array, categories = encode_column(kind, self._columns[table][name])
+            result[name] = array if kind in ('int64', 'float64', 'float32') else SnapshotColumn(kind, array, categories)
+        return result
+
+    def tree(self, table):
+        return None
+
+class SpatialIndex:
+    """상가/공실 테이블 전체를 메모리에 올린 공간 인덱스"""
+
+    def __init__(self):
+        self.stores = None
+        self.vacants = None
+        self.version = None
+        self.build_id = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.stores is not None and self.vacants is not None
+
+    def load(self, db):
+        """스냅샷(데이터 버전이 같을 때)에 연결하거나, 없으면 DB에서 읽어 스냅샷을 만든 뒤 연결
+
+        여러 워커가 동시에 시작해도 잠금을 먼저 얻은 한 프로세스만 DB에서 읽고 나머지는 그 결과에 연결함
+        """
+        with self._lock, snapshot_lock():
+            # 행보다 버전을 먼저 읽어야 도중에 임포트가 끝나도 오래된 버전으로 판단됨
+            try:
+                version = read_data_version(db)
+            except Exception:
+                db.rollback()
+                version = 0
+
+            snapshot = read_snapshot()
+            if snapshot is not None and snapshot.data_version == version:
+                source = '스냅샷'
+            else:
+                source = 'DB'
+                columns = fetch_columns(db)
+                try:
+                    write_snapshot(columns, version)
+                    snapshot = read_snapshot()
+                except Exception as e:
+                    print(f"스냅샷 저장 중 오류 발생: {e}")
+                    snapshot = None
+                if snapshot is None:
+                    snapshot = InMemorySnapshot(columns, version)
+            self._attach(snapshot, source)
+
+    def refresh(self):
+        """다른 프로세스가 새 스냅샷을 만들었으면 연결 (DB를 읽지 않음), 교체 여부 반환"""
+        with self._lock:
+            snapshot = read_snapshot()
+            if snapshot is None or snapshot.build_id == self.build_id:
+                return False
+            self._attach(snapshot, '스냅샷')
+            return True
+
+    def _attach(self, snapshot, source):
+        stores = snapshot.shared_columns('stores')
+        vacants = snapshot.shared_columns('vacants')
+        stores = PointIndex(
+            stores['id'], stores['latitude'], stores['longitude'],
+            {'industry_category': stores['industry_category'], 'sales_level': stores['sales_level_label']},
+            tree=snapshot.tree('stores'),
+        )
+        vacants = PointIndex(
+            vacants['id'], vacants['latitude'], vacants['longitude'],
+            {name: vacants[name] for name in FACILITY_COLUMNS},
+            tree=snapshot.tree('vacants'),
+        )
+
+        # 요청 처리 중인 스레드는 기존 인덱스를 계속 사용
+        self.stores, self.vacants = stores, vacants
+        self.version, self.build_id = snapshot.data_version, snapshot.build_id
+        print(f"공간 인덱스 로드 완료 ({source}, 버전 {self.version}): 상가 {len(stores)}개, 공실 {len(vacants)}개")
+
+    # columnar=True면 행 dict 목록 대신 {컬럼명: 배열} 반환
+    def nearby_stores(self, lat, lng, radius, industry_category=None, columnar=False):
+        stores = self.stores
+        positions, distances = stores.query_radius(lat, lng, radius, industry_category=industry_category)
+        return stores.output(positions, distances, STORE_FIELDS, columnar)
+
+    def nearby_vacants(self, lat, lng, radius, columnar=False):
+        vacants = self.vacants
+        positions, distances = vacants.query_radius(lat, lng, radius)
+        return vacants.output(positions, distances, VACANT_FIELDS, columnar)
+
+    def stores_in_bbox(self, south, west, north, east, industry_category=None, columnar=False):
+        stores = self.stores
+        positions = stores.query_bbox(south, west, north, east, industry_category=industry_category)
+        return stores.output(positions, None, STORE_FIELDS, columnar)
+
+    def vacants_in_bbox(self, south, west, north, east, columnar=False):
+        vacants = self.vacants
+        return vacants.output(vacants.query_bbox(south, west, north, east), None, VACANT_FIELDS, columnar)
+
+    def category_stats(self, lat, lng, radius):
+        """반경 내 상가를 한 번 조회해 업종별 상가 수, 평균 매출등급, 거리 통계를 계산"""
+        stores = self.stores
+        positions, distances = stores.query_radius(lat, lng, radius)
+        categories = stores.columns['industry_category'][positions]
+        known = np.array([c is not None for c in categories], dtype=bool)
+        positions, distances, categories = positions[known], distances[known], categories[known]
+        if not len(positions):
+            return []
+
+        names, codes = np.unique(categories.astype(str), return_inverse=True)
+        n = len(names)
+        sales = numeric_sales_levels(stores.columns['sales_level'][positions])
+        rated = ~np.isnan(sales)
+
+        counts = np.bincount(codes, minlength=n)
+        rated_counts = np.bincount(codes[rated], minlength=n)
+        sales_sums = np.bincount(codes[rated], weights=sales[rated], minlength=n)
+        distance_sums = np.bincount(codes, weights=distances, minlength=n)
+        nearest = np.full(n, np.inf)
+        np.minimum.at(nearest, codes, distances)
+
+        return [
+            {
+                'industry_category': name,
+                'store_count': int(count),
+                'rated_count': int(rated_count),
+                'avg_sales_level': float(sales_sum / rated_count) if rated_count else None,
+                'nearest_distance': float(near),
+                'mean_distance': float(distance_sum / count)
+            }
+            for name, count, rated_count, sales_sum, near, distance_sum
+            in zip(names.tolist(), counts, rated_counts, sales_sums, nearest, distance_sums)
+        ]
+
+    def radius_sweep(self, lat, lng, industry_category, radii):
+        """가장 큰 반경의 상가를 한 번 조회해 여러 반경의 업종 통계 계산"""
+        stores = self.stores
+        positions, distances = stores.query_radius(lat, lng, max(radii))
+        matches = stores.columns['industry_category'][positions] == industry_category
+        sales = numeric_sales_levels(stores.columns['sales_level'][positions])
+        return radius_sweep_stats(distances, np.asarray(matches, dtype=bool), sales, radii)
+
+    def nearest_vacants(self, lats, lngs, k):
+        """각 좌표별 최근접 공실 k개 (주변 시설 정보 포함)"""
+        vacants = self.vacants
+        positions, distances = vacants.query_nearest(lats, lngs, k)
+        fields = ['latitude', 'longitude', *FACILITY_COLUMNS]
+        return [vacants.rows(p, d, fields) for p, d in zip(positions, distances)]
+
+spatial_index = SpatialIndex()
@@ -0,0 +1,60 @@
+from sqlalchemy import text
+from . import models
+from .database import engine
+
+# 좌표가 같은 행 중 가장 작은 id를 대표로 남김 (기존 ROW_NUMBER() ... ORDER BY id의 rn = 1과 동일)
+# {suffix}: 섀도 테이블 임포트 시 테이블 이름 접미사
+REFRESH_VACANT_LOCATIONS = """
+    INSERT INTO vacant_locations{suffix} (vacant_id, latitude, longitude, listing_count, coordinates)
+    SELECT v.id, v.latitude, v.longitude, g.listing_count, v.coordinates
+    FROM (
+        SELECT MIN(id) AS id, COUNT(*) AS listing_count
+        FROM vacant_listings{suffix}
+        GROUP BY latitude, longitude
+    ) g
+    JOIN vacant_listings{suffix} v ON v.id = g.id
+"""
+
+REFRESH_STORE_LOCATIONS = """
+    INSERT INTO store_locations{suffix} (store_id, industry_category, latitude, longitude, store_count, coordinates)
+    SELECT c.id, c.industry_category, c.latitude, c.longitude, g.store_count, c.coordinates
+    FROM (
+        SELECT MIN(id) AS id, COUNT(*) AS store_count
+        FROM commercial_buildings{suffix}
+        WHERE industry_category IS NOT NULL
+        GROUP BY industry_category, latitude, longitude
+    ) g
+    JOIN commercial_buildings{suffix} c ON c.id = g.id
+"""
+
+def refresh_unique_locations(connection, suffix: str = ''):
+    """공실/상가 중복 좌표 제거 테이블 재계산 (한 트랜잭션 안에서 교체)"""
+    connection.execute(text(f"DELETE FROM vacant_locations{suffix}"))
+    connection.execute(text(REFRESH_VACANT_LOCATIONS.format(suffix=suffix)))
+    connection.execute(text(f"DELETE FROM store_locations{suffix}"))
+    connection.execute(text(REFRESH_STORE_LOCATIONS.format(suffix=suffix)))
+
+def rebuild_unique_locations():
+    """데이터 임포트 후 중복 좌표 제거 테이블 재구축"""
+    try:
+        models.VacantLocation.__table__.create(bind=engine, checkfirst=True)
+        models.StoreLocation.__table__.create(bind=engine, checkfirst=True)
+        with engine.begin() as connection:
+            refresh_unique_locations(connection)
+            vacant_count = connection.execute(text("SELECT COUNT(*) FROM vacant_locations")).scalar()
+            store_count = connection.execute(text("SELECT COUNT(*) FROM store_locations")).scalar()
+        print(f"중복 좌표 제거 테이블 재구축 완료: 공실 위치 {vacant_count}개, 상가 위치 {store_count}개")
+    except Exception as e:
+        print(f"중복 좌표 제거 테이블 재구축 중 오류 발생: {e}")
+
+def has_unique_locations(db, table: str):
+    """중복 좌표 제거 테이블이 있고 채워져 있는지 확인 (없으면 기존 윈도 함수 쿼리 사용)"""
+    try:
+        return bool(db.execute(
+            text(f"SELECT EXISTS(SELECT 1 FROM {table})").execution_options(metric_name='unique-locations-check')
+        ).scalar())
+    except Exception:
+        return False
+
+if __name__ == "__main__":
+    rebuild_unique_locations()
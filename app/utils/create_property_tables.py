@@ -1,5 +1,6 @@
 from ..database import engine
 from .. import models
+from ..data_version import bump_data_version
 from sqlalchemy import text
 from sqlalchemy import inspect
 
@@ -8,6 +9,9 @@ def create_commercial_tables():
     try:
         # 기존 테이블 삭제
         with engine.connect() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS vacant_sales_aggregates"))
+            connection.execute(text("DROP TABLE IF EXISTS vacant_locations"))
+            connection.execute(text("DROP TABLE IF EXISTS store_locations"))
             connection.execute(text("DROP TABLE IF EXISTS vacant_listings"))
             connection.execute(text("DROP TABLE IF EXISTS commercial_buildings"))
             connection.commit()
@@ -21,6 +25,9 @@ def create_commercial_tables():
         tables = inspector.get_table_names()
         print("생성된 테이블:", tables)
         
+        # 테이블이 비워졌으므로 캐시된 응답 무효화
+        bump_data_version()
+        
     except Exception as e:
         print(f"테이블 생성 중 오류 발생: {e}")
         print("상세 오류 정보:", str(e))
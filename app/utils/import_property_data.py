@@ -1,11 +1,77 @@
+import argparse
+import time
+import numpy as np
 import pandas as pd
+from sqlalchemy import text, bindparam
 from sqlalchemy.orm import Session
 from .. import models
 from ..database import SessionLocal, engine
+from ..sales_aggregates import rebuild_sales_aggregates, refresh_sales_aggregates, refresh_sales_aggregates_near
+from ..unique_locations import rebuild_unique_locations, refresh_unique_locations
+from .migrate_row_hash import migrate_row_hash_columns
+from ..heatmap import build_heatmaps
+from ..data_version import bump_data_version
+from ..snapshot import export_snapshot
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
 import random
 
+# 일괄 임포트 설정 (CSV 청크 행 수, INSERT 한 번에 넣는 행 수)
+IMPORT_CHUNK_SIZE = 50000
+IMPORT_BATCH_SIZE = 2000
+
+# 공통 주변 시설 컬럼 (CSV 컬럼명 → (DB 컬럼명, 형식))
+FACILITY_CSV_COLUMNS = {
+    'num_of_company(near 3km)': ('num_of_company', 'int'),
+    'num_of_large(near 1km)': ('num_of_large', 'int'),
+    'num_of_bus_stop(near 500m)': ('num_of_bus_stop', 'int'),
+    'num_of_hospital(near 1km)': ('num_of_hospital', 'int'),
+    'num_of_theather(near 1km)': ('num_of_theather', 'int'),
+    'num_of_camp(near 3km)': ('num_of_camp', 'int'),
+    'num_of_school(near 500m)': ('num_of_school', 'int'),
+    'nearest_subway_name': ('nearest_subway_name', 'str'),
+    'nearest_subway_distance': ('nearest_subway_distance', 'float'),
+    'num_of_subway(near 500m)': ('num_of_subway', 'int'),
+    'num_of_gvn_office(near 500m)': ('num_of_gvn_office', 'int'),
+    'parks_within_500m': ('parks_within_500m', 'int'),
+    'parking_lots_within_500m': ('parking_lots_within_500m', 'int'),
+    'university_within_0m_500m': ('university_within_0m_500m', 'int'),
+    'university_within_500m_1000m': ('university_within_500m_1000m', 'int'),
+    'university_within_1000m_1500m': ('university_within_1000m_1500m', 'int'),
+    'university_within_1500m_2000m': ('university_within_1500m_2000m', 'int'),
+}
+
+STORE_CSV_COLUMNS = {
+    '매출등급': ('sales_level', 'str'),
+    '대분류업종': ('industry_category', 'str'),
+    '대분류업종코드': ('industry_code', 'str'),
+    '도로명주소': ('address', 'str'),
+    **FACILITY_CSV_COLUMNS,
+}
+
+VACANT_CSV_COLUMNS = FACILITY_CSV_COLUMNS
+
+# 임포트 방식
+#   shadow: 섀도 테이블에 적재/인덱스/집계 후 RENAME TABLE 한 번으로 교체 (기본, 서비스 중단 없음)
+#   replace: 한 트랜잭션 안에서 삭제 후 일괄 INSERT (적재 중 원본 테이블 잠금, 섀도 테이블을 만들 수 없을 때)
+#   diff: row_hash가 바뀐 행만 삭제/추가 (소규모 갱신용, 기존 행 id 유지, 변경이 많으면 shadow로 전환)
+#   orm: 기존 행 단위 ORM 임포트
+IMPORT_MODES = ['shadow', 'replace', 'diff', 'orm']
+
+# 섀도 테이블 교체 대상 (기본 테이블 + 기본 테이블 id로 만든 파생 테이블)
+BASE_TABLES = ['commercial_buildings', 'vacant_listings']
+DERIVED_TABLES = ['vacant_sales_aggregates', 'vacant_locations', 'store_locations']
+SHADOW_SUFFIX = '_shadow'
+OLD_SUFFIX = '_old'
+# 새 데이터 행 수가 기존 행 수의 이 비율보다 작으면 잘린 파일로 보고 교체하지 않음
+IMPORT_MIN_ROW_RATIO = 0.5
+# 차분 임포트에서 바뀐 행 비율이 이보다 크면 전체 교체로 전환
+IMPORT_DIFF_MAX_RATIO = 0.2
+
+def make_point(lat: float, lng: float):
+    """SRID 4326 POINT 생성 (MySQL은 EPSG:4326 WKB를 위도-경도 순으로 해석)"""
+    return from_shape(Point(float(lat), float(lng)), srid=4326)
+
 def process_store_row(row):
     """final_data.csv 데이터 처리"""
     try:
@@ -34,7 +100,7 @@ def process_store_row(row):
             'address': safe_str(row['도로명주소']),
             'latitude': safe_float(row['위도']),
             'longitude': safe_float(row['경도']),
-            'coordinates': from_shape(Point(float(row['경도']), float(row['위도']))) if not pd.isna(row['경도']) and not pd.isna(row['위도']) else None,
+            'coordinates': make_point(row['위도'], row['경도']),
             'num_of_company': safe_int(row['num_of_company(near 3km)']),
             'num_of_large': safe_int(row['num_of_large(near 1km)']),
             'num_of_bus_stop': safe_int(row['num_of_bus_stop(near 500m)']),
@@ -86,8 +152,7 @@ def process_vacant_row(row):
             return None
             
         try:
-            point = Point(float(lng), float(lat))
-            coordinates = from_shape(point)
+            coordinates = make_point(lat, lng)
         except Exception as e:
             print(f"좌표 생성 중 오류: {e}")
             return None
@@ -119,123 +184,435 @@ def process_vacant_row(row):
         print(f"오류 내용: {e}")
         return None
 
+def import_with_orm(db: Session, store_file: str, vacant_file: str, batch_size: int = 100):
+    """행 단위 ORM 임포트 (process_*_row 검증 로그가 필요할 때 사용), 공실 파일을 못 읽으면 False"""
+    # 기존 데이터 삭제
+    print("\n기존 데이터 삭제 시작...")
+    vacant_count = db.query(models.VacantListing).count()
+    print(f"삭제할 공실 데이터 수: {vacant_count}")
+    db.query(models.CommercialBuilding).delete()
+    db.query(models.VacantListing).delete()
+    db.commit()
+    print("기존 데이터 삭제 완료")
+    
+    # 상가 데이터 임포트
+    print("\n상가 데이터 파일 읽기 시작...")
+    store_df = pd.read_csv(store_file, encoding='utf-8')
+    print("상가 데이터 샘플:")
+    print(store_df.head())
+    
+    stores = []
+    for _, row in store_df.iterrows():
+        try:
+            data = process_store_row(row)
+            if data:
+                store_obj = models.CommercialBuilding(**data)
+                stores.append(store_obj)
+                
+                if len(stores) >= batch_size:
+                    db.bulk_save_objects(stores)
+                    db.commit()
+                    stores = []
+        except Exception as e:
+            print(f"상가 데이터 처리 중 오류: {e}")
+            continue
+    
+    if stores:
+        try:
+            db.bulk_save_objects(stores)
+            db.commit()
+        except Exception as e:
+            print(f"상가 데이터 최종 저장 중 오류: {e}")
+            db.rollback()
+    
+    # 공실 데이터 임포트
+    print("\n공실 데이터 파일 읽기 시작...")
+    try:
+        vacant_df = pd.read_csv(vacant_file, encoding='utf-8')
+        print(f"공실 데이터 총 {len(vacant_df)}행 로드됨")
+        print("공실 데이터 컬럼명:", vacant_df.columns.tolist())
+        print("\n공실 데이터 첫 5행 샘플:")
+        print(vacant_df[['위도', '경도']].head())
+    except Exception as e:
+        print(f"공실 데이터 파일 읽기 오류: {e}")
+        return False
+    
+    print("\n공실 데이터 처리 시작...")
+    vacants = []
+    processed_count = 0
+    success_count = 0
+    error_count = 0
+    
+    for idx, row in vacant_df.iterrows():
+        try:
+            processed_count += 1
+            data = process_vacant_row(row)
+            
+            if data:
+                vacant_obj = models.VacantListing(**data)
+                vacants.append(vacant_obj)
+                success_count += 1
+                
+                if len(vacants) >= batch_size:
+                    try:
+                        db.bulk_save_objects(vacants)
+                        db.commit()
+                        print(f"진행 상황: {processed_count}/{len(vacant_df)} 행 처리됨 "
+                              f"(성공: {success_count}, 실패: {error_count})")
+                        vacants = []
+                    except Exception as e:
+                        print(f"공실 데이터 일괄 저장 중 오류: {e}")
+                        db.rollback()
+                        vacants = []
+            else:
+                error_count += 1
+                
+            if processed_count % 1000 == 0:
+                print(f"진행 상황: {processed_count}/{len(vacant_df)} 행 처리됨 "
+                      f"(성공: {success_count}, 실��: {error_count})")
+                
+        except Exception as e:
+            error_count += 1
+            print(f"공실 데이터 처리 중 오류 (행 {idx}): {e}")
+            continue
+    
+    if vacants:
+        try:
+            db.bulk_save_objects(vacants)
+            db.commit()
+            success_count += len(vacants)
+            print(f"\n마지막 {len(vacants)}개 공실 데이터 저장 완료")
+        except Exception as e:
+            error_count += len(vacants)
+            print(f"공실 데이터 최종 저장 중 오류: {e}")
+            db.rollback()
+    
+    print("\n공실 데이터 임포트 완료")
+    print(f"총 처리된 행: {processed_count}")
+    print(f"성공적으로 저장된 데이터: {success_count}")
+    print(f"실패한 데이터: {error_count}")
+    
+    # 최종 데이터 확인
+    final_count = db.query(models.VacantListing).count()
+    print(f"\n데이터베이스의 최종 공실 데이터 수: {final_count}")
+    
+    return True
+
+def point_wkb(lats, lngs):
+    """위도/경도 배열을 POINT WKB 바이트 목록으로 일괄 변환 (make_point와 같은 위도-경도 순)"""
+    points = np.empty(len(lats), dtype=[('order', 'u1'), ('type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+    points['order'] = 1  # little endian
+    points['type'] = 1   # POINT
+    points['x'] = lats
+    points['y'] = lngs
+    return [bytes(point) for point in points.view('V21')]
+
+def convert_chunk(chunk: pd.DataFrame, columns: dict):
+    """CSV 청크를 컬럼 단위로 변환해 INSERT 컬럼 목록, 행 튜플 목록, 제외 행 수 반환 (좌표가 없는 행은 제외)"""
+    lats = pd.to_numeric(chunk['위도'], errors='coerce')
+    lngs = pd.to_numeric(chunk['경도'], errors='coerce')
+    valid = (lats.notna() & lngs.notna()).to_numpy()
+    chunk, lats, lngs = chunk[valid], lats[valid], lngs[valid]
+
+    values = [lats.tolist(), lngs.tolist()]
+    for csv_name, (name, kind) in columns.items():
+        column = chunk[csv_name]
+        if kind == 'str':
+            column = column.astype(object)
+        else:
+            column = pd.to_numeric(column, errors='coerce')
+            if kind == 'int':
+                column = np.trunc(column).astype('Int64')
+            column = column.astype(object)
+        values.append(column.where(column.notna(), None).tolist())
+    names = ['latitude', 'longitude', *(name for name, _ in columns.values())]
+
+    # 변환된 값 기준 64비트 내용 해시 (차분 임포트에서 바뀐 행 판별)
+    row_hash = pd.util.hash_pandas_object(pd.DataFrame(dict(zip(names, values)), dtype=object), index=False)
+    values += [row_hash.tolist(), point_wkb(lats.to_numpy(), lngs.to_numpy())]
+    names += ['row_hash', 'coordinates']
+    return names, list(zip(*values)), int((~valid).sum())
+
+def insert_rows(connection, table: str, names: list, rows: list):
+    """여러 행을 한 번의 multi-row INSERT로 저장 (coordinates는 WKB로 전달)"""
+    placeholders = ', '.join('ST_GeomFromWKB(%s, 4326)' if name == 'coordinates' else '%s' for name in names)
+    sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES " + ', '.join([f"({placeholders})"] * len(rows))
+    connection.exec_driver_sql(sql, tuple(value for row in rows for value in row))
+
+def read_csv_chunks(csv_file: str, columns: dict, chunk_size: int):
+    """CSV를 청크 단위로 읽어 convert_chunk 결과를 차례로 반환"""
+    dtypes = {csv_name: str for csv_name, (_, kind) in columns.items() if kind == 'str'}
+    for chunk in pd.read_csv(csv_file, encoding='utf-8', chunksize=chunk_size, dtype=dtypes,
+                             usecols=['위도', '경도', *columns]):
+        yield convert_chunk(chunk, columns)
+
+def load_csv(connection, table: str, csv_file: str, columns: dict, chunk_size: int, batch_size: int):
+    """CSV를 청크 단위로 읽어 변환 후 큰 배치로 저장, (저장 행 수, 제외 행 수)"""
+    inserted = skipped = 0
+    for names, rows, chunk_skipped in read_csv_chunks(csv_file, columns, chunk_size):
+        for start in range(0, len(rows), batch_size):
+            insert_rows(connection, table, names, rows[start:start + batch_size])
+        inserted += len(rows)
+        skipped += chunk_skipped
+        print(f"{table}: {inserted}행 저장됨 (좌표 없음 {skipped}행 제외)")
+    return inserted, skipped
+
+def import_with_core(store_file: str, vacant_file: str,
+                     chunk_size: int = IMPORT_CHUNK_SIZE, batch_size: int = IMPORT_BATCH_SIZE):
+    """컬럼 단위 변환 + multi-row INSERT 임포트 (삭제부터 저장까지 한 트랜잭션이라 실패하면 기존 데이터 유지)"""
+    started = time.perf_counter()
+    migrate_row_hash_columns()
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM commercial_buildings"))
+        connection.execute(text("DELETE FROM vacant_listings"))
+        store_count, _ = load_csv(connection, 'commercial_buildings', store_file, STORE_CSV_COLUMNS, chunk_size, batch_size)
+        vacant_count, _ = load_csv(connection, 'vacant_listings', vacant_file, VACANT_CSV_COLUMNS, chunk_size, batch_size)
+    print(f"임포트 완료: 상가 {store_count}개, 공실 {vacant_count}개 ({time.perf_counter() - started:.1f}초)")
+
+def secondary_indexes(connection, table: str):
+    """PRIMARY를 제외한 인덱스 정의 [(이름, 종류, 컬럼 목록)] (종류: SPATIAL, UNIQUE, '')"""
+    rows = connection.execute(text("""
+        SELECT INDEX_NAME AS index_name, INDEX_TYPE AS index_type,
+            NON_UNIQUE AS non_unique, COLUMN_NAME AS column_name
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = :table
+        AND INDEX_NAME <> 'PRIMARY'
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """), {'table': table}).fetchall()
+    indexes = {}
+    for row in rows:
+        kind = 'SPATIAL' if row.index_type == 'SPATIAL' else ('' if row.non_unique else 'UNIQUE')
+        indexes.setdefault(row.index_name, (kind, []))[1].append(row.column_name)
+    return [(name, kind, index_columns) for name, (kind, index_columns) in indexes.items()]
+
+def drop_shadow_tables(connection):
+    for table in BASE_TABLES + DERIVED_TABLES:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}{SHADOW_SUFFIX}"))
+
+def create_shadow_tables(connection):
+    """원본과 같은 구조의 빈 섀도 테이블 생성 후 기본 테이블 보조 인덱스 제거 (적재 후 다시 생성), 인덱스 정의 반환"""
+    drop_shadow_tables(connection)
+    for table in BASE_TABLES + DERIVED_TABLES:
+        connection.execute(text(f"CREATE TABLE {table}{SHADOW_SUFFIX} LIKE {table}"))
+
+    indexes = {table: secondary_indexes(connection, table) for table in BASE_TABLES}
+    for table, definitions in indexes.items():
+        if definitions:
+            drops = ', '.join(f"DROP INDEX {name}" for name, _, _ in definitions)
+            connection.execute(text(f"ALTER TABLE {table}{SHADOW_SUFFIX} {drops}"))
+    return indexes
+
+def build_shadow_indexes(connection, indexes: dict):
+    """적재가 끝난 섀도 테이블에 보조 인덱스를 한 번에 생성"""
+    for table, definitions in indexes.items():
+        if definitions:
+            adds = ', '.join(
+                f"ADD {kind + ' ' if kind else ''}INDEX {name} ({', '.join(index_columns)})"
+                for name, kind, index_columns in definitions
+            )
+            connection.execute(text(f"ALTER TABLE {table}{SHADOW_SUFFIX} {adds}"))
+
+def validate_shadow_tables(connection, inserted: dict):
+    """섀도 테이블 행 수가 저장한 행 수와 같고 기존 데이터에 비해 지나치게 적지 않은지 확인"""
+    for table, count in inserted.items():
+        shadow_count = connection.execute(text(f"SELECT COUNT(*) FROM {table}{SHADOW_SUFFIX}")).scalar()
+        live_count = connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        if shadow_count != count:
+            raise ValueError(f"{table}: 섀도 테이블 행 수 {shadow_count}개가 저장한 행 수 {count}개와 다릅니다")
+        if shadow_count == 0 or shadow_count < live_count * IMPORT_MIN_ROW_RATIO:
+            raise ValueError(f"{table}: 새 데이터 {shadow_count}개가 기존 {live_count}개에 비해 너무 적어 교체하지 않습니다")
+        print(f"{table}: 검증 완료 (기존 {live_count}개 → 새 {shadow_count}개)")
+
+def swap_shadow_tables(connection):
+    """RENAME TABLE 한 문장으로 모든 원본/섀도 테이블을 동시에 교체한 뒤 이전 테이블 삭제"""
+    tables = BASE_TABLES + DERIVED_TABLES
+    for table in tables:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}{OLD_SUFFIX}"))
+    renames = ', '.join(f"{table} TO {table}{OLD_SUFFIX}, {table}{SHADOW_SUFFIX} TO {table}" for table in tables)
+    connection.execute(text(f"RENAME TABLE {renames}"))
+    for table in tables:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}{OLD_SUFFIX}"))
+
+def import_with_shadow(store_file: str, vacant_file: str,
+                       chunk_size: int = IMPORT_CHUNK_SIZE, batch_size: int = IMPORT_BATCH_SIZE):
+    """섀도 테이블에 적재, 인덱스 생성, 파생 테이블 계산, 검증 후 원자적으로 교체 (그동안 API는 기존 데이터 제공)"""
+    started = time.perf_counter()
+    models.Base.metadata.create_all(bind=engine, tables=[
+        models.CommercialBuilding.__table__, models.VacantListing.__table__,
+        models.VacantSalesAggregate.__table__, models.VacantLocation.__table__, models.StoreLocation.__table__
+    ])
+    migrate_row_hash_columns()
+
+    try:
+        with engine.connect() as connection:
+            indexes = create_shadow_tables(connection)
+
+        with engine.begin() as connection:
+            store_count, _ = load_csv(connection, f'commercial_buildings{SHADOW_SUFFIX}', store_file,
+                                      STORE_CSV_COLUMNS, chunk_size, batch_size)
+            vacant_count, _ = load_csv(connection, f'vacant_listings{SHADOW_SUFFIX}', vacant_file,
+                                       VACANT_CSV_COLUMNS, chunk_size, batch_size)
+
+        with engine.connect() as connection:
+            build_shadow_indexes(connection, indexes)
+
+        # 파생 테이블도 섀도 테이블 id로 계산해 함께 교체 (교체 직후에도 id가 어긋나지 않음)
+        with engine.begin() as connection:
+            refresh_sales_aggregates(connection, suffix=SHADOW_SUFFIX)
+            refresh_unique_locations(connection, suffix=SHADOW_SUFFIX)
+
+        with engine.connect() as connection:
+            validate_shadow_tables(connection, {'commercial_buildings': store_count, 'vacant_listings': vacant_count})
+            swap_shadow_tables(connection)
+    except Exception:
+        with engine.connect() as connection:
+            drop_shadow_tables(connection)
+        raise
+
+    print(f"섀도 테이블 교체 완료: 상가 {store_count}개, 공실 {vacant_count}개 ({time.perf_counter() - started:.1f}초)")
+
+def existing_hashes(connection, table: str):
+    """기존 행의 row_hash → id 목록"""
+    existing = {}
+    for row in connection.execute(text(f"SELECT id, row_hash FROM {table}")):
+        existing.setdefault(row.row_hash, []).append(row.id)
+    return existing
+
+def diff_rows(existing: dict, names: list, rows: list):
+    """청크 행 중 기존에 없는 행 목록 반환 (일치한 기존 id는 existing에서 빼며, 내용이 같은 중복 행은 개수로 비교)"""
+    hash_position = names.index('row_hash')
+    to_insert = []
+    for row in rows:
+        ids = existing.get(row[hash_position])
+        if ids:
+            ids.pop()
+        else:
+            to_insert.append(row)
+    return to_insert
+
+def plan_diff(connection, table: str, csv_file: str, columns: dict, chunk_size: int):
+    """CSV를 청크 단위로 기존 row_hash와 비교해 (컬럼 목록, 삭제할 id, 추가할 행) 반환
+
+    CSV 전체를 메모리에 올리지 않고, 바뀐 행이 IMPORT_DIFF_MAX_RATIO를 넘으면 바로 None 반환
+    """
+    existing = existing_hashes(connection, table)
+    existing_count = sum(len(ids) for ids in existing.values())
+    names, to_insert, total = None, [], 0
+    for names, chunk_rows, _ in read_csv_chunks(csv_file, columns, chunk_size):
+        total += len(chunk_rows)
+        to_insert += diff_rows(existing, names, chunk_rows)
+        if len(to_insert) > max(existing_count, 1) * IMPORT_DIFF_MAX_RATIO:
+            print(f"{table}: 변경 행이 많아 차분 임포트 대신 전체 교체합니다 (추가 {len(to_insert)}개 이상)")
+            return None
+
+    to_delete = [row_id for ids in existing.values() for row_id in ids]
+    if len(to_delete) + len(to_insert) > max(total, 1) * IMPORT_DIFF_MAX_RATIO:
+        print(f"{table}: 변경 행이 많아 차분 임포트 대신 전체 교체합니다 "
+              f"(삭제 {len(to_delete)}개, 추가 {len(to_insert)}개)")
+        return None
+    return names, to_delete, to_insert
+
+def import_with_diff(store_file: str, vacant_file: str,
+                     chunk_size: int = IMPORT_CHUNK_SIZE, batch_size: int = IMPORT_BATCH_SIZE):
+    """바뀐 행만 삭제/추가하고 주변 집계만 다시 계산, 반영한 변경 수 (차분으로 처리할 수 없으면 None)"""
+    migrate_row_hash_columns()
+    models.Base.metadata.create_all(bind=engine, tables=[
+        models.VacantSalesAggregate.__table__, models.VacantLocation.__table__, models.StoreLocation.__table__
+    ])
+
+    with engine.begin() as connection:
+        plans = {}
+        for table, csv_file, columns in [
+            ('commercial_buildings', store_file, STORE_CSV_COLUMNS),
+            ('vacant_listings', vacant_file, VACANT_CSV_COLUMNS)
+        ]:
+            if connection.execute(text(f"SELECT EXISTS(SELECT 1 FROM {table} WHERE row_hash IS NULL)")).scalar():
+                print(f"{table}: row_hash가 없는 행이 있어 차분 임포트를 할 수 없습니다")
+                return None
+            plan = plan_diff(connection, table, csv_file, columns, chunk_size)
+            if plan is None:
+                return None
+            plans[table] = plan
+
+        changed_points, vacant_ids = [], set()
+        for table, (names, to_delete, to_insert) in plans.items():
+            for start in range(0, len(to_delete), batch_size):
+                ids = to_delete[start:start + batch_size]
+                if table == 'commercial_buildings':
+                    changed_points += connection.execute(text(
+                        "SELECT latitude, longitude FROM commercial_buildings WHERE id IN :ids"
+                    ).bindparams(bindparam('ids', expanding=True)), {'ids': ids}).fetchall()
+                else:
+                    vacant_ids.update(ids)
+                connection.execute(text(f"DELETE FROM {table} WHERE id IN :ids")
+                                   .bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+
+            max_id = connection.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table}")).scalar()
+            for start in range(0, len(to_insert), batch_size):
+                insert_rows(connection, table, names, to_insert[start:start + batch_size])
+            if table == 'commercial_buildings':
+                lat, lng = names.index('latitude'), names.index('longitude')
+                changed_points += [(row[lat], row[lng]) for row in to_insert]
+            else:
+                vacant_ids.update(row.id for row in connection.execute(
+                    text("SELECT id FROM vacant_listings WHERE id > :max_id"), {'max_id': max_id}
+                ))
+            print(f"{table}: 삭제 {len(to_delete)}개, 추가 {len(to_insert)}개")
+
+        # 같은 트랜잭션에서 바뀐 공실과 바뀐 상가 주변 공실의 집계만 다시 계산
+        refresh_sales_aggregates(connection, vacant_ids)
+        refresh_sales_aggregates_near(connection, [(lat, lng) for lat, lng in changed_points])
+        refresh_unique_locations(connection)
+
+    return sum(len(to_delete) + len(to_insert) for _, to_delete, to_insert in plans.values())
+
 def import_commercial_data(store_file: str = './data/Store_common.csv', 
                          vacant_file: str = './data/Vacant.common.csv',
-                         batch_size: int = 100):
-    """상가 및 공실 데이터 임포트"""
+                         batch_size: int = 100,
+                         mode: str = 'shadow'):
+    """상가 및 공실 데이터 임포트 (mode는 IMPORT_MODES 참고)"""
+    if mode not in IMPORT_MODES:
+        print(f"알 수 없는 임포트 방식: {mode} ({', '.join(IMPORT_MODES)} 중 하나)")
+        return
+
     db = None
     try:
-        db = SessionLocal()
-        
-        # 기존 데이터 삭제
-        print("\n기존 데이터 삭제 시작...")
-        vacant_count = db.query(models.VacantListing).count()
-        print(f"삭제할 공실 데이터 수: {vacant_count}")
-        db.query(models.CommercialBuilding).delete()
-        db.query(models.VacantListing).delete()
-        db.commit()
-        print("기존 데이터 삭제 완료")
-        
-        # 상가 데이터 임포트
-        print("\n상가 데이터 파일 읽기 시작...")
-        store_df = pd.read_csv(store_file, encoding='utf-8')
-        print("상가 데이터 샘플:")
-        print(store_df.head())
-        
-        stores = []
-        for _, row in store_df.iterrows():
-            try:
-                data = process_store_row(row)
-                if data:
-                    store_obj = models.CommercialBuilding(**data)
-                    stores.append(store_obj)
-                    
-                    if len(stores) >= batch_size:
-                        db.bulk_save_objects(stores)
-                        db.commit()
-                        stores = []
-            except Exception as e:
-                print(f"상가 데이터 처리 중 오류: {e}")
-                continue
-        
-        if stores:
-            try:
-                db.bulk_save_objects(stores)
-                db.commit()
-            except Exception as e:
-                print(f"상가 데이터 최종 저장 중 오류: {e}")
-                db.rollback()
+        if mode == 'diff':
+            changed = import_with_diff(store_file, vacant_file)
+            if changed == 0:
+                print("변경된 행이 없습니다")
+                return
+            if changed is None:
+                mode = 'shadow'
+
+        if mode == 'shadow':
+            import_with_shadow(store_file, vacant_file)
+        elif mode in ('replace', 'orm'):
+            if mode == 'orm':
+                db = SessionLocal()
+                if not import_with_orm(db, store_file, vacant_file, batch_size):
+                    return
+            else:
+                import_with_core(store_file, vacant_file)
+            
+            # 공실 × 업종 × 반경 매출등급 집계 재구축
+            rebuild_sales_aggregates()
+            
+            # 리포트 최근접 검색용 중복 좌표 제거 테이블 재구축
+            rebuild_unique_locations()
         
-        # 공실 데이터 임포트
-        print("\n공실 데이터 파일 읽기 시작...")
+        # 업종별 매출등급 히트맵 타일 재생성
         try:
-            vacant_df = pd.read_csv(vacant_file, encoding='utf-8')
-            print(f"공실 데이터 총 {len(vacant_df)}행 로드됨")
-            print("공실 데이터 컬럼명:", vacant_df.columns.tolist())
-            print("\n공실 데이터 첫 5행 샘플:")
-            print(vacant_df[['위도', '경도']].head())
+            build_heatmaps()
         except Exception as e:
-            print(f"공실 데이터 파일 읽기 오류: {e}")
-            return
-        
-        print("\n공실 데이터 처리 시작...")
-        vacants = []
-        processed_count = 0
-        success_count = 0
-        error_count = 0
-        
-        for idx, row in vacant_df.iterrows():
-            try:
-                processed_count += 1
-                data = process_vacant_row(row)
-                
-                if data:
-                    vacant_obj = models.VacantListing(**data)
-                    vacants.append(vacant_obj)
-                    success_count += 1
-                    
-                    if len(vacants) >= batch_size:
-                        try:
-                            db.bulk_save_objects(vacants)
-                            db.commit()
-                            print(f"진행 상황: {processed_count}/{len(vacant_df)} 행 처리됨 "
-                                  f"(성공: {success_count}, 실패: {error_count})")
-                            vacants = []
-                        except Exception as e:
-                            print(f"공실 데이터 일괄 저장 중 오류: {e}")
-                            db.rollback()
-                            vacants = []
-                else:
-                    error_count += 1
-                    
-                if processed_count % 1000 == 0:
-                    print(f"진행 상황: {processed_count}/{len(vacant_df)} 행 처리됨 "
-                          f"(성공: {success_count}, 실��: {error_count})")
-                    
-            except Exception as e:
-                error_count += 1
-                print(f"공실 데이터 처리 중 오류 (행 {idx}): {e}")
-                continue
-        
-        if vacants:
-            try:
-                db.bulk_save_objects(vacants)
-                db.commit()
-                success_count += len(vacants)
-                print(f"\n마지막 {len(vacants)}개 공실 데이터 저장 완료")
-            except Exception as e:
-                error_count += len(vacants)
-                print(f"공실 데이터 최종 저장 중 오류: {e}")
-                db.rollback()
+            print(f"히트맵 생성 중 오류 발생: {e}")
         
-        print("\n공실 데이터 임포트 완료")
-        print(f"총 처리된 행: {processed_count}")
-        print(f"성공적으로 저장된 데이터: {success_count}")
-        print(f"실패한 데이터: {error_count}")
+        # API 캐시(ETag)와 인메모리 인덱스가 새 데이터를 반영하도록 버전 증가
+        bump_data_version()
         
-        # 최종 데이터 확인
-        final_count = db.query(models.VacantListing).count()
-        print(f"\n데이터베이스의 최종 공실 데이터 수: {final_count}")
+        # 새 버전으로 컬럼 스냅샷 저장 (API 시작/재로드와 분석 스크립트가 mmap으로 읽음)
+        export_snapshot()
             
     except Exception as e:
         print(f"데이터 임포트 중 오류: {e}")
@@ -246,4 +623,6 @@ def import_commercial_data(store_file: str = './data/Store_common.csv',
             db.close()
 
 if __name__ == "__main__":
-    import_commercial_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="상가/공실 CSV 임포트")
+    parser.add_argument('--mode', choices=IMPORT_MODES, default='shadow')
+    import_commercial_data(mode=parser.parse_args().mode)
\ No newline at end of file
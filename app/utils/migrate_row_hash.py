@@ -0,0 +1,36 @@
+from ..database import engine
+from sqlalchemy import text
+
+ROW_HASH_TABLES = ['commercial_buildings', 'vacant_listings']
+
+def migrate_row_hash_columns():
+    """일괄/차분 임포트용 row_hash 컬럼과 인덱스 추가 (이미 있으면 건너뜀)
+
+    ORM 모델에는 넣지 않아 마이그레이션 전 DB에서도 기존 ORM 쿼리가 그대로 동작함
+    """
+    try:
+        with engine.connect() as connection:
+            for table in ROW_HASH_TABLES:
+                has_column = connection.execute(text("""
+                    SELECT COUNT(*)
+                    FROM INFORMATION_SCHEMA.COLUMNS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = :table
+                    AND COLUMN_NAME = 'row_hash'
+                """), {'table': table}).scalar()
+                if has_column:
+                    continue
+                # 기존 행은 NULL로 남고 다음 전체 임포트 때 채워짐
+                connection.execute(text(f"""
+                    ALTER TABLE {table}
+                    ADD COLUMN row_hash BIGINT UNSIGNED NULL,
+                    ADD INDEX ix_{table}_row_hash (row_hash)
+                """))
+                print(f"{table}: row_hash 컬럼 추가")
+            connection.commit()
+
+    except Exception as e:
+        print(f"row_hash 컬럼 마이그레이션 중 오류 발생: {e}")
+
+if __name__ == "__main__":
+    migrate_row_hash_columns()
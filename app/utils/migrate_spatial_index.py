@@ -0,0 +1,89 @@
+import argparse
+from ..database import engine
+from sqlalchemy import text, bindparam
+
+SPATIAL_TABLES = ['commercial_buildings', 'vacant_listings']
+# 좌표 없는 행 보고 시 출력할 최대 id 수
+MAX_REPORTED_IDS = 50
+
+def null_coordinate_ids(connection, table: str):
+    return [row.id for row in connection.execute(text(f"""
+        SELECT id FROM {table}
+        WHERE coordinates IS NULL
+        AND (latitude IS NULL OR longitude IS NULL)
+        ORDER BY id
+    """))]
+
+def format_ids(ids):
+    shown = ', '.join(map(str, ids[:MAX_REPORTED_IDS]))
+    return f"{shown} 외 {len(ids) - MAX_REPORTED_IDS}개" if len(ids) > MAX_REPORTED_IDS else shown
+
+def migrate_spatial_columns(delete_null_coordinates: bool = False):
+    """coordinates 컬럼을 SRID 4326 NOT NULL POINT로 변경하고 SPATIAL INDEX 추가
+
+    기존 coordinates 값(배정밀도)은 SRID만 바꾸고, 비어 있는 행만 FLOAT 위도/경도 컬럼으로 채움
+    geometry와 위도/경도가 모두 없는 행이 있으면 NOT NULL로 바꿀 수 없으므로 해당 id를 보고하고 중단하며,
+    delete_null_coordinates=True일 때만 그 행을 삭제하고 진행
+    """
+    try:
+        with engine.connect() as connection:
+            missing = {table: null_coordinate_ids(connection, table) for table in SPATIAL_TABLES}
+            if any(missing.values()) and not delete_null_coordinates:
+                for table, ids in missing.items():
+                    if ids:
+                        print(f"{table}: 좌표 없는 행 {len(ids)}개 (id: {format_ids(ids)})")
+                print("좌표 없는 행을 수정하거나 --delete-null-coordinates로 삭제를 허용한 뒤 다시 실행하세요.")
+                return False
+
+            for table in SPATIAL_TABLES:
+                ids = missing[table]
+                if ids:
+                    connection.execute(text(f"DELETE FROM {table} WHERE id IN :ids")
+                                       .bindparams(bindparam('ids', expanding=True)), {'ids': ids})
+                    print(f"{table}: 좌표 없는 행 {len(ids)}개 삭제 (id: {format_ids(ids)})")
+
+                # 기존 배정밀도 geometry는 그대로 두고 SRID만 지정 (POINT(x, y)는 내부적으로 경도-위도 순)
+                connection.execute(text(f"""
+                    UPDATE {table}
+                    SET coordinates = ST_SRID(coordinates, 4326)
+                    WHERE coordinates IS NOT NULL
+                """))
+                # geometry가 없는 행만 FLOAT 위도/경도 컬럼으로 생성
+                rebuilt = connection.execute(text(f"""
+                    UPDATE {table}
+                    SET coordinates = ST_SRID(POINT(longitude, latitude), 4326)
+                    WHERE coordinates IS NULL
+                """)).rowcount
+                if rebuilt:
+                    print(f"{table}: 좌표 geometry가 없는 행 {rebuilt}개를 위도/경도 컬럼으로 생성")
+                connection.execute(text(f"""
+                    ALTER TABLE {table}
+                    MODIFY coordinates POINT NOT NULL SRID 4326
+                """))
+
+                index_name = f'idx_{table}_coordinates'
+                has_index = connection.execute(text("""
+                    SELECT COUNT(*)
+                    FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                    AND TABLE_NAME = :table
+                    AND INDEX_TYPE = 'SPATIAL'
+                """), {'table': table}).scalar()
+                if not has_index:
+                    connection.execute(text(f"ALTER TABLE {table} ADD SPATIAL INDEX {index_name} (coordinates)"))
+                    print(f"{table}: SPATIAL INDEX {index_name} 생성")
+                else:
+                    print(f"{table}: SPATIAL INDEX가 이미 존재합니다")
+            connection.commit()
+        print("공간 컬럼 마이그레이션이 완료되었습니다.")
+        return True
+
+    except Exception as e:
+        print(f"공간 컬럼 마이그레이션 중 오류 발생: {e}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="공간 컬럼/SPATIAL INDEX 마이그레이션")
+    parser.add_argument('--delete-null-coordinates', action='store_true',
+                        help="좌표가 없는 행을 삭제하고 진행 (기본: id를 보고하고 중단)")
+    migrate_spatial_columns(delete_null_coordinates=parser.parse_args().delete_null_coordinates)
@@ -1,12 +1,18 @@
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.neighbors import BallTree
 from typing import Tuple, List, Dict
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.snapshot import read_snapshot
+
 class DataCollector:
     def __init__(self):
         """데이터 수집기 초기화"""
+        # 임포트 후 저장된 컬럼 스냅샷이 있으면 CSV 대신 mmap으로 읽음
+        self.snapshot = read_snapshot()
         self.vacant_stores = self._load_vacant_stores()
         self.commercial_buildings = self._load_commercial_buildings()
         # 공실 좌표로 BallTree 생성
@@ -14,7 +20,11 @@ class DataCollector:
         self.tree = BallTree(np.deg2rad(self.coords), metric='haversine')
         
     def _load_vacant_stores(self) -> pd.DataFrame:
-        """CSV에서 공실 데이터 로드"""
+        """스냅샷 또는 CSV에서 공실 데이터 로드"""
+        if self.snapshot is not None:
+            df = self.snapshot.frame('vacants')
+            print(f"스냅샷에서 로드된 공실 데이터: {len(df)}개")
+            return df
         try:
             df = pd.read_csv('./data/Vacant.common.csv')
             # 컬럼명 매핑
@@ -45,7 +55,9 @@ class DataCollector:
             raise
             
     def _load_commercial_buildings(self) -> pd.DataFrame:
-        """CSV에서 상가 데이터 로드"""
+        """스냅샷 또는 CSV에서 상가 데이터 로드"""
+        if self.snapshot is not None:
+            return self.snapshot.frame('stores', ['latitude', 'longitude', 'industry_category', 'sales_level'])
         try:
             df = pd.read_csv('./data/Store_common.csv')
             # 컬럼명 매핑
@@ -0,0 +1,43 @@
+import os
+import pytest
+from sqlalchemy.exc import OperationalError
+from app.snapshot import STORE_COLUMNS, VACANT_COLUMNS
+from app.utils.import_property_data import read_csv_chunks, STORE_CSV_COLUMNS, VACANT_CSV_COLUMNS
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def csv_rows(csv_file, columns):
+    """번들 CSV를 임포트 경로로 변환해 행 dict 목록 반환 (id는 자동 증가 순서)"""
+    rows = []
+    for names, chunk_rows, _ in read_csv_chunks(os.path.join(DATA_DIR, csv_file), columns, 10000):
+        rows += [dict(zip(names, row), id=len(rows) + i + 1) for i, row in enumerate(chunk_rows)]
+    return rows
+
+@pytest.fixture(scope='session')
+def store_rows():
+    return csv_rows('Store_common.csv', STORE_CSV_COLUMNS)
+
+@pytest.fixture(scope='session')
+def vacant_rows():
+    return csv_rows('Vacant.common.csv', VACANT_CSV_COLUMNS)
+
+@pytest.fixture(scope='session')
+def table_columns(store_rows, vacant_rows):
+    """fetch_columns와 같은 형식의 {테이블: {컬럼명: 값 목록}}"""
+    stores = {name: [row[name] for row in store_rows] for name in ('id', 'latitude', 'longitude', 'industry_category')}
+    stores['sales_level_label'] = [row['sales_level'] for row in store_rows]
+    stores['sales_level'] = [row['sales_level'] for row in store_rows]
+    vacants = {name: [row[name] for row in vacant_rows] for name in VACANT_COLUMNS}
+    assert set(stores) == set(STORE_COLUMNS)
+    return {'stores': stores, 'vacants': vacants}
+
+@pytest.fixture(scope='session')
+def db_connection():
+    """설정된 MySQL 연결 (연결할 수 없으면 DB 테스트는 건너뜀)"""
+    from app.database import engine
+    try:
+        connection = engine.connect()
+    except OperationalError:
+        pytest.skip("MySQL에 연결할 수 없음")
+    yield connection
+    connection.close()
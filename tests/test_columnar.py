@@ -0,0 +1,53 @@
+import json
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from starlette.requests import Request
+from app import columnar
+from app.columnar import negotiate_format, serialize_columns, result_columns, columnar_response, MEDIA_TYPES
+
+COLUMNS = {
+    'id': np.array([1, 2, 3], dtype=np.int64),
+    'latitude': np.array([35.1, 35.2, 35.3]),
+    'industry_category': np.array(['음식', None, '소매'], dtype=object),
+}
+
+def make_request(accept):
+    return Request({'type': 'http', 'headers': [(b'accept', accept.encode())]})
+
+def test_negotiate_format(monkeypatch):
+    assert negotiate_format(make_request('application/json')) is None
+    assert negotiate_format(make_request(MEDIA_TYPES['columns'])) == 'columns'
+    monkeypatch.setattr(columnar, 'msgpack', object())
+    monkeypatch.setattr(columnar, 'pa', object())
+    assert negotiate_format(make_request('application/x-msgpack')) == 'msgpack'
+    assert negotiate_format(make_request(f"{MEDIA_TYPES['arrow']}, application/msgpack")) == 'arrow'
+
+def test_unavailable_formats_are_not_negotiated(monkeypatch):
+    monkeypatch.setattr(columnar, 'msgpack', None)
+    monkeypatch.setattr(columnar, 'pa', None)
+    assert negotiate_format(make_request(MEDIA_TYPES['arrow'])) is None
+    assert negotiate_format(make_request('application/msgpack')) is None
+
+def test_columns_json():
+    data = json.loads(serialize_columns(COLUMNS, 'columns'))
+    assert data == {'id': [1, 2, 3], 'latitude': [35.1, 35.2, 35.3], 'industry_category': ['음식', None, '소매']}
+    response = columnar_response(COLUMNS, 'columns')
+    assert response.media_type == MEDIA_TYPES['columns']
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip('msgpack')
+    assert msgpack.unpackb(serialize_columns(COLUMNS, 'msgpack'))['industry_category'] == ['음식', None, '소매']
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    table = pa.ipc.open_stream(serialize_columns(COLUMNS, 'arrow')).read_all()
+    assert table.column('id').to_pylist() == [1, 2, 3]
+    assert table.column('industry_category').to_pylist() == ['음식', None, '소매']
+
+def test_result_columns():
+    with create_engine('sqlite://').connect() as connection:
+        result = connection.execute(text("SELECT 1 AS id, 35.1 AS latitude UNION ALL SELECT 2, 35.2"))
+        assert result_columns(result) == {'id': [1, 2], 'latitude': [35.1, 35.2]}
+        empty = connection.execute(text("SELECT 1 AS id WHERE 0"))
+        assert result_columns(empty) == {'id': []}
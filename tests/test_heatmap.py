@@ -0,0 +1,60 @@
+import os
+import struct
+import zlib
+import numpy as np
+from app import heatmap
+from app.heatmap import encode_png, tile_range, HeatmapGrid, HeatmapStore, kernel_average, quantize, colorize, TILE_ALPHA
+
+GRID = HeatmapGrid(35.8, 128.7, 35.9, 128.85, cell_m=50)
+
+def test_encode_png_round_trip():
+    rgba = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+    png = encode_png(rgba)
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    width, height = struct.unpack('>II', png[16:24])
+    assert (width, height) == (3, 2)
+    length = struct.unpack('>I', png[33:37])[0]
+    raw = zlib.decompress(png[41:41 + length])
+    rows = [raw[i * 13 + 1:(i + 1) * 13] for i in range(2)]
+    assert b''.join(rows) == rgba.tobytes()
+
+def test_tile_range_covers_bounds():
+    xs, ys = tile_range(12, 35.8, 128.7, 35.9, 128.85)
+    assert len(xs) >= 1 and len(ys) >= 1
+    assert xs.start == int((128.7 + 180) / 360 * 4096)
+
+def test_kernel_average_is_weighted_mean():
+    rows, cols = GRID.cells([35.85, 35.85], [128.78, 128.7801])
+    average = kernel_average(GRID, rows, cols, np.array([2.0, 4.0]), sigma_cells=3)
+    assert np.isclose(average[rows[0], cols[0]], 3.0)
+    # 상가에서 멀리 떨어진 칸은 값 없음
+    assert np.isnan(average[0, 0])
+
+def test_quantize_and_colorize():
+    tile = np.array([[np.nan, 1.0, 3.0, 5.0]], dtype=np.float32)
+    codes = quantize(tile, 1.0, 5.0)
+    assert codes.tolist() == [[0, 1, 128, 255]]
+    rgba = colorize(codes)
+    assert rgba[0, 0, 3] == 0 and (rgba[0, 1:, 3] == TILE_ALPHA).all()
+
+def test_build_swaps_link_and_keeps_recent_builds(tmp_path, monkeypatch):
+    categories = np.array(['음식', '음식', '소매'], dtype=object)
+    lats, lngs = np.array([35.83, 35.831, 35.832]), np.array([128.73, 128.731, 128.732])
+    monkeypatch.setattr(heatmap, 'load_store_sales', lambda: (categories, lats, lngs, np.array([1.0, 3.0, 5.0])))
+    monkeypatch.setattr(heatmap, 'HEATMAP_MAX_ZOOM', heatmap.HEATMAP_MIN_ZOOM + 1)
+    directory = str(tmp_path / 'heatmaps')
+    store = HeatmapStore(directory)
+    assert store.manifest is None
+
+    first = heatmap.build_heatmaps(directory)
+    assert os.path.islink(directory)
+    assert store.manifest['build_id'] == first['build_id']
+    zoom = heatmap.HEATMAP_MIN_ZOOM
+    xs, ys = tile_range(zoom, 35.83, 128.73, 35.83, 128.73)
+    body, tag = store.tile('음식', zoom, xs.start, ys.start, 'bin')
+    assert body is not None and tag.startswith(first['build_id'])
+
+    builds = [heatmap.build_heatmaps(directory)['build_id'] for _ in range(2)]
+    assert store.manifest['build_id'] == builds[-1]
+    remaining = sorted(name for name in os.listdir(tmp_path) if name.startswith('heatmaps-'))
+    assert remaining == sorted(f"heatmaps-{build_id}" for build_id in builds)
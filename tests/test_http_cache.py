@@ -0,0 +1,79 @@
+import gzip
+import json
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app import http_cache
+from app.columnar import COLUMNS_JSON_MEDIA_TYPE
+from app.http_cache import versioned_response, etag_matches, MIN_COMPRESS_SIZE
+
+ROWS = [{'id': i, 'latitude': 35.0 + i / 1000, 'longitude': 128.0} for i in range(100)]
+
+@pytest.fixture
+def client():
+    http_cache._bodies.clear()
+    app = FastAPI()
+    state = {'version': 1, 'builds': 0}
+
+    @app.get('/points')
+    async def points(request: Request):
+        async def build(columnar):
+            state['builds'] += 1
+            if columnar:
+                return {name: [row[name] for row in ROWS] for name in ROWS[0]}
+            return ROWS
+        return await versioned_response(request, state['version'], build)
+
+    client = TestClient(app)
+    client.state = state
+    return client
+
+def test_if_none_match_returns_304(client):
+    first = client.get('/points', headers={'Accept-Encoding': 'identity'})
+    assert first.status_code == 200 and first.json() == ROWS
+    etag = first.headers['etag']
+
+    second = client.get('/points', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert second.status_code == 304 and second.content == b''
+    assert second.headers['etag'] == etag
+    assert client.state['builds'] == 1
+
+def test_body_cache_reused_and_version_changes_etag(client):
+    etag = client.get('/points').headers['etag']
+    client.get('/points')
+    assert client.state['builds'] == 1
+
+    client.state['version'] = 2
+    response = client.get('/points', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['etag'] != etag
+    assert client.state['builds'] == 2
+
+def test_gzip_when_accepted(client):
+    response = client.get('/points', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json() == ROWS
+    assert 'Accept-Encoding' in response.headers['vary']
+
+def test_small_body_is_not_compressed():
+    body, encoding = http_cache.encode_body([1, 2, 3], 'gzip')
+    assert encoding is None and body == b'[1,2,3]'
+    body, encoding = http_cache.encode_body(ROWS, 'gzip')
+    assert len(json.dumps(ROWS)) > MIN_COMPRESS_SIZE
+    assert encoding == 'gzip' and json.loads(gzip.decompress(body)) == ROWS
+
+def test_columnar_format_has_own_etag(client):
+    rows = client.get('/points')
+    columns = client.get('/points', headers={'Accept': COLUMNS_JSON_MEDIA_TYPE})
+    assert columns.headers['content-type'] == COLUMNS_JSON_MEDIA_TYPE
+    assert columns.json()['id'] == list(range(100))
+    assert columns.headers['etag'] != rows.headers['etag']
+
+def test_etag_matches():
+    class FakeRequest:
+        def __init__(self, value):
+            self.headers = {'if-none-match': value} if value is not None else {}
+
+    assert etag_matches(FakeRequest('"a", "b"'), '"b"')
+    assert etag_matches(FakeRequest('*'), '"b"')
+    assert not etag_matches(FakeRequest('"a"'), '"b"')
+    assert not etag_matches(FakeRequest(None), '"b"')
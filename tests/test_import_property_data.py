@@ -0,0 +1,157 @@
+import csv
+import os
+from collections import namedtuple
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from app.utils import import_property_data as module
+from app.utils.import_property_data import plan_diff, read_csv_chunks, VACANT_CSV_COLUMNS
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+HashRow = namedtuple('HashRow', ['id', 'row_hash'])
+
+class FakeConnection:
+    """SELECT id, row_hash 결과만 돌려주는 연결"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query):
+        return iter(self.rows)
+
+@pytest.fixture
+def vacant_csv(tmp_path):
+    path = tmp_path / 'vacant.csv'
+    pd.read_csv(os.path.join(DATA_DIR, 'Vacant.common.csv'), nrows=300).to_csv(path, index=False)
+    return str(path)
+
+def stored_rows(csv_file):
+    rows = []
+    for names, chunk_rows, _ in read_csv_chunks(csv_file, VACANT_CSV_COLUMNS, 1000):
+        position = names.index('row_hash')
+        rows += [HashRow(len(rows) + i + 1, row[position]) for i, row in enumerate(chunk_rows)]
+    return rows
+
+def test_unchanged_file_has_no_diff(vacant_csv):
+    rows = stored_rows(vacant_csv)
+    names, to_delete, to_insert = plan_diff(FakeConnection(rows), 'vacant_listings', vacant_csv, VACANT_CSV_COLUMNS, 64)
+    assert to_delete == [] and to_insert == []
+    assert 'row_hash' in names
+
+def test_changed_rows_are_deleted_and_inserted(vacant_csv, monkeypatch):
+    monkeypatch.setattr(module, 'IMPORT_DIFF_MAX_RATIO', 1.0)
+    rows = stored_rows(vacant_csv)
+    stale = HashRow(9999, 12345)
+    existing = rows[:250] + [stale]
+    names, to_delete, to_insert = plan_diff(FakeConnection(existing), 'vacant_listings', vacant_csv, VACANT_CSV_COLUMNS, 64)
+    assert to_delete == [stale.id]
+    position = names.index('row_hash')
+    assert sorted(row[position] for row in to_insert) == sorted(row.row_hash for row in rows[250:])
+
+def test_duplicate_rows_compare_by_count(vacant_csv, monkeypatch):
+    monkeypatch.setattr(module, 'IMPORT_DIFF_MAX_RATIO', 1.0)
+    rows = stored_rows(vacant_csv)
+    # 번들 CSV 앞부분은 같은 행이 여러 번 반복됨
+    assert rows[0].row_hash == rows[1].row_hash
+    extra = HashRow(10000, rows[0].row_hash)
+    _, to_delete, to_insert = plan_diff(FakeConnection(rows + [extra]), 'vacant_listings', vacant_csv, VACANT_CSV_COLUMNS, 64)
+    assert len(to_delete) == 1 and to_insert == []
+
+def test_large_change_falls_back(vacant_csv):
+    rows = stored_rows(vacant_csv)
+    assert plan_diff(FakeConnection(rows[:100]), 'vacant_listings', vacant_csv, VACANT_CSV_COLUMNS, 64) is None
+
+@pytest.mark.parametrize('csv_file, columns, process_row', [
+    ('Store_common.csv', module.STORE_CSV_COLUMNS, module.process_store_row),
+    ('Vacant.common.csv', module.VACANT_CSV_COLUMNS, module.process_vacant_row),
+])
+def test_convert_chunk_matches_row_processing(csv_file, columns, process_row):
+    """컬럼 단위 변환 결과가 ORM 임포트의 행 단위 변환과 같은지 확인"""
+    path = os.path.join(DATA_DIR, csv_file)
+    expected = [row for row in map(process_row, pd.read_csv(path, encoding='utf-8').to_dict('records')) if row]
+
+    converted = []
+    for names, chunk_rows, _ in read_csv_chunks(path, columns, 1000):
+        converted += [dict(zip(names, row)) for row in chunk_rows]
+
+    assert len(converted) == len(expected)
+    for actual, row in zip(converted, expected):
+        assert actual.pop('coordinates') == bytes(row.pop('coordinates').data)
+        actual.pop('row_hash')
+        assert actual == row
+
+def test_convert_chunk_skips_rows_without_coordinates():
+    chunk = pd.DataFrame({
+        '위도': [35.1, None, 'x'], '경도': [128.2, 128.3, 128.4],
+        **{csv_name: [None, None, None] for csv_name in VACANT_CSV_COLUMNS}
+    })
+    names, rows, skipped = module.convert_chunk(chunk, VACANT_CSV_COLUMNS)
+    assert skipped == 2 and len(rows) == 1
+    row = dict(zip(names, rows[0]))
+    assert row['latitude'] == 35.1 and row['num_of_company'] is None
+    assert row['coordinates'] == module.point_wkb([35.1], [128.2])[0]
+
+STORE_CSV = os.path.join(DATA_DIR, 'Store_common.csv')
+VACANT_CSV = os.path.join(DATA_DIR, 'Vacant.common.csv')
+
+def leftover_tables(connection):
+    return connection.execute(text("""
+        SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND (TABLE_NAME LIKE :shadow OR TABLE_NAME LIKE :old)
+    """), {'shadow': f'%{module.SHADOW_SUFFIX}', 'old': f'%{module.OLD_SUFFIX}'}).scalars().all()
+
+def orphan_aggregates(connection):
+    return connection.execute(text("""
+        SELECT COUNT(*) FROM vacant_sales_aggregates a
+        LEFT JOIN vacant_listings v ON v.id = a.vacant_id
+        WHERE v.id IS NULL
+    """)).scalar()
+
+def test_shadow_import_swaps_tables(db_connection, store_rows, vacant_rows):
+    """번들 CSV를 섀도 테이블에 적재해 교체 (설정된 DB의 상가/공실 데이터를 번들 CSV로 다시 임포트함)"""
+    indexes = {table: sorted(module.secondary_indexes(db_connection, table)) for table in module.BASE_TABLES}
+    # 세션 연결이 잡고 있는 메타데이터 잠금을 풀어야 RENAME TABLE이 진행됨
+    db_connection.rollback()
+    module.import_with_shadow(STORE_CSV, VACANT_CSV)
+
+    try:
+        assert db_connection.execute(text("SELECT COUNT(*) FROM commercial_buildings")).scalar() == len(store_rows)
+        assert db_connection.execute(text("SELECT COUNT(*) FROM vacant_listings")).scalar() == len(vacant_rows)
+        for table, definitions in indexes.items():
+            assert sorted(module.secondary_indexes(db_connection, table)) == definitions
+        assert leftover_tables(db_connection) == []
+        assert db_connection.execute(text("SELECT COUNT(*) FROM vacant_sales_aggregates")).scalar() > 0
+        assert orphan_aggregates(db_connection) == 0
+        assert db_connection.execute(text("SELECT SUM(listing_count) FROM vacant_locations")).scalar() == len(vacant_rows)
+    finally:
+        db_connection.rollback()
+
+def test_diff_import_applies_changed_rows(db_connection, vacant_rows, tmp_path):
+    """공실 3개를 바꾼 파일을 차분 임포트한 뒤 원본 파일로 되돌림 (섀도 임포트 테스트 이후 실행)"""
+    db_connection.rollback()
+    assert module.import_with_diff(STORE_CSV, VACANT_CSV) == 0
+
+    with open(VACANT_CSV, encoding='utf-8', newline='') as source:
+        lines = list(csv.reader(source))
+    for line in lines[-3:]:
+        line[2] = str(int(line[2]) + 100000)
+    changed_csv = tmp_path / 'vacant_changed.csv'
+    with open(changed_csv, 'w', encoding='utf-8', newline='') as target:
+        csv.writer(target).writerows(lines)
+
+    try:
+        assert module.import_with_diff(STORE_CSV, str(changed_csv)) == 6
+        assert db_connection.execute(text(
+            "SELECT COUNT(*) FROM vacant_listings WHERE num_of_company >= 100000"
+        )).scalar() == 3
+        assert orphan_aggregates(db_connection) == 0
+        db_connection.rollback()
+
+        assert module.import_with_diff(STORE_CSV, VACANT_CSV) == 6
+        assert db_connection.execute(text("SELECT COUNT(*) FROM vacant_listings")).scalar() == len(vacant_rows)
+        assert db_connection.execute(text(
+            "SELECT COUNT(*) FROM vacant_listings WHERE num_of_company >= 100000"
+        )).scalar() == 0
+        assert orphan_aggregates(db_connection) == 0
+    finally:
+        db_connection.rollback()
@@ -0,0 +1,148 @@
+import asyncio
+import httpx
+import pytest
+from app import inference_client as module
+from app.inference_client import CircuitBreaker, InferenceClient, InferenceError
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_half_open_allows_single_trial():
+    breaker = open_breaker()
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_failed_trial_reopens():
+    breaker = open_breaker()
+    breaker.reset_timeout = 60
+    breaker.opened_at -= 60
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+def make_client(handler, breaker):
+    client = InferenceClient()
+    client.breaker = breaker
+    client._client = httpx.AsyncClient(base_url="http://inference", transport=httpx.MockTransport(handler))
+    client._semaphore = asyncio.Semaphore(1)
+    return client
+
+def test_client_error_closes_half_open_breaker():
+    breaker = open_breaker()
+    client = make_client(lambda request: httpx.Response(422, json={}), breaker)
+    with pytest.raises(InferenceError) as exc:
+        asyncio.run(client.analyze("/ma/analyze1", {}))
+    assert exc.value.status_code == 422
+    assert breaker.state == "closed"
+
+def test_invalid_json_does_not_leave_trial_pending():
+    breaker = open_breaker()
+    client = make_client(lambda request: httpx.Response(200, content=b"not json"), breaker)
+    with pytest.raises(ValueError):
+        asyncio.run(client.analyze("/ma/analyze1", {}))
+    assert breaker.allow()
+
+def test_cancelled_trial_releases_slot():
+    breaker = open_breaker()
+    breaker.reset_timeout = 60
+    breaker.opened_at -= 60
+
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json={'result': 'ok'})
+
+    async def run():
+        client = make_client(handler, breaker)
+        task = asyncio.ensure_future(client.analyze("/ma/analyze1", {}))
+        await asyncio.sleep(0.01)
+        assert not breaker.allow()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+def test_remote_protocol_error_is_not_retried(monkeypatch):
+    monkeypatch.setattr(module, "INFERENCE_BACKOFF", 0)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.RemoteProtocolError("server disconnected", request=request)
+
+    client = make_client(handler, CircuitBreaker(5, 60))
+    with pytest.raises(InferenceError) as exc:
+        asyncio.run(client.analyze("/ma/analyze1", {}))
+    assert exc.value.status_code == 502
+    assert len(calls) == 1
+
+def test_single_flight_shares_one_call():
+    from app.inference_client import SingleFlight
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def run():
+        flight = SingleFlight(max_pending=4)
+        results = await asyncio.gather(*(flight.run('key', factory) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert results == ['result'] * 5
+    assert len(calls) == 1
+    assert flight.stats['leaders'] == 1 and flight.stats['followers'] == 4
+    assert flight.pending == 0
+
+def test_single_flight_rejects_over_capacity():
+    from app.inference_client import InferenceQueueFull, SingleFlight
+
+    async def factory():
+        await asyncio.sleep(0.01)
+
+    async def run():
+        flight = SingleFlight(max_pending=1)
+        first = asyncio.ensure_future(flight.run('a', factory))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceQueueFull):
+            await flight.run('b', factory)
+        await first
+        return flight
+
+    flight = asyncio.run(run())
+    assert flight.stats['rejected'] == 1
+
+def test_single_flight_survives_waiter_cancellation():
+    from app.inference_client import SingleFlight
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        return 'done'
+
+    async def run():
+        flight = SingleFlight(max_pending=2)
+        first = asyncio.ensure_future(flight.run('key', factory))
+        second = asyncio.ensure_future(flight.run('key', factory))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 'done'
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from app import point_clusters
+from app.point_clusters import (
+    mercator_cells, numeric_sales_levels, ClusterGrid, MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM, CELLS_PER_TILE
+)
+from app.spatial_index import SpatialIndex, InMemorySnapshot
+
+BOUNDS = (35.0, 128.0, 36.5, 129.5)
+
+@pytest.fixture(scope='module')
+def index(table_columns):
+    index = SpatialIndex()
+    index._attach(InMemorySnapshot(table_columns, 1), 'test')
+    return index
+
+@pytest.fixture(scope='module')
+def grid(index):
+    grid = ClusterGrid()
+    grid.build(index)
+    return grid
+
+def test_mercator_cells():
+    x, y = mercator_cells([0.0, 85.0511, -85.0511], [0.0, -180.0, 179.9999], 0)
+    assert x.tolist() == [CELLS_PER_TILE // 2, 0, CELLS_PER_TILE - 1]
+    assert y.tolist() == [CELLS_PER_TILE // 2, 0, CELLS_PER_TILE - 1]
+
+def test_numeric_sales_levels():
+    levels = numeric_sales_levels(['1', '5', '', None, '1.5', 'A'])
+    assert levels[:2].tolist() == [1.0, 5.0]
+    assert np.isnan(levels[2:]).all()
+
+def test_clusters_cover_every_point(grid, index):
+    for zoom in range(MIN_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1, 3):
+        result = grid.query(*BOUNDS, zoom)
+        assert result['clustered']
+        assert sum(c['count'] for c in result['commercial_buildings']) == len(index.stores)
+        assert sum(c['count'] for c in result['vacant_listings']) == len(index.vacants)
+
+def test_cluster_categories_and_sales(grid, index):
+    clusters = grid.query(*BOUNDS, MIN_CLUSTER_ZOOM)['commercial_buildings']
+    categories = index.stores.columns['industry_category']
+    sales = numeric_sales_levels(index.stores.columns['sales_level'])
+    assert sum(sum(c['categories'].values()) for c in clusters) == sum(c is not None for c in categories)
+    # 번들 데이터는 경산 일대라 최소 줌에서는 셀 하나로 모임
+    assert len(clusters) == 1
+    assert clusters[0]['avg_sales_level'] == round(float(np.nanmean(sales)), 2)
+
+def test_cluster_centroid_inside_cell(grid):
+    zoom = 12
+    for cluster in grid.query(*BOUNDS, zoom)['vacant_listings']:
+        assert BOUNDS[0] <= cluster['latitude'] <= BOUNDS[2]
+        assert BOUNDS[1] <= cluster['longitude'] <= BOUNDS[3]
+
+def test_deep_zoom_returns_raw_points(grid, index):
+    south, west, north, east = 35.87, 128.81, 35.88, 128.83
+    result = grid.query(south, west, north, east, MAX_CLUSTER_ZOOM + 1)
+    assert not result['clustered']
+    expected = index.stores.ids[index.stores.query_bbox(south, west, north, east)]
+    assert [row['id'] for row in result['commercial_buildings']] == expected.tolist()
+
+def test_deep_zoom_over_raw_limit_stays_clustered(grid, index, monkeypatch):
+    monkeypatch.setattr(point_clusters, 'MAX_RAW_POINTS', 10)
+    result = grid.query(*BOUNDS, MAX_CLUSTER_ZOOM + 2)
+    assert result['clustered'] and result['zoom'] == MAX_CLUSTER_ZOOM
+    assert sum(c['count'] for c in result['commercial_buildings']) == len(index.stores)
+
+def test_low_zoom_is_clamped(grid):
+    assert grid.query(*BOUNDS, 1)['zoom'] == MIN_CLUSTER_ZOOM
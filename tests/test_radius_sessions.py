@@ -0,0 +1,54 @@
+import asyncio
+import numpy as np
+from app.radius_sessions import NeighborList, RadiusSession, RADIUS_SESSION_MAX_RADIUS, RADIUS_SESSION_MIN_GATHER
+
+def make_gather(points, calls):
+    """points: {id: 거리} 중 반경 내 이웃을 (거리, id) 순으로 반환하는 gather"""
+    async def gather(lat, lng, radius, industry_category):
+        calls.append(radius)
+        selected = sorted((d, i) for i, d in points.items() if d <= radius)
+        ids = [i for _, i in selected]
+        return NeighborList(ids, [d for d, _ in selected], lambda positions: [{'id': ids[p]} for p in positions])
+    return gather
+
+def run(session, *radii):
+    async def updates():
+        return [await session.update(radius) for radius in radii]
+    return asyncio.run(updates())
+
+def test_grow_and_shrink_send_only_deltas():
+    points = {1: 100.0, 2: 300.0, 3: 300.0, 4: 900.0, 5: 2500.0}
+    calls = []
+    session = RadiusSession(35.0, 128.0, None, make_gather(points, calls))
+    first, grown, shrunk, far = run(session, 200, 1000, 250, 3000)
+
+    assert [row['id'] for row in first['added']] == [1] and first['total'] == 1
+    assert [row['id'] for row in grown['added']] == [2, 3, 4] and grown['removed'] == []
+    assert shrunk['added'] == [] and shrunk['removed'] == [2, 3, 4] and shrunk['total'] == 1
+    assert [row['id'] for row in far['added']] == [2, 3, 4, 5] and far['total'] == 5
+    # 처음에는 최소 반경만큼 모으고, 그 안에서는 다시 조회하지 않음
+    assert calls == [RADIUS_SESSION_MIN_GATHER, 3000]
+
+def test_radius_is_clamped():
+    calls = []
+    session = RadiusSession(35.0, 128.0, None, make_gather({1: 10.0}, calls))
+    low, high = run(session, -5, RADIUS_SESSION_MAX_RADIUS * 10)
+    assert low['radius'] == 0.0 and low['total'] == 0
+    assert high['radius'] == RADIUS_SESSION_MAX_RADIUS and high['total'] == 1
+
+def test_changed_data_is_compared_by_id():
+    points = {1: 100.0, 2: 200.0}
+    session = RadiusSession(35.0, 128.0, None, make_gather(points, []))
+    first, = run(session, 500)
+    # 다시 모으기 전에 1번이 삭제되고 3번이 추가됨
+    del points[1]
+    points[3] = 150.0
+    changed, = run(session, 1500)
+    assert first['total'] == 2
+    assert [row['id'] for row in changed['added']] == [3]
+    assert changed['removed'] == [1] and changed['total'] == 2
+
+def test_neighbor_list_count_within():
+    neighbors = NeighborList([1, 2, 3], [10.0, 20.0, 20.0], None)
+    assert neighbors.count_within(20.0) == 3 and neighbors.count_within(19.9) == 1
+    assert neighbors.ids.dtype == np.int64
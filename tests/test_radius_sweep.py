@@ -0,0 +1,55 @@
+import math
+import numpy as np
+import pytest
+from app.point_clusters import numeric_sales_levels
+from app.spatial_index import radius_sweep_stats, SpatialIndex, InMemorySnapshot
+
+def brute_force(distances, matches, sales, radius):
+    inside = [i for i, d in enumerate(distances) if d <= radius]
+    selected = [i for i in inside if matches[i]]
+    rated = [sales[i] for i in selected if not math.isnan(sales[i])]
+    return {
+        'radius': radius,
+        'store_count': len(selected),
+        'rated_count': len(rated),
+        'avg_sales_level': sum(rated) / len(rated) if rated else None,
+        'total_store_count': len(inside),
+        'competitor_density': len(selected) / (math.pi * (radius / 1000) ** 2),
+        'competitor_share': len(selected) / len(inside) if inside else None
+    }
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    distances = np.sort(rng.uniform(0, 2000, 500))
+    matches = rng.random(500) < 0.3
+    sales = np.where(rng.random(500) < 0.8, rng.integers(1, 6, 500), np.nan)
+    radii = [50, 250.5, 1000, 2500]
+    result = radius_sweep_stats(distances, matches, sales, radii)
+    for actual, radius in zip(result, radii):
+        assert actual == pytest.approx(brute_force(distances, matches, sales, radius))
+
+def test_boundary_and_empty():
+    distances = np.array([100.0, 100.0, 200.0])
+    matches = np.array([True, False, True])
+    sales = np.array([3.0, 5.0, np.nan])
+    inclusive, small = radius_sweep_stats(distances, matches, sales, [100, 50])
+    assert inclusive['store_count'] == 1 and inclusive['total_store_count'] == 2
+    assert inclusive['avg_sales_level'] == 3.0
+    assert small['total_store_count'] == 0 and small['competitor_share'] is None
+    assert small['avg_sales_level'] is None
+
+    empty = radius_sweep_stats(np.empty(0), np.empty(0, dtype=bool), np.empty(0), [500])
+    assert empty[0]['store_count'] == empty[0]['total_store_count'] == 0
+
+def test_index_sweep_matches_single_radius_queries(table_columns):
+    index = SpatialIndex()
+    index._attach(InMemorySnapshot(table_columns, 1), 'test')
+    lat, lng, category = 35.8758, 128.8216, '기타'
+    radii = [200, 700, 1500]
+    for stats in index.radius_sweep(lat, lng, category, radii):
+        positions, _ = index.stores.query_radius(lat, lng, stats['radius'])
+        selected = positions[index.stores.columns['industry_category'][positions] == category]
+        sales = numeric_sales_levels(index.stores.columns['sales_level'][selected])
+        assert stats['total_store_count'] == len(positions)
+        assert stats['store_count'] == len(selected)
+        assert stats['rated_count'] == np.count_nonzero(~np.isnan(sales))
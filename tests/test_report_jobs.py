@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from pydantic import BaseModel
+from app.report_jobs import JobQueueUnavailable, ReportJobManager
+
+class Payload(BaseModel):
+    value: int = 0
+
+def test_submit_before_start_is_unavailable():
+    manager = ReportJobManager(workers=1)
+    with pytest.raises(JobQueueUnavailable):
+        asyncio.run(manager.submit('vacant', Payload()))
+
+def test_wait_for_update_drops_event_after_last_waiter():
+    manager = ReportJobManager(workers=1)
+
+    async def run():
+        waiter = asyncio.ensure_future(manager.wait_for_update('job', 1))
+        await asyncio.sleep(0)
+        assert 'job' in manager._updates
+        manager._notify('job')
+        await waiter
+
+    asyncio.run(run())
+    assert manager._updates == {}
+    assert not manager._waiters
+
+    asyncio.run(manager.wait_for_update('missing', 0.01))
+    assert manager._updates == {}
+
+def test_stop_requeues_interrupted_jobs():
+    manager = ReportJobManager(workers=1)
+    statuses = {'job': 'queued'}
+    started = None
+
+    async def fake_set(job_id, expected_status=None, **values):
+        if expected_status is not None and statuses[job_id] != expected_status:
+            return False
+        statuses[job_id] = values.get('status', statuses[job_id])
+        return True
+
+    async def load_request(job_id):
+        return 'slow', '{}'
+
+    async def runner(data, progress):
+        started.set()
+        await asyncio.sleep(10)
+
+    manager._set = fake_set
+    manager._load_request = load_request
+    manager.register('slow', Payload, runner)
+
+    async def run():
+        nonlocal started
+        started = asyncio.Event()
+        manager._queue = asyncio.Queue()
+        manager._queue.put_nowait('job')
+        manager._tasks = [asyncio.create_task(manager._worker())]
+        await started.wait()
+        assert statuses['job'] == 'running'
+        await manager.stop()
+
+    asyncio.run(run())
+    assert statuses['job'] == 'queued'
+    assert manager._running == set()
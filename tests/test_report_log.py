@@ -0,0 +1,22 @@
+import os
+import pytest
+from app.report_log import ReportLog
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_records_are_indexed_and_readable(tmp_path, compress):
+    log = ReportLog(str(tmp_path), max_bytes=200, max_age=3600, compress=compress)
+    ids = [log.append('vacant' if i % 2 else 'store', {'i': i, '주소': '경산시'}) for i in range(10)]
+    log.close()
+
+    segments = [name for name in os.listdir(tmp_path) if name.startswith('reports_')]
+    assert len(segments) > 1
+    assert all(name.endswith('.jsonl.gz' if compress else '.jsonl') for name in segments)
+
+    reopened = ReportLog(str(tmp_path), compress=compress)
+    record = reopened.get(ids[3])
+    assert record['report_id'] == ids[3] and record['kind'] == 'vacant'
+    assert record['data'] == {'i': 3, '주소': '경산시'}
+    assert reopened.get('missing') is None
+    assert [r['data']['i'] for r in reopened.iter_records()] == list(range(10))
+    assert [r['data']['i'] for r in reopened.iter_records('store')] == [0, 2, 4, 6, 8]
+    reopened.close()
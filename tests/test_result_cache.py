@@ -0,0 +1,34 @@
+from app import result_cache as module
+from app.result_cache import cache_key, ResultCache
+
+def test_cache_key_ignores_key_order():
+    assert cache_key('/ma/analyze1', {'a': 1, 'b': '상가'}) == cache_key('/ma/analyze1', {'b': '상가', 'a': 1})
+    assert cache_key('/ma/analyze1', {'a': 1}) != cache_key('/ma/analyze2', {'a': 1})
+    assert cache_key('/ma/analyze1', {'a': 1}) != cache_key('/ma/analyze1', {'a': 2})
+
+def test_lru_eviction():
+    cache = ResultCache(max_size=2, ttl=60, db_path=None)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1) and cache.get('c') == (True, 3)
+    assert cache.info()['memory_entries'] == 2
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module.time, 'time', lambda: now[0])
+    cache = ResultCache(max_size=10, ttl=60, db_path=None)
+    cache.set('a', {'result': 1})
+    now[0] += 61
+    assert cache.get('a') == (False, None)
+    assert cache.stats['misses'] == 1
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache' / 'results.db')
+    ResultCache(max_size=10, ttl=60, db_path=path).set('a', {'분석': [1, 2]})
+    cache = ResultCache(max_size=10, ttl=60, db_path=path)
+    assert cache.get('a') == (True, {'분석': [1, 2]})
+    assert cache.get('a') == (True, {'분석': [1, 2]})
+    assert cache.stats['disk_hits'] == 1 and cache.stats['memory_hits'] == 1
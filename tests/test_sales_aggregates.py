@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from app.point_clusters import numeric_sales_levels
+from app.sales_aggregates import lookup_sales_aggregates, has_sales_aggregates, radius_bucket, RADIUS_BUCKETS
+from app.snapshot import fetch_columns
+from app.spatial_index import SpatialIndex, InMemorySnapshot
+
+@pytest.fixture
+def sqlite():
+    with create_engine('sqlite://').connect() as connection:
+        yield connection
+
+def test_radius_bucket():
+    assert radius_bucket(500) == 500 and radius_bucket(500.0) == 500
+    assert radius_bucket(450) is None
+
+def test_missing_table_falls_back(sqlite):
+    assert not has_sales_aggregates(sqlite)
+    assert lookup_sales_aggregates(sqlite, [1, 2], '음식', 500) is None
+
+def test_lookup(sqlite):
+    sqlite.execute(text("""
+        CREATE TABLE vacant_sales_aggregates (
+            vacant_id INTEGER, industry_category TEXT, radius INTEGER, store_count INTEGER, sales_level_sum INTEGER
+        )
+    """))
+    assert lookup_sales_aggregates(sqlite, [1], '음식', 500) is None
+    sqlite.execute(text("INSERT INTO vacant_sales_aggregates VALUES (1, '음식', 500, 3, 7), (2, '음식', 300, 1, 2)"))
+    assert lookup_sales_aggregates(sqlite, [1, 2], '음식', 500) == {1: (3, 7)}
+
+def test_aggregates_match_index(db_connection):
+    """집계 테이블을 인덱스 반경 검색으로 다시 계산한 값과 비교 (임포트된 MySQL 필요)"""
+    if not has_sales_aggregates(db_connection):
+        pytest.skip("집계 테이블이 비어 있음")
+    index = SpatialIndex()
+    index._attach(InMemorySnapshot(fetch_columns(db_connection), None), 'test')
+    stores, vacants = index.stores, index.vacants
+    for position in range(0, len(vacants), max(len(vacants) // 20, 1)):
+        vacant_id = int(vacants.ids[position])
+        expected = {}
+        for radius in RADIUS_BUCKETS:
+            found, _ = stores.query_radius(vacants.lats[position], vacants.lngs[position], radius)
+            sales = numeric_sales_levels(stores.columns['sales_level'][found])
+            for category, level in zip(stores.columns['industry_category'][found], sales):
+                if category is not None and not np.isnan(level):
+                    count, total = expected.get((category, radius), (0, 0))
+                    expected[(category, radius)] = (count + 1, total + int(level))
+        rows = db_connection.execute(text("""
+            SELECT industry_category, radius, store_count, sales_level_sum
+            FROM vacant_sales_aggregates WHERE vacant_id = :vacant_id
+        """), {'vacant_id': vacant_id})
+        actual = {(row.industry_category, row.radius): (row.store_count, int(row.sales_level_sum)) for row in rows}
+        assert actual == expected
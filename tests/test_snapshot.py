@@ -0,0 +1,51 @@
+import os
+import numpy as np
+import pytest
+from app.snapshot import write_snapshot, read_snapshot, encode_column, decode_column, SnapshotColumn, SNAPSHOT_KEEP
+from app.spatial_index import SpatialIndex, InMemorySnapshot
+
+@pytest.mark.parametrize('kind, values', [
+    ('category', ['b', None, 'a', 'b']),
+    ('nullable_int', [1, None, 3]),
+    ('nullable_float', [1.5, None, 0.0]),
+])
+def test_encode_decode_round_trip(kind, values):
+    array, categories = encode_column(kind, values)
+    assert decode_column(kind, array, categories).tolist() == values
+    column = SnapshotColumn(kind, array, categories)
+    assert list(column) == values and column[1:2].tolist() == values[1:2]
+
+def test_category_equals():
+    array, categories = encode_column('category', ['b', None, 'a', 'b'])
+    column = SnapshotColumn('category', array, categories)
+    assert column.equals('b').tolist() == [True, False, False, True]
+    assert not column.equals('없음').any()
+
+def test_sales_level_encoding():
+    array, _ = encode_column('float32', ['3', 'A', None])
+    assert array.dtype == np.float32 and array[0] == 3 and np.isnan(array[1:]).all()
+
+def test_snapshot_matches_in_memory_index(tmp_path, table_columns):
+    directory = str(tmp_path / 'snapshot')
+    write_snapshot(table_columns, 7, directory)
+    snapshot = read_snapshot(directory)
+    assert snapshot.data_version == 7 and os.path.islink(directory)
+
+    from_snapshot, in_memory = SpatialIndex(), SpatialIndex()
+    from_snapshot._attach(snapshot, 'snapshot')
+    in_memory._attach(InMemorySnapshot(table_columns, 7), 'db')
+    assert from_snapshot.stores.tree is not None
+    lat, lng = 35.8758, 128.8216
+    assert from_snapshot.nearby_stores(lat, lng, 1000) == in_memory.nearby_stores(lat, lng, 1000)
+    assert from_snapshot.nearest_vacants([lat], [lng], 3) == in_memory.nearest_vacants([lat], [lng], 3)
+    assert from_snapshot.category_stats(lat, lng, 1000) == in_memory.category_stats(lat, lng, 1000)
+
+def test_rebuild_swaps_link_and_keeps_recent_builds(tmp_path, table_columns):
+    directory = str(tmp_path / 'snapshot')
+    build_ids = [write_snapshot(table_columns, version, directory)['build_id'] for version in range(4)]
+    assert read_snapshot(directory).build_id == build_ids[-1]
+    builds = sorted(name for name in os.listdir(tmp_path) if name.startswith('snapshot-'))
+    assert len(builds) == SNAPSHOT_KEEP
+
+def test_missing_snapshot(tmp_path):
+    assert read_snapshot(str(tmp_path / 'none')) is None
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.spatial_index import spatial_index, InMemorySnapshot
+from app import main
+
+LAT, LNG = 35.8758, 128.8216
+
+@pytest.fixture(scope='module')
+def client(table_columns):
+    # startup 훅(DB 연결)은 실행하지 않고 CSV로 만든 인덱스만 붙임
+    spatial_index._attach(InMemorySnapshot(table_columns, 1), 'test')
+    yield TestClient(main.app)
+    spatial_index.stores = spatial_index.vacants = spatial_index.version = None
+
+def test_nearby_and_ranking_agree(client):
+    nearby = client.get('/commercial-buildings/nearby/', params={'lat': LAT, 'lng': LNG, 'radius': 1500})
+    ranking = client.get('/api/category-ranking', params={'lat': LAT, 'lng': LNG, 'radius': 1500})
+    assert nearby.status_code == ranking.status_code == 200
+    assert len(nearby.json()) == ranking.json()['total_stores'] > 0
+
+def test_nearest_vacants_single_and_batch(client):
+    single = client.get('/api/nearest-vacant-listings/', params={'lat': LAT, 'lng': LNG})
+    batch = client.post('/api/nearest-vacant-listings/batch', json={'points': [{'lat': LAT, 'lng': LNG}], 'k': 3})
+    assert single.status_code == batch.status_code == 200
+    assert batch.json()[0]['vacants'] == single.json()
+
+def test_radius_session_deltas(client):
+    with client.websocket_connect('/ws/commercial-buildings/nearby') as ws:
+        ws.send_json({'lat': LAT, 'lng': LNG, 'radius': 300})
+        first = ws.receive_json()
+        ws.send_json({'radius': 800})
+        grown = ws.receive_json()
+        ws.send_json({'radius': 300})
+        shrunk = ws.receive_json()
+    assert len(first['added']) == first['total']
+    assert grown['total'] == first['total'] + len(grown['added'])
+    assert len(shrunk['removed']) == len(grown['added']) and shrunk['total'] == first['total']
+
+def test_empty_batch_is_rejected(client):
+    response = client.post('/api/nearest-vacant-listings/batch', json={'points': [], 'k': 3})
+    assert response.status_code == 422
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from app.snapshot import fetch_columns
+from app.spatial_index import haversine_distance, InMemorySnapshot, PointIndex, SpatialIndex
+
+def test_query_nearest_empty_points():
+    index = PointIndex([1, 2], [35.0, 35.1], [128.0, 128.1])
+    positions, distances = index.query_nearest([], [], 3)
+    assert positions.shape == distances.shape == (0, 0)
+
+def test_query_nearest_empty_index():
+    index = PointIndex([], [], [])
+    assert index.tree is None
+    positions, distances = index.query_nearest([35.0, 35.1], [128.0, 128.1], 3)
+    assert positions.shape == (2, 0) and distances.shape == (2, 0)
+    positions, distances = index.query_radius(35.0, 128.0, 1000)
+    assert len(positions) == len(distances) == 0
+
+def test_query_nearest_caps_k_at_index_size():
+    index = PointIndex([1, 2], [35.0, 35.1], [128.0, 128.1])
+    positions, distances = index.query_nearest([35.0], [128.0], 5)
+    assert positions.tolist() == [[0, 1]]
+    assert distances[0, 0] == 0 and np.all(np.diff(distances[0]) >= 0)
+
+SAMPLE_POINTS = pd.read_csv(
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'random_coordinates.csv')
+)[['위도', '경도']].to_numpy()[::150]
+RADII = [100, 500, 1500]
+
+@pytest.fixture(scope='module')
+def stores(table_columns):
+    columns = table_columns['stores']
+    return PointIndex(columns['id'], columns['latitude'], columns['longitude'],
+                      {'industry_category': columns['industry_category']})
+
+def brute_force(index, lat, lng):
+    return haversine_distance(lat, lng, index.lats, index.lngs)
+
+def test_query_radius_matches_brute_force(stores):
+    for lat, lng in SAMPLE_POINTS:
+        all_distances = brute_force(stores, lat, lng)
+        for radius in RADII:
+            positions, distances = stores.query_radius(lat, lng, radius)
+            expected = np.flatnonzero(all_distances <= radius)
+            assert sorted(positions.tolist()) == expected.tolist()
+            assert np.all(np.diff(distances) >= 0)
+
+def test_query_radius_includes_boundary(stores):
+    lat, lng = SAMPLE_POINTS[0]
+    distances = np.sort(brute_force(stores, lat, lng))
+    radius = float(distances[10])
+    positions, _ = stores.query_radius(lat, lng, radius)
+    assert len(positions) == np.count_nonzero(distances <= radius)
+
+def test_query_radius_filter(stores):
+    lat, lng = SAMPLE_POINTS[0]
+    positions, _ = stores.query_radius(lat, lng, 1500, industry_category='기타')
+    everything, _ = stores.query_radius(lat, lng, 1500)
+    expected = [p for p in everything if stores.columns['industry_category'][p] == '기타']
+    assert sorted(positions.tolist()) == sorted(expected)
+
+def test_query_nearest_matches_brute_force(stores):
+    positions, distances = stores.query_nearest(SAMPLE_POINTS[:, 0], SAMPLE_POINTS[:, 1], 5)
+    for (lat, lng), row, row_distances in zip(SAMPLE_POINTS, positions, distances):
+        all_distances = brute_force(stores, lat, lng)
+        expected = np.sort(all_distances)[:5]
+        assert np.allclose(row_distances, expected)
+        # 같은 좌표에 상가가 여럿이면 k번째 거리와 같은 행 중 어느 것이 뽑힐지는 정해지지 않음
+        closer = np.flatnonzero(all_distances < expected[-1])
+        assert set(closer.tolist()) <= set(row.tolist())
+
+def test_index_matches_sql_radius_search(db_connection):
+    """DB에서 만든 인덱스와 ST_Distance_Sphere 반경 검색 결과 비교 (번들 CSV를 임포트한 DB 필요)"""
+    from app.main import RADIUS_FILTER, radius_params
+    index = SpatialIndex()
+    index._attach(InMemorySnapshot(fetch_columns(db_connection), None), 'test')
+    query = text(f"SELECT id FROM commercial_buildings WHERE {RADIUS_FILTER}")
+    for lat, lng in SAMPLE_POINTS:
+        for radius in RADII:
+            expected = sorted(row.id for row in db_connection.execute(query, radius_params(lat, lng, radius)))
+            positions, _ = index.stores.query_radius(lat, lng, radius)
+            assert sorted(index.stores.ids[positions].tolist()) == expected